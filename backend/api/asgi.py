@@ -0,0 +1,184 @@
+"""ASGI-приложение Echo для запуска на своих серверах.
+
+Маршруты те же, что в api-gateway.yaml (таблица router.ROUTES). HTTP-запрос
+превращается в событие API Gateway и передаётся обработчику, ответ
+обработчика — обратно в HTTP. Для горячих путей есть асинхронные варианты
+(ASYNC_HANDLERS) поверх aiobotocore; остальные обработчики выполняются
+в пуле потоков, чтобы не блокировать цикл событий.
+
+    pip install -r requirements-asgi.txt
+    python asgi.py --port 8080 --workers 4
+    uvicorn asgi:app --port 8080
+
+    ASGI_ASYNC=off        # все маршруты через синхронные обработчики в потоках
+    ASGI_THREADS=32       # размер пула потоков для синхронных обработчиков
+    REQUEST_TIMEOUT=10    # бюджет запроса, с (как execution_timeout функций)
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qsl
+
+import router
+from async_db import close_async_dynamodb
+
+# Модуль обработчика -> модуль с асинхронным handler
+ASYNC_HANDLERS = {
+    'get_posts': 'get_posts_async',
+}
+
+ASYNC_ENABLED = os.environ.get('ASGI_ASYNC', 'on').lower() not in ('off', 'false', '0')
+REQUEST_TIMEOUT = float(os.environ.get('REQUEST_TIMEOUT', 10))
+MAX_BODY_SIZE = 12 * 1024 * 1024
+
+_executor = ThreadPoolExecutor(max_workers=int(os.environ.get('ASGI_THREADS', 32)), thread_name_prefix='handler')
+
+
+class RequestContext:
+    """Контекст вызова с тем же интерфейсом, что у Cloud Functions."""
+
+    function_name = 'echo-asgi'
+
+    def __init__(self):
+        self.request_id = uuid.uuid4().hex
+        self.deadline = time.monotonic() + REQUEST_TIMEOUT
+
+    def get_remaining_time_in_millis(self):
+        return max(0, int((self.deadline - time.monotonic()) * 1000))
+
+
+def build_event(scope, body, path_params):
+    headers = {}
+    for name, value in scope['headers']:
+        name = name.decode('latin-1')
+        # Имена заголовков в событии API Gateway — в исходном регистре;
+        # обработчики ищут Authorization, Content-Type и Accept
+        headers['-'.join(part.capitalize() for part in name.split('-'))] = value.decode('latin-1')
+
+    query_string = scope.get('query_string', b'').decode('latin-1')
+    try:
+        text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text, is_base64 = base64.b64encode(body).decode('ascii'), True
+
+    return {
+        'httpMethod': scope['method'],
+        'path': scope['path'],
+        'url': f"{scope['path']}?{query_string}" if query_string else scope['path'],
+        'headers': headers,
+        'queryStringParameters': dict(parse_qsl(query_string)),
+        'pathParameters': path_params,
+        'requestContext': {
+            'requestId': uuid.uuid4().hex,
+            'identity': {'sourceIp': (scope.get('client') or ('',))[0]},
+        },
+        'body': text if body else None,
+        'isBase64Encoded': is_base64,
+    }
+
+
+def get_async_handler(module):
+    if not ASYNC_ENABLED or module not in ASYNC_HANDLERS:
+        return None
+    return router.get_handler(ASYNC_HANDLERS[module])
+
+
+async def invoke(module, event):
+    context = RequestContext()
+    if async_handler := get_async_handler(module):
+        return await async_handler(event, context)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, router.get_handler(module), event, context)
+
+
+def json_response(status_code, body):
+    return {
+        'statusCode': status_code,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps(body),
+    }
+
+
+async def read_body(receive):
+    chunks = []
+    size = 0
+    while True:
+        message = await receive()
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > MAX_BODY_SIZE:
+            return None
+        chunks.append(chunk)
+        if not message.get('more_body'):
+            return b''.join(chunks)
+
+
+async def send_response(send, response):
+    body = response.get('body') or ''
+    body = base64.b64decode(body) if response.get('isBase64Encoded') else body.encode('utf-8')
+    headers = [(name.lower().encode('latin-1'), str(value).encode('latin-1'))
+               for name, value in (response.get('headers') or {}).items()]
+    await send({'type': 'http.response.start', 'status': response.get('statusCode', 200), 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            # Буфер просмотров сбрасывается до закрытия клиентов, atexit воркера может не успеть
+            if view_counter := sys.modules.get('view_counter'):
+                await asyncio.get_running_loop().run_in_executor(_executor, view_counter.flush_at_exit)
+            await close_async_dynamodb()
+            _executor.shutdown(wait=False)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+async def app(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await lifespan(receive, send)
+    if scope['type'] != 'http':
+        return
+
+    if scope['path'] == '/health':
+        return await send_response(send, json_response(200, {'status': 'ok'}))
+
+    body = await read_body(receive)
+    if body is None:
+        return await send_response(send, json_response(413, {'success': False, 'error': 'Слишком большой запрос'}))
+
+    module, path_params = router.resolve(scope['method'], scope['path'])
+    if module is None:
+        return await send_response(send, json_response(404, {'success': False, 'error': 'Маршрут не найден'}))
+
+    try:
+        response = await invoke(module, build_event(scope, body, path_params))
+    except Exception as e:
+        print(f"Ошибка обработчика {module}: {e}")
+        response = json_response(500, {'success': False, 'error': 'Внутренняя ошибка сервера'})
+    await send_response(send, response)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Echo API на uvicorn')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8080)
+    parser.add_argument('--workers', type=int, default=1, help='процессов; у каждого свой цикл событий и клиенты')
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run('asgi:app', host=args.host, port=args.port, workers=args.workers,
+                log_level='warning', access_log=False)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,155 @@
+"""Асинхронный клиент YDB (Document API) для asgi.py.
+
+Тот же интерфейс Table, что в db.py, но методы — корутины поверх клиента
+aiobotocore. Повторы и хеджирование чтений — по тем же правилам и с теми
+же порогами, что db.call(). Клиент привязан к циклу событий процесса:
+создаётся при первом обращении и закрывается close_async_dynamodb() при
+остановке приложения.
+aiobotocore импортируется лениво, в Cloud Functions он не нужен.
+
+    DB_POOL_SIZE=64   # одновременных HTTP-соединений с YDB на процесс
+"""
+import asyncio
+import os
+import time
+from contextlib import AsyncExitStack
+from types import SimpleNamespace
+
+from db import (
+    DEFAULT_BUDGET_MS, HEDGE_READS, MAX_ATTEMPTS, OPERATION_BUDGETS_MS, READ_OPERATIONS,
+    backoff_ms, deserialize_response, is_retryable, serialize_params, tracker
+)
+from instrumentation import instrument, record_hedge, record_retry
+
+_exit_stack = None
+_dynamodb = None
+_lock = asyncio.Lock()
+
+
+async def timed(latency, method, params):
+    started = time.perf_counter()
+    response = await method(**params)
+    latency.record((time.perf_counter() - started) * 1000)
+    return response
+
+
+async def hedged_call(method, operation, params):
+    """Чтение с дублирующим запросом после порога; проигравший запрос отменяется."""
+    latency = tracker(operation)
+    threshold_ms = latency.hedge_after_ms() if HEDGE_READS else None
+    if threshold_ms is None:
+        return await timed(latency, method, params)
+
+    first = asyncio.ensure_future(timed(latency, method, params))
+    done, _ = await asyncio.wait([first], timeout=threshold_ms / 1000)
+    if done:
+        return first.result()
+
+    latency.hedges += 1
+    record_hedge(operation)
+    pending = {first, asyncio.ensure_future(timed(latency, method, params))}
+    error = None
+    try:
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    return task.result()
+                error = task.exception()
+        raise error
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def call(client, operation, params):
+    """Асинхронный db.call(): повторы при перегрузке и хеджирование чтений."""
+    method = getattr(client, operation)
+    budget_deadline = time.monotonic() + OPERATION_BUDGETS_MS.get(operation, DEFAULT_BUDGET_MS) / 1000
+    attempt = 0
+    while True:
+        try:
+            if operation in READ_OPERATIONS:
+                return await hedged_call(method, operation, params)
+            return await method(**params)
+        except Exception as e:
+            if attempt + 1 >= MAX_ATTEMPTS or not is_retryable(e, operation):
+                raise
+            delay = backoff_ms(attempt) / 1000
+            if time.monotonic() + delay >= budget_deadline:
+                raise
+            record_retry(operation)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+
+class AsyncTable:
+    """Таблица с интерфейсом db.Table, методы которой нужно ожидать."""
+
+    def __init__(self, client, name):
+        self.name = name
+        self.client = client
+        self.meta = SimpleNamespace(client=client)
+
+    async def _call(self, operation, params):
+        response = await call(self.client, operation, dict(serialize_params(params), TableName=self.name))
+        return deserialize_response(response)
+
+    async def get_item(self, **params):
+        return await self._call('get_item', params)
+
+    async def put_item(self, **params):
+        return await self._call('put_item', params)
+
+    async def update_item(self, **params):
+        return await self._call('update_item', params)
+
+    async def delete_item(self, **params):
+        return await self._call('delete_item', params)
+
+    async def query(self, **params):
+        return await self._call('query', params)
+
+    async def scan(self, **params):
+        return await self._call('scan', params)
+
+
+class AsyncDatabase:
+    def __init__(self, client):
+        self.client = client
+        self.exceptions = client.exceptions
+        self.meta = SimpleNamespace(client=client)
+
+    def Table(self, name):
+        return AsyncTable(self.client, name)
+
+
+async def get_async_dynamodb():
+    global _exit_stack, _dynamodb
+    if _dynamodb is None:
+        async with _lock:
+            if _dynamodb is None:
+                from aiobotocore.config import AioConfig
+                from aiobotocore.session import get_session
+
+                stack = AsyncExitStack()
+                client = await stack.enter_async_context(get_session().create_client(
+                    'dynamodb',
+                    endpoint_url=os.environ['YDB_ENDPOINT'],
+                    region_name=os.environ['YDB_REGION'],
+                    aws_access_key_id=os.environ['ACCESS_KEY_ID'],
+                    aws_secret_access_key=os.environ['SECRET_ACCESS_KEY'],
+                    config=AioConfig(
+                        max_pool_connections=int(os.environ.get('DB_POOL_SIZE', 64)),
+                        retries={'mode': 'standard', 'total_max_attempts': 1}
+                    )
+                ))
+                _exit_stack, _dynamodb = stack, AsyncDatabase(instrument(client))
+    return _dynamodb
+
+
+async def close_async_dynamodb():
+    global _exit_stack, _dynamodb
+    if _exit_stack is not None:
+        await _exit_stack.aclose()
+    _exit_stack, _dynamodb = None, None
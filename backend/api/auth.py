@@ -1,131 +1,366 @@
 import os
-import boto3
 import json
-import jwt
+import base64
 import bcrypt
+import hashlib
+import hmac
+import secrets
 import uuid
 from datetime import datetime, timedelta
 
-def handler(event, context):
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=os.environ['YDB_ENDPOINT'],
-        region_name=os.environ['YDB_REGION'],
-        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-    )
+from auth_middleware import ACCESS_TOKEN_TTL, get_secret, issue_token
+from db import get_dynamodb
+from instrumentation import instrumented
 
-    users_table = dynamodb.Table('users')
-    data = json.loads(event['body'])
+# Стоимость bcrypt подбирается командой backend/tools/bcrypt_benchmark.py
+# под целевую задержку на 128MB функции; ниже минимума не опускаем
+BCRYPT_MIN_ROUNDS = 10
+BCRYPT_ROUNDS = max(int(os.environ.get('BCRYPT_ROUNDS', 12)), BCRYPT_MIN_ROUNDS)
 
-    if event['httpMethod'] == 'POST':
-        if 'email' not in data or 'password' not in data:
-            return {
-                'statusCode': 400,
-                'body': json.dumps({'error': 'Missing email or password'})
+REFRESH_TOKEN_TTL = timedelta(days=30)
+
+# Сколько после ротации прежний refresh-токен ещё принимается: параллельные
+# запросы с одним токеном получают ту же пару, а не отзыв сессии
+REFRESH_REUSE_GRACE = timedelta(seconds=30)
+
+def normalize_email(email):
+    return email.strip().lower()
+
+def hash_password(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(BCRYPT_ROUNDS)).decode('utf-8')
+
+def hash_rounds(password_hash):
+    # Формат: $2b$<cost>$<salt+hash>
+    return int(password_hash.split('$')[2])
+
+def rehash_password(dynamodb, login, password):
+    """Перехеширование с текущей стоимостью после успешного входа."""
+    password_hash = hash_password(password)
+    now = datetime.utcnow().isoformat()
+
+    dynamodb.transact_write_items(TransactItems=[
+        {
+            'Update': {
+                'TableName': 'user_emails',
+                'Key': {'email': login['email']},
+                'UpdateExpression': 'SET password_hash = :new',
+                'ConditionExpression': 'password_hash = :old',
+                'ExpressionAttributeValues': {':new': password_hash, ':old': login['password_hash']}
+            }
+        },
+        {
+            'Update': {
+                'TableName': 'users',
+                'Key': {'user_id': login['user_id']},
+                'UpdateExpression': 'SET password_hash = :new, updated_at = :now',
+                'ExpressionAttributeValues': {':new': password_hash, ':now': now}
             }
+        }
+    ])
+
+def hash_refresh_secret(secret):
+    return hashlib.sha256(secret.encode('utf-8')).hexdigest()
+
+def new_session(user_id, email):
+    """Запись сессии и refresh-токен вида <session_id>.<secret>.
+
+    В таблице sessions хранится только хеш секрета.
+    """
+    session_id = str(uuid.uuid4())
+    secret = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+
+    session = {
+        'session_id': session_id,
+        'user_id': user_id,
+        'email': email,
+        'token_hash': hash_refresh_secret(secret),
+        'revoked': False,
+        'created_at': now.isoformat(),
+        'rotated_at': now.isoformat(),
+        'expires_at': (now + REFRESH_TOKEN_TTL).isoformat()
+    }
+    return session, f"{session_id}.{secret}"
+
+def rotated_secret(session_id, secret):
+    """Секрет, которым ротация заменяет secret.
+
+    Выводится из предъявленного секрета ключом сервера, поэтому повторная
+    ротация тем же токеном даёт тот же результат и не требует хранить секрет.
+    """
+    digest = hmac.new(get_secret().encode('utf-8'), f"{session_id}.{secret}".encode('utf-8'), hashlib.sha256)
+    return base64.urlsafe_b64encode(digest.digest()).rstrip(b'=').decode('ascii')
+
+def parse_refresh_token(refresh_token):
+    session_id, _, secret = (refresh_token or '').partition('.')
+    return (session_id, secret) if session_id and secret else (None, None)
+
+def token_body(user, refresh_token):
+    return {
+        'success': True,
+        'token': issue_token(user['user_id'], user['email']),
+        'refresh_token': refresh_token,
+        'expires_in': int(ACCESS_TOKEN_TTL.total_seconds()),
+        'user': user
+    }
 
+def refresh_session(dynamodb, refresh_token):
+    """Ротация refresh-токена; возвращает (user, новый токен) или None.
+
+    Здесь и только здесь проверяется отзыв: отозванная или истёкшая сессия,
+    неактивный пользователь. Повторное предъявление уже ротированного токена
+    считается утечкой и отзывает сессию целиком — кроме первых
+    REFRESH_REUSE_GRACE после ротации: тогда возвращается текущий токен.
+    """
+    sessions_table = dynamodb.Table('sessions')
+    session_id, secret = parse_refresh_token(refresh_token)
+    if not session_id:
+        return None
+
+    session = sessions_table.get_item(Key={'session_id': session_id}, ConsistentRead=True).get('Item')
+    now = datetime.utcnow()
+    if not session or session.get('revoked') or session['expires_at'] <= now.isoformat():
+        return None
+
+    presented_hash = hash_refresh_secret(secret)
+    new_secret = rotated_secret(session_id, secret)
+    already_rotated = presented_hash != session['token_hash']
+    if already_rotated:
+        if presented_hash != session.get('previous_token_hash'):
+            return None
+        if now - datetime.fromisoformat(session['rotated_at']) > REFRESH_REUSE_GRACE:
+            revoke_session(dynamodb, session_id)
+            return None
+        if hash_refresh_secret(new_secret) != session['token_hash']:
+            # Токен успели ротировать ещё раз
+            return None
+
+    user = dynamodb.Table('users').get_item(
+        Key={'user_id': session['user_id']},
+        ProjectionExpression='user_id, email, username, is_active'
+    ).get('Item')
+    if not user or not user.get('is_active', True):
+        revoke_session(dynamodb, session_id)
+        return None
+
+    if not already_rotated:
         try:
-            response = users_table.query(
-                IndexName='idx_email',
-                KeyConditionExpression='email = :email',
-                ExpressionAttributeValues={':email': data['email']}
+            sessions_table.update_item(
+                Key={'session_id': session_id},
+                UpdateExpression='SET token_hash = :new, previous_token_hash = :old, rotated_at = :now',
+                ConditionExpression='token_hash = :old AND revoked = :no',
+                ExpressionAttributeValues={
+                    ':new': hash_refresh_secret(new_secret),
+                    ':old': presented_hash,
+                    ':now': now.isoformat(),
+                    ':no': False
+                }
             )
+        except sessions_table.meta.client.exceptions.ConditionalCheckFailedException:
+            # Параллельное обновление тем же токеном записывает тот же new_secret;
+            # иначе сессию отозвали или ротировали дальше
+            session = sessions_table.get_item(Key={'session_id': session_id}, ConsistentRead=True).get('Item')
+            if not session or session.get('revoked') or session['token_hash'] != hash_refresh_secret(new_secret):
+                return None
 
-            if response['Items']:
-                return {
-                    'statusCode': 409,
-                    'body': json.dumps({'error': 'User already exists'})
-                }
+    user = {'user_id': user['user_id'], 'email': user['email'], 'username': user.get('username')}
+    return user, f"{session_id}.{new_secret}"
 
-            user_id = str(uuid.uuid4())
-            password_hash = bcrypt.hashpw(
-                data['password'].encode('utf-8'),
-                bcrypt.gensalt()
-            ).decode('utf-8')
+def revoke_session(dynamodb, session_id):
+    dynamodb.Table('sessions').update_item(
+        Key={'session_id': session_id},
+        UpdateExpression='SET revoked = :yes, revoked_at = :now',
+        ExpressionAttributeValues={':yes': True, ':now': datetime.utcnow().isoformat()}
+    )
 
-            users_table.put_item(Item={
-                'user_id': user_id,
-                'email': data['email'],
-                'username': data.get('username', data['email'].split('@')[0]),
-                'password_hash': password_hash,
-                'display_name': data.get('display_name', ''),
-                'role': 'user',
-                'created_at': datetime.utcnow().isoformat(),
-                'updated_at': datetime.utcnow().isoformat(),
-                'is_active': True
-            })
-
-            token = jwt.encode({
-                'user_id': user_id,
-                'email': data['email'],
-                'exp': datetime.utcnow() + timedelta(days=7)
-            }, os.environ['JWT_SECRET'], algorithm='HS256')
+@instrumented('auth')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+
+    # user_emails — ключ уникальности email и модель чтения для входа:
+    # хранит user_id и password_hash, поэтому вход — один get_item
+    user_emails_table = dynamodb.Table('user_emails')
+    data = json.loads(event['body'])
+    path = event.get('path', '')
 
+    if path.endswith('/refresh'):
+        try:
+            refreshed = refresh_session(dynamodb, data.get('refresh_token'))
+        except Exception as e:
             return {
-                'statusCode': 201,
-                'body': json.dumps({
-                    'success': True,
-                    'token': token,
-                    'user': {
-                        'user_id': user_id,
-                        'email': data['email']
-                    }
-                })
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)})
             }
 
+        if not refreshed:
+            return {
+                'statusCode': 401,
+                'body': json.dumps({'error': 'Invalid refresh token'})
+            }
+
+        user, refresh_token = refreshed
+        return {
+            'statusCode': 200,
+            'body': json.dumps(token_body(user, refresh_token))
+        }
+
+    elif path.endswith('/logout'):
+        session_id, secret = parse_refresh_token(data.get('refresh_token'))
+        if not session_id:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Missing refresh token'})
+            }
+
+        try:
+            session = dynamodb.Table('sessions').get_item(
+                Key={'session_id': session_id},
+                ConsistentRead=True
+            ).get('Item')
+            # Выход по любому из токенов сессии, включая только что ротированный
+            if session and hash_refresh_secret(secret) in (
+                    session['token_hash'], session.get('previous_token_hash')):
+                revoke_session(dynamodb, session_id)
         except Exception as e:
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': str(e)})
             }
 
-    elif event['httpMethod'] == 'GET' and 'path' in event and event['path'].endswith('/login'):
+        return {
+            'statusCode': 200,
+            'body': json.dumps({'success': True})
+        }
+
+    elif path.endswith('/login'):
+        if 'email' not in data or 'password' not in data:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Missing email or password'})
+            }
+
         try:
-            response = users_table.query(
-                IndexName='idx_email',
-                KeyConditionExpression='email = :email',
-                ExpressionAttributeValues={':email': data['email']}
-            )
+            login = user_emails_table.get_item(
+                Key={'email': normalize_email(data['email'])},
+                ConsistentRead=True
+            ).get('Item')
 
-            if not response['Items']:
+            if not login:
                 return {
                     'statusCode': 401,
                     'body': json.dumps({'error': 'Invalid credentials'})
                 }
 
-            user = response['Items'][0]
-
             if not bcrypt.checkpw(
                     data['password'].encode('utf-8'),
-                    user['password_hash'].encode('utf-8')
+                    login['password_hash'].encode('utf-8')
             ):
                 return {
                     'statusCode': 401,
                     'body': json.dumps({'error': 'Invalid credentials'})
                 }
 
-            token = jwt.encode({
-                'user_id': user['user_id'],
-                'email': user['email'],
-                'exp': datetime.utcnow() + timedelta(days=7)
-            }, os.environ['JWT_SECRET'], algorithm='HS256')
+            if hash_rounds(login['password_hash']) != BCRYPT_ROUNDS:
+                try:
+                    rehash_password(dynamodb, login, data['password'])
+                except Exception as e:
+                    # Вход не должен зависеть от перехеширования: повторим в следующий раз
+                    print(f"Ошибка перехеширования пароля: {str(e)}")
+
+            session, refresh_token = new_session(login['user_id'], login['email'])
+            dynamodb.Table('sessions').put_item(Item=session)
 
             return {
                 'statusCode': 200,
-                'body': json.dumps({
-                    'success': True,
-                    'token': token,
-                    'user': {
-                        'user_id': user['user_id'],
-                        'email': user['email'],
-                        'username': user.get('username')
-                    }
-                })
+                'body': json.dumps(token_body({
+                    'user_id': login['user_id'],
+                    'email': login['email'],
+                    'username': login.get('username')
+                }, refresh_token))
+            }
+
+        except Exception as e:
+            return {
+                'statusCode': 500,
+                'body': json.dumps({'error': str(e)})
             }
 
+    elif event['httpMethod'] == 'POST':
+        if 'email' not in data or 'password' not in data:
+            return {
+                'statusCode': 400,
+                'body': json.dumps({'error': 'Missing email or password'})
+            }
+
+        email = normalize_email(data['email'])
+        user_id = str(uuid.uuid4())
+        username = data.get('username', email.split('@')[0])
+        password_hash = hash_password(data['password'])
+        now = datetime.utcnow().isoformat()
+        session, refresh_token = new_session(user_id, email)
+
+        try:
+            # Пользователь и его email записываются одной транзакцией:
+            # условие на user_emails исключает дубликаты при гонке регистраций
+            dynamodb.transact_write_items(TransactItems=[
+                {
+                    'Put': {
+                        'TableName': 'user_emails',
+                        'Item': {
+                            'email': email,
+                            'user_id': user_id,
+                            'username': username,
+                            'password_hash': password_hash,
+                            'created_at': now
+                        },
+                        'ConditionExpression': 'attribute_not_exists(email)'
+                    }
+                },
+                {
+                    'Put': {
+                        'TableName': 'users',
+                        'Item': {
+                            'user_id': user_id,
+                            'email': email,
+                            'username': username,
+                            'password_hash': password_hash,
+                            'display_name': data.get('display_name', ''),
+                            'role': 'user',
+                            'created_at': now,
+                            'updated_at': now,
+                            'is_active': True
+                        },
+                        'ConditionExpression': 'attribute_not_exists(user_id)'
+                    }
+                },
+                {
+                    'Put': {
+                        'TableName': 'sessions',
+                        'Item': session
+                    }
+                }
+            ])
+        except dynamodb.exceptions.TransactionCanceledException as e:
+            reasons = [reason.get('Code') for reason in e.response.get('CancellationReasons', [])]
+            if 'ConditionalCheckFailed' not in reasons:
+                return {
+                    'statusCode': 500,
+                    'body': json.dumps({'error': str(e)})
+                }
+            return {
+                'statusCode': 409,
+                'body': json.dumps({'error': 'User already exists'})
+            }
         except Exception as e:
             return {
                 'statusCode': 500,
                 'body': json.dumps({'error': str(e)})
             }
+
+        return {
+            'statusCode': 201,
+            'body': json.dumps(token_body({
+                'user_id': user_id,
+                'email': email
+            }, refresh_token))
+        }
@@ -0,0 +1,94 @@
+"""Общая проверка JWT для всех функций.
+
+Секрет читается из окружения один раз на контейнер. Успешно проверенные
+токены кэшируются по SHA-256 от токена до их exp, поэтому повторные запросы
+того же пользователя в тёплом контейнере не выполняют HMAC-проверку заново.
+Все функции получают одинаковый неизменяемый объект claims.
+
+Access-токены живут ACCESS_TOKEN_TTL и проверяются без обращения к базе;
+отзыв сессий проверяется только при обновлении токена (POST /auth/refresh).
+"""
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from types import MappingProxyType
+
+from instrumentation import phase
+
+JWT_ALGORITHM = 'HS256'
+ACCESS_TOKEN_TTL = timedelta(minutes=15)
+TOKEN_CACHE_SIZE = 1024
+
+_secret = None
+_token_cache = OrderedDict()
+
+
+def get_secret():
+    global _secret
+    if _secret is None:
+        _secret = os.environ['JWT_SECRET']
+    return _secret
+
+
+def issue_token(user_id, email, expires_in=ACCESS_TOKEN_TTL):
+    import jwt
+    return jwt.encode({
+        'user_id': user_id,
+        'email': email,
+        'exp': datetime.utcnow() + expires_in
+    }, get_secret(), algorithm=JWT_ALGORITHM)
+
+
+def verify_token(token):
+    """Claims токена или None, если токен недействителен или истёк."""
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+    now = time.time()
+
+    cached = _token_cache.get(digest)
+    if cached is not None:
+        claims, expires_at = cached
+        if expires_at > now:
+            _token_cache.move_to_end(digest)
+            return claims
+        del _token_cache[digest]
+        return None
+
+    # PyJWT тянет за собой cryptography: импортируем только при проверке
+    # нового токена, запросы без токена и попадания в кэш обходятся без него
+    import jwt
+
+    try:
+        payload = jwt.decode(token, get_secret(), algorithms=[JWT_ALGORITHM])
+    except jwt.InvalidTokenError:
+        return None
+
+    claims = MappingProxyType(payload)
+    # Кэшируем только токены со сроком действия, иначе запись жила бы вечно
+    if isinstance(payload.get('exp'), (int, float)):
+        _token_cache[digest] = (claims, payload['exp'])
+        if len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+    return claims
+
+
+def get_bearer_token(event):
+    headers = event.get('headers') or {}
+    auth_header = headers.get('Authorization') or headers.get('authorization') or ''
+    if not auth_header.startswith('Bearer '):
+        return None
+    return auth_header[len('Bearer '):].strip() or None
+
+
+def get_claims(event):
+    """Claims из заголовка Authorization; None, если пользователь не авторизован."""
+    token = get_bearer_token(event)
+    if not token:
+        return None
+
+    with phase('auth'):
+        claims = verify_token(token)
+    if not claims or not claims.get('user_id'):
+        return None
+    return claims
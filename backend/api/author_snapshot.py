@@ -0,0 +1,89 @@
+"""Снимок профиля автора (author_snapshot) в постах и комментариях.
+
+create_post и comment_post записывают в элемент username, display_name,
+avatar_url и version — profile_version пользователя на момент записи, —
+поэтому лента обходится без чтения users. Изменение профиля через
+update_profile() увеличивает profile_version и ставит пользователя в
+очередь (propagation_pending, разреженный индекс users.idx_propagation);
+propagate_authors переписывает снимки в его постах и комментариях.
+Снимок с версией не ниже текущей не перезаписывается, поэтому повторный
+или запоздавший проход ничего не портит.
+"""
+
+SNAPSHOT_FIELDS = ('username', 'display_name', 'avatar_url')
+
+PROFILE_ATTRIBUTES = ['user_id', *SNAPSHOT_FIELDS, 'profile_version']
+
+PROPAGATION_PENDING = 'pending'
+
+def snapshot_of(user):
+    snapshot = {name: user.get(name, '') for name in SNAPSHOT_FIELDS}
+    snapshot['version'] = user.get('profile_version', 0)
+    return snapshot
+
+def load_snapshot(dynamodb, user_id):
+    """Снимок профиля пользователя или None, если его нет."""
+    user = dynamodb.Table('users').get_item(
+        Key={'user_id': user_id},
+        AttributesToGet=PROFILE_ATTRIBUTES
+    ).get('Item')
+    return snapshot_of(user) if user else None
+
+def author_info(user_id, snapshot):
+    """author_info для ответа API из снимка."""
+    return {
+        'user_id': user_id,
+        'username': snapshot.get('username', ''),
+        'display_name': snapshot.get('display_name', ''),
+        'avatar_url': snapshot.get('avatar_url', '')
+    }
+
+def update_profile(dynamodb, user_id, changes):
+    """Изменение отображаемых полей профиля; возвращает новый снимок.
+
+    Одним запросом увеличивает profile_version и ставит пользователя в
+    очередь propagate_authors.
+    """
+    fields = {name: value for name, value in changes.items() if name in SNAPSHOT_FIELDS}
+    if not fields:
+        raise ValueError('Нет изменяемых полей профиля')
+
+    assignments = [f'#{name} = :{name}' for name in fields]
+    response = dynamodb.Table('users').update_item(
+        Key={'user_id': user_id},
+        UpdateExpression='SET ' + ', '.join(assignments) + ', '
+                         'profile_version = if_not_exists(profile_version, :zero) + :one, '
+                         'propagation_pending = :pending',
+        ConditionExpression='attribute_exists(user_id)',
+        ExpressionAttributeNames={f'#{name}': name for name in fields},
+        ExpressionAttributeValues={
+            **{f':{name}': value for name, value in fields.items()},
+            ':zero': 0, ':one': 1, ':pending': PROPAGATION_PENDING
+        },
+        ReturnValues='ALL_NEW'
+    )
+    return snapshot_of(response['Attributes'])
+
+def apply_snapshot(table, key, snapshot, stamp=None):
+    """Запись снимка в элемент, если в нём нет снимка или он старее; True, если записан.
+
+    stamp — метка изменения (post_changes.change_stamp), которая ставится
+    тем же UpdateItem: для постов, чтобы новый снимок попал в GET /posts/changes.
+    """
+    assignments = 'author_snapshot = :snapshot'
+    values = {':snapshot': snapshot, ':version': snapshot['version']}
+    for name, value in (stamp or {}).items():
+        assignments += f', {name} = :{name}'
+        values[f':{name}'] = value
+    try:
+        table.update_item(
+            Key=key,
+            UpdateExpression='SET ' + assignments,
+            ConditionExpression='attribute_exists(#key) AND '
+                                '(attribute_not_exists(author_snapshot) OR author_snapshot.version < :version)',
+            ExpressionAttributeNames={'#key': next(iter(key))},
+            ExpressionAttributeValues=values
+        )
+        return True
+    except table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
@@ -0,0 +1,83 @@
+"""Сборка снимка первой страницы ленты (см. feed_snapshot).
+
+Запускается по таймеру раз в минуту. Если после прошлой сборки
+опубликованные посты не менялись и снимок моложе SNAPSHOT_MAX_AGE,
+ничего не делает. Страница собирается
+get_posts.feed_page с параметрами анонимного GET /posts; если часть
+обогащения не успела, прежний снимок остаётся до следующего запуска.
+Вызов с {"force": true} пересобирает страницу без проверки счётчика.
+"""
+import hashlib
+import json
+from datetime import datetime
+
+from db import get_dynamodb
+from feed_snapshot import CURRENT_KEY, FEED_ID, SNAPSHOT_MAX_AGE, SNAPSHOT_PREFIX
+from get_posts import enrichment_deadline, feed_page, parse_params, success_response
+from instrumentation import instrumented, phase
+from post_changes import changes_cursor
+from storage import bucket_name, get_s3, public_url
+
+SNAPSHOT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+CURRENT_CACHE_CONTROL = 'public, max-age=60, stale-while-revalidate=300'
+
+def publish(body, version, built_at):
+    """Неизменяемый снимок и его копия по постоянному адресу."""
+    s3 = get_s3()
+    for key, cache_control in ((f'{SNAPSHOT_PREFIX}{version}.json', SNAPSHOT_CACHE_CONTROL),
+                               (CURRENT_KEY, CURRENT_CACHE_CONTROL)):
+        s3.put_object(
+            Bucket=bucket_name(),
+            Key=key,
+            Body=body.encode('utf-8'),
+            ContentType='application/json',
+            CacheControl=cache_control,
+            Metadata={'version': version, 'built-at': built_at},
+            ACL='public-read'
+        )
+
+@instrumented('build_feed_snapshot')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+    state_table = dynamodb.Table('feed_state')
+
+    state = state_table.get_item(Key={'feed_id': FEED_ID}, ConsistentRead=True).get('Item') or {}
+    change_version = state.get('change_version', 0)
+    force = isinstance(event, dict) and event.get('force')
+    fresh = state.get('built_at', '') > (datetime.utcnow() - SNAPSHOT_MAX_AGE).isoformat()
+    if not force and fresh and 'version' in state and change_version <= state.get('built_version', -1):
+        return {'statusCode': 200, 'built': False, 'version': state['version']}
+
+    params = parse_params({})
+    cursor = changes_cursor()
+    response, enriched_posts, degraded = feed_page(dynamodb, params, enrichment_deadline(context))
+    if degraded:
+        print(f"Снимок ленты не опубликован, не успели: {', '.join(degraded)}")
+        return {'statusCode': 503, 'built': False, 'degraded': degraded}
+
+    # Версия — хеш содержимого без времени сборки: та же страница не публикуется повторно
+    version = hashlib.sha256(success_response(params, response, enriched_posts)['body'].encode('utf-8')).hexdigest()[:16]
+    built_at = datetime.utcnow().isoformat()
+
+    if version != state.get('version'):
+        body = success_response(params, response, enriched_posts, extra_meta={'changes_cursor': cursor, 'snapshot': {
+            'version': version,
+            'built_at': built_at,
+            'url': public_url(f'{SNAPSHOT_PREFIX}{version}.json')
+        }})['body']
+        with phase('publish'):
+            publish(body, version, built_at)
+
+    try:
+        state_table.update_item(
+            Key={'feed_id': FEED_ID},
+            UpdateExpression='SET built_version = :built, version = :version, built_at = :built_at',
+            ConditionExpression='attribute_not_exists(built_version) OR built_version <= :built',
+            ExpressionAttributeValues={':built': change_version, ':version': version, ':built_at': built_at}
+        )
+    except state_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Параллельный запуск уже записал более новую сборку
+        pass
+
+    print(f"Снимок ленты {version}: постов {len(enriched_posts)}, изменений {change_version}")
+    return {'statusCode': 200, 'built': True, 'version': version}
@@ -1,11 +1,16 @@
-import os
-import boto3
 import json
-import jwt
 import uuid
 from datetime import datetime
 from decimal import Decimal
 
+from auth_middleware import get_claims
+from author_snapshot import PROFILE_ATTRIBUTES, author_info, snapshot_of
+from db import get_dynamodb
+from feed_snapshot import mark_counters_changed
+from instrumentation import instrumented
+from recent_comments import PREVIEW_ATTRIBUTES, push_comment
+from trending import refresh_score
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -14,18 +19,6 @@ class DecimalEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-def get_token_payload(auth_header):
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    try:
-        return jwt.decode(
-            auth_header.split(' ')[1],
-            os.environ.get('JWT_SECRET'),
-            algorithms=['HS256']
-        )
-    except:
-        return None
-
 def create_response(status_code, body, headers=None):
     base_headers = {
         'Content-Type': 'application/json',
@@ -39,23 +32,18 @@ def create_response(status_code, body, headers=None):
         'body': json.dumps(body, cls=DecimalEncoder)
     }
 
-def handler(event):
-    dynamodb = boto3.resource('dynamodb',
-                              endpoint_url=os.environ['YDB_ENDPOINT'],
-                              region_name=os.environ['YDB_REGION'],
-                              aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-                              aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-                              )
+@instrumented('comment_post')
+def handler(event, context):
+    dynamodb = get_dynamodb()
 
     comments_table = dynamodb.Table('comments')
     posts_table = dynamodb.Table('posts')
     users_table = dynamodb.Table('users')
-    headers = event.get('headers', {})
-    auth_header = headers.get('Authorization') or headers.get('authorization')
-
-    if not (payload := get_token_payload(auth_header)) or not (user_id := payload.get('user_id')):
+    if not (payload := get_claims(event)):
         return create_response(401, {'success': False, 'error': 'Неверный токен'})
 
+    user_id = payload['user_id']
+
     try:
         body = event.get('body', '{}')
         data = json.loads(body) if isinstance(body, str) else body
@@ -80,7 +68,7 @@ def handler(event):
     try:
         post = posts_table.get_item(
             Key={'post_id': post_id},
-            AttributesToGet=['post_id', 'author_id', 'status', 'title']
+            AttributesToGet=PREVIEW_ATTRIBUTES + ['likes_count', 'created_at', 'published_at', 'author_id', 'status', 'title']
         ).get('Item')
 
         if not post or post.get('status') != 'published':
@@ -94,7 +82,7 @@ def handler(event):
     try:
         user = users_table.get_item(
             Key={'user_id': user_id},
-            AttributesToGet=['user_id', 'username', 'display_name', 'is_active']
+            AttributesToGet=PROFILE_ATTRIBUTES + ['is_active']
         ).get('Item')
 
         if not user or not user.get('is_active', True):
@@ -136,17 +124,20 @@ def handler(event):
         'is_active': True
     }
 
+    if user:
+        comment_data['author_snapshot'] = snapshot_of(user)
+
     if parent_comment_id:
         comment_data['parent_comment_id'] = parent_comment_id
 
     try:
         comments_table.put_item(Item=comment_data)
 
-        posts_table.update_item(
-            Key={'post_id': post_id},
-            UpdateExpression='SET comments_count = if_not_exists(comments_count, :zero) + :inc',
-            ExpressionAttributeValues={':inc': 1, ':zero': 0}
-        )
+        comments_count = push_comment(posts_table, post, comment_data)
+        if comments_count is not None:
+            refresh_score(posts_table, dict(post, comments_count=comments_count))
+            # Комментируются только опубликованные посты
+            mark_counters_changed(dynamodb)
 
         response_comment = {
             'comment_id': comment_id,
@@ -154,18 +145,15 @@ def handler(event):
             'user_id': user_id,
             'text': text,
             'created_at': comment_data['created_at'],
-            'author_info': {
-                'user_id': user_id,
-                'username': user.get('username', ''),
-                'display_name': user.get('display_name', '')
-            }
+            'author_info': author_info(user_id, snapshot_of(user))
         }
 
         if parent_comment_id:
             response_comment['parent_comment_id'] = parent_comment_id
 
         return create_response(201, {
-            'success': Tr
+            'success': True,
+            'comment': response_comment
         })
 
     except Exception as e:
@@ -1,67 +1,30 @@
-import os
-import boto3
 import json
-import jwt
 import uuid
-import re
-import base64
 from datetime import datetime
+from decimal import Decimal
 from urllib.parse import urlparse
 
-def slugify(text):
-    text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
-    return text.strip('-')
+from auth_middleware import get_claims
+from author_snapshot import load_snapshot
+from db import get_dynamodb
+from feed_snapshot import affects_first_page, mark_feed_changed
+from image_refs import acquire_image, release_image
+from instrumentation import instrumented
+from post_changes import change_stamp
+from slugs import claim_slug, release_slug
+from timelines import FANOUT_PENDING
+from trending import trending_score, trending_shard
+from storage import base64_image_restorer, is_user_image_key, public_url, store_base64_image
 
-def upload_to_s3(base64_data, filename):
-    if 'base64,' in base64_data:
-        base64_data = base64_data.split('base64,')[1]
-    
-    image_bytes = base64.b64decode(base64_data)
-    
-    if len(image_bytes) > 10 * 1024 * 1024:
-        raise ValueError("Изображение слишком большое (максимум 10MB)")
-    
-    s3 = boto3.client(
-        's3',
-        endpoint_url=os.environ['BUCKET_ENDPOINT'],
-        region_name='YDB_REGION',
-        aws_access_key_id=os.environ.get('S3_ACCESS_KEY'),
-        aws_secret_access_key=os.environ.get('S3_SECRET_KEY')
-    )
-    
-    mime_type = 'image/jpeg'
-    if base64_data.startswith('iVBORw0KGgo'):
-        mime_type = 'image/png'
-    elif base64_data.startswith('/9j/'):
-        mime_type = 'image/jpeg'
-    elif base64_data.startswith('R0lGOD'):
-        mime_type = 'image/gif'
-
-    ext_map = {
-        'image/png': '.png',
-        'image/jpeg': '.jpg',
-        'image/gif': '.gif',
-        'image/webp': '.webp'
-    }
-    extension = ext_map.get(mime_type, '.jpg')
-
-    s3_filename = f"posts/{uuid.uuid4()}{extension}"
-
-    s3.put_object(
-        Bucket=os.environ.get('S3_BUCKET_NAME', 'echo-bucket-images'),
-        Key=s3_filename,
-        Body=image_bytes,
-        ContentType=mime_type,
-        ACL='public-read'
-    )
-
-    return f"https://storage.yandexcloud.net/{os.environ.get('S3_BUCKET_NAME')}/{s3_filename}"
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj)
+        return super().default(obj)
 
+@instrumented('create_post')
 def handler(event, context):
-    auth_header = event.get('headers', {}).get('Authorization')
-    if not auth_header or not auth_header.startswith('Bearer '):
+    if not (payload := get_claims(event)):
         return {
             'statusCode': 401,
             'headers': {
@@ -70,31 +33,8 @@ def handler(event, context):
             },
             'body': json.dumps({'success': False, 'error': 'Authorization required'})
         }
-
-    token = auth_header.split(' ')[1]
-
-    try:
-        payload = jwt.decode(
-            token, 
-            os.environ.get('JWT_SECRET'), 
-            algorithms=['HS256']
-        )
-    except Exception as e:
-        return {
-            'statusCode': 401,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*'
-            },
-            'body': json.dumps({'success': False, 'error': f'Invalid token: {str(e)}'})
-        }
     
-    dynamodb = boto3.resource('dynamodb',
-                              endpoint_url=os.environ['YDB_ENDPOINT'],
-                              region_name=os.environ['YDB_REGION'],
-                              aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-                              aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-                              )
+    dynamodb = get_dynamodb()
 
     posts_table = dynamodb.Table('posts')
     
@@ -116,11 +56,27 @@ def handler(event, context):
             }
 
         img_url = data.get('imgUrl', '')
+        image_key = data.get('image_key', '')
+        restore_image = None
 
-        if img_url and 'base64,' in img_url:
+        if image_key:
+            # Изображение уже загружено клиентом по presigned URL из /uploads
+            if not is_user_image_key(image_key, payload['user_id']):
+                return {
+                    'statusCode': 400,
+                    'headers': {
+                        'Content-Type': 'application/json',
+                        'Access-Control-Allow-Origin': '*'
+                    },
+                    'body': json.dumps({'success': False, 'error': 'Invalid image_key'})
+                }
+            img_url = public_url(image_key)
+        elif img_url and 'base64,' in img_url:
             try:
                 print("Загрузка изображения в S3...")
-                img_url = upload_to_s3(img_url, f"post_{uuid.uuid4()}")
+                image_key, uploaded = store_base64_image(img_url)
+                restore_image = base64_image_restorer(image_key, img_url, uploaded=uploaded)
+                img_url = public_url(image_key)
                 print(f"Изображение загружено: {img_url}")
             except Exception as e:
                 return {
@@ -148,24 +104,58 @@ def handler(event, context):
             }
         
         post_id = str(uuid.uuid4())
-        slug = data.get('slug') or slugify(data['title'])
+        now = datetime.utcnow()
 
         post_item = {
             'post_id': post_id,
             'title': data['title'].strip(),
             'text': data.get('text', '').strip(),
             'imgUrl': img_url if img_url else '',
-            'slug': slug,
             'status': data.get('status', 'draft'),
             'author_id': payload['user_id'],
-            'created_at': datetime.utcnow().isoformat(),
-            'updated_at': datetime.utcnow().isoformat(),
+            'created_at': now.isoformat(),
+            **change_stamp(now),
             'views_count': 0,
             'likes_count': 0,
-            'comments_count': 0
+            'comments_count': 0,
+            'trending_score': trending_score(0, 0, now)
         }
 
-        posts_table.put_item(Item=post_item)
+        # Опубликованный пост раскладывается по лентам подписчиков (fanout_timeline)
+        if post_item['status'] == 'published':
+            post_item['published_at'] = now.isoformat()
+            post_item['fanout_pending'] = FANOUT_PENDING
+            post_item['trending_shard'] = trending_shard(post_id)
+
+        # Снимок профиля автора: лента не читает users
+        author_snapshot = load_snapshot(dynamodb, payload['user_id'])
+        if author_snapshot:
+            post_item['author_snapshot'] = author_snapshot
+
+        # Ссылка на изображение и slug занимаются до записи поста и освобождаются,
+        # если пост не записан: иначе загруженный объект и slug остались бы ничьими
+        image_acquired = False
+        slug = None
+        try:
+            if image_key:
+                post_item['image_key'] = image_key
+                # Варианты могли быть построены image_worker до создания поста
+                # или уже существовать для того же содержимого
+                post_item.update(acquire_image(dynamodb, image_key, restore_image))
+                image_acquired = True
+
+            # При конфликте slug получает числовой суффикс
+            slug = post_item['slug'] = claim_slug(dynamodb, data.get('slug') or data['title'], post_id)
+
+            posts_table.put_item(Item=post_item)
+        except Exception:
+            if image_acquired:
+                release_image(dynamodb, image_key)
+            release_slug(dynamodb, slug, post_id)
+            raise
+
+        if affects_first_page(post_item['status']):
+            mark_feed_changed(dynamodb)
 
         return {
             'statusCode': 201,
@@ -176,7 +166,7 @@ def handler(event, context):
             'body': json.dumps({
                 'success': True,
                 'post': post_item
-            })
+            }, cls=DecimalEncoder)
         }
         
     except json.JSONDecodeError:
@@ -1,269 +1,12 @@
-import boto3
-import os
+from migrate import get_client, migrate
 
-def create_tables_with_documentapi():
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=os.environ['YDB_ENDPOINT'],
-        region_name=os.environ['YDB_REGION'],
-        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY'],
-        aws_session_token=os.environ['AWS_SESSION_TOKEN']
-    )
+def create_tables_with_documentapi(client=None):
+    """Создание схемы через миграции: повторный запуск безопасен.
 
-    users_table = dynamodb.create_table(
-        TableName='users',
-        KeySchema=[
-            {
-                'AttributeName': 'user_id',
-                'KeyType': 'HASH'
-            }
-        ],
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'user_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'email',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'username',
-                'AttributeType': 'S'
-            }
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'idx_email',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'email',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            },
-            {
-                'IndexName': 'idx_username',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'username',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        BillingMode='PAY_PER_REQUEST'
-    )
-
-    print(f"✓ Таблица users создана")
-    print(f"  Поля: user_id (PK), username, email, password_hash, display_name, role, created_at, updated_at, is_active")
-
-    posts_table = dynamodb.create_table(
-        TableName='posts',
-        KeySchema=[
-            {
-                'AttributeName': 'post_id',
-                'KeyType': 'HASH'
-            }
-        ],
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'post_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'author_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'status',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'slug',
-                'AttributeType': 'S'
-            }
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'idx_author',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'author_id',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            },
-            {
-                'IndexName': 'idx_slug',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'slug',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            },
-            {
-                'IndexName': 'idx_status',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'status',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        BillingMode='PAY_PER_REQUEST'
-    )
-
-    print(f"✓ Таблица posts создана")
-    print(f"  Поля: post_id (PK), title, text, imgUrl, slug, status, author_id, created_at, updated_at, views_count, likes_count")
-
-    post_likes_table = dynamodb.create_table(
-        TableName='post_likes',
-        KeySchema=[
-            {
-                'AttributeName': 'post_id',
-                'KeyType': 'HASH'
-            },
-            {
-                'AttributeName': 'user_id',
-                'KeyType': 'RANGE'
-            }
-        ],
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'post_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'user_id',
-                'AttributeType': 'S'
-            }
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'idx_user',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'user_id',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        BillingMode='PAY_PER_REQUEST'
-    )
-
-    print(f"✓ Таблица post_likes создана")
-
-    comments_table = dynamodb.create_table(
-        TableName='comments',
-        KeySchema=[
-            {
-                'AttributeName': 'comment_id',
-                'KeyType': 'HASH'
-            }
-        ],
-        AttributeDefinitions=[
-            {
-                'AttributeName': 'comment_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'post_id',
-                'AttributeType': 'S'
-            },
-            {
-                'AttributeName': 'user_id',
-                'AttributeType': 'S'
-            }
-        ],
-        GlobalSecondaryIndexes=[
-            {
-                'IndexName': 'idx_comments_post',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'post_id',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            },
-            {
-                'IndexName': 'idx_comments_user',
-                'KeySchema': [
-                    {
-                        'AttributeName': 'user_id',
-                        'KeyType': 'HASH'
-                    }
-                ],
-                'Projection': {
-                    'ProjectionType': 'ALL'
-                },
-                'ProvisionedThroughput': {
-                    'ReadCapacityUnits': 5,
-                    'WriteCapacityUnits': 5
-                }
-            }
-        ],
-        BillingMode='PAY_PER_REQUEST'
-    )
-
-    print(f"✓ Таблица comments создана")
-    print(f"  Поля: comment_id (PK), post_id, user_id, text, created_at, updated_at")
-
-    return dynamodb
+    Описание таблиц и индексов находится в schema.py, применение — в migrate.py.
+    """
+    return migrate(client or get_client())
 
 if __name__ == '__main__':
-    db = create_tables_with_documentapi()
+    create_tables_with_documentapi()
     print("Все таблицы созданы успешно!")
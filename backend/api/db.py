@@ -0,0 +1,460 @@
+"""Общий клиент YDB (Document API), создаётся один раз на контейнер.
+
+Вместо boto3.resource используется низкоуровневый клиент botocore: импорт
+boto3 и построение модели ресурсов занимают большую часть холодного старта
+на 128MB. Table повторяет используемую часть интерфейса boto3 Table и
+переводит значения Python в формат атрибутов DynamoDB и обратно.
+botocore импортируется при первом обращении к базе, поэтому ответы,
+не требующие базы (например, 401), не платят за него.
+
+Все вызовы идут через call(): ошибки перегрузки повторяются с
+экспоненциальной паузой и полным джиттером в пределах бюджета операции,
+а медленные чтения хеджируются — если ответ не пришёл за p95 операции,
+отправляется такой же запрос, и его ответ заменяет ошибку первого.
+
+    HEDGE_READS=off   # без хеджирования чтений
+"""
+import os
+import random
+import time
+from collections import deque
+from contextvars import copy_context
+from decimal import Decimal
+from types import SimpleNamespace
+
+from instrumentation import instrument, record_hedge, record_retry
+
+BATCH_WRITE_SIZE = 25
+BATCH_GET_SIZE = 100
+
+# Запрос отклонён из-за нагрузки и не выполнен: повтор безопасен
+THROTTLE_ERRORS = {
+    'ProvisionedThroughputExceededException', 'ThrottlingException', 'Throttling',
+    'RequestLimitExceeded', 'TooManyRequestsException', 'ThrottlingError'
+}
+# Временные ошибки сервиса: повторяются только для чтений, запись могла примениться
+TRANSIENT_ERRORS = {'InternalServerError', 'InternalFailure', 'ServiceUnavailable', 'ServiceUnavailableException'}
+
+READ_OPERATIONS = {'get_item', 'query', 'scan', 'batch_get_item', 'transact_get_items'}
+
+# Бюджет операции вместе с повторами, мс: после него ошибка отдаётся обработчику
+OPERATION_BUDGETS_MS = {
+    'get_item': 1000,
+    'query': 2000,
+    'scan': 3000,
+    'put_item': 2000,
+    'update_item': 2000,
+    'delete_item': 2000,
+    'batch_write_item': 5000,
+    'batch_get_item': 2000,
+    'transact_write_items': 3000,
+}
+DEFAULT_BUDGET_MS = 2000
+MAX_ATTEMPTS = 8
+BACKOFF_BASE_MS = 25
+BACKOFF_CAP_MS = 1000
+
+HEDGE_READS = os.environ.get('HEDGE_READS', 'on').lower() not in ('off', 'false', '0')
+# Порог хеджирования — p95 последних HEDGE_WINDOW успешных чтений операции
+HEDGE_WINDOW = 200
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_MS = 5
+# Доля дополнительных запросов от хеджирования не больше этой
+HEDGE_MAX_RATIO = 0.05
+
+_session = None
+_dynamodb = None
+
+
+def backoff_ms(attempt):
+    """Полный джиттер: случайная пауза от 0 до min(cap, base * 2^attempt)."""
+    return random.uniform(0, min(BACKOFF_CAP_MS, BACKOFF_BASE_MS * 2 ** attempt))
+
+
+def is_retryable(error, operation):
+    response = getattr(error, 'response', None)
+    if not isinstance(response, dict):
+        from botocore.exceptions import ConnectionError, HTTPClientError
+        return operation in READ_OPERATIONS and isinstance(error, (ConnectionError, HTTPClientError))
+
+    code = response.get('Error', {}).get('Code', '')
+    if code in THROTTLE_ERRORS:
+        return True
+    if code == 'TransactionCanceledException':
+        # Транзакция отменена только из-за перегрузки, а не по условию
+        reasons = [reason.get('Code') for reason in response.get('CancellationReasons', [])]
+        return 'ThrottlingError' in reasons and set(reasons) <= {'ThrottlingError', 'None', None}
+    status = response.get('ResponseMetadata', {}).get('HTTPStatusCode', 0)
+    return operation in READ_OPERATIONS and (code in TRANSIENT_ERRORS or status >= 500)
+
+
+class LatencyTracker:
+    """Задержки последних успешных чтений операции и порог хеджирования."""
+
+    def __init__(self):
+        self.samples = deque(maxlen=HEDGE_WINDOW)
+        self.threshold_ms = None
+        self.calls = 0
+        self.hedges = 0
+
+    def record(self, elapsed_ms):
+        self.samples.append(elapsed_ms)
+        if len(self.samples) >= HEDGE_MIN_SAMPLES and len(self.samples) % 10 == 0:
+            ordered = sorted(self.samples)
+            self.threshold_ms = max(ordered[int(len(ordered) * 0.95) - 1], HEDGE_MIN_MS)
+
+    def hedge_after_ms(self):
+        """Порог в мс или None, если хеджировать нельзя (мало замеров, исчерпана доля)."""
+        self.calls += 1
+        if self.threshold_ms is None or self.hedges >= self.calls * HEDGE_MAX_RATIO:
+            return None
+        return self.threshold_ms
+
+    def timed(self, method, params):
+        started = time.perf_counter()
+        response = method(**params)
+        self.record((time.perf_counter() - started) * 1000)
+        return response
+
+
+_trackers = {}
+_hedge_executor = None
+
+
+def tracker(operation):
+    if operation not in _trackers:
+        _trackers[operation] = LatencyTracker()
+    return _trackers[operation]
+
+
+def hedged_call(method, operation, params):
+    """Чтение с дублирующим запросом, если первый не ответил за порог.
+
+    Первая попытка выполняется в потоке вызова, пул нужен только дублю:
+    его отправляет таймер, когда порог истёк. Вызов возвращает ответ
+    первой попытки, а если она завершилась ошибкой — ответ дубля.
+    """
+    global _hedge_executor
+    latency = tracker(operation)
+    threshold_ms = latency.hedge_after_ms() if HEDGE_READS else None
+    if threshold_ms is None:
+        return latency.timed(method, params)
+
+    # threading и concurrent.futures нужны только тёплому контейнеру с накопленными замерами
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+
+    if _hedge_executor is None:
+        _hedge_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='hedge')
+    hedge = []
+
+    def start_hedge():
+        latency.hedges += 1
+        record_hedge(operation)
+        hedge.append(_hedge_executor.submit(copy_context().run, latency.timed, method, params))
+
+    # Копия контекста, чтобы обращения дубля учитывались в замере текущего вызова
+    timer = threading.Timer(threshold_ms / 1000, copy_context().run, (start_hedge,))
+    timer.daemon = True
+    timer.start()
+    try:
+        return latency.timed(method, params)
+    except Exception:
+        timer.cancel()
+        timer.join()
+        if not hedge:
+            raise
+        try:
+            return hedge[0].result()
+        except Exception:
+            pass
+        raise
+    finally:
+        timer.cancel()
+
+
+class UnprocessedError(Exception):
+    """Пакетная операция не уложилась в повторы: unprocessed — запросы, которые не выполнены."""
+
+    def __init__(self, operation, unprocessed):
+        super().__init__(f'{operation}: не обработано запросов: {len(unprocessed)}')
+        self.operation = operation
+        self.unprocessed = unprocessed
+
+
+def retry_unprocessed(operation, attempt, budget_deadline, unprocessed):
+    """Пауза перед повтором необработанных запросов с теми же пределами, что у call()."""
+    delay = backoff_ms(attempt) / 1000
+    if attempt + 1 >= MAX_ATTEMPTS or time.monotonic() + delay >= budget_deadline:
+        raise UnprocessedError(operation, unprocessed)
+    # Необработанные запросы — тоже признак перегрузки
+    record_retry(operation)
+    time.sleep(delay)
+
+
+def unprocessed_deadline(operation):
+    return time.monotonic() + OPERATION_BUDGETS_MS.get(operation, DEFAULT_BUDGET_MS) / 1000
+
+
+def call(client, operation, params):
+    """Вызов операции с повторами при перегрузке и хеджированием чтений."""
+    method = getattr(client, operation)
+    budget_deadline = time.monotonic() + OPERATION_BUDGETS_MS.get(operation, DEFAULT_BUDGET_MS) / 1000
+    attempt = 0
+    while True:
+        try:
+            if operation in READ_OPERATIONS:
+                return hedged_call(method, operation, params)
+            return method(**params)
+        except Exception as e:
+            if attempt + 1 >= MAX_ATTEMPTS or not is_retryable(e, operation):
+                raise
+            delay = backoff_ms(attempt) / 1000
+            if time.monotonic() + delay >= budget_deadline:
+                raise
+            record_retry(operation)
+            time.sleep(delay)
+            attempt += 1
+
+
+def new_client(service_name, **kwargs):
+    """Клиент botocore из общей на контейнер сессии."""
+    global _session
+    if _session is None:
+        import botocore.session
+        _session = botocore.session.get_session()
+    return instrument(_session.create_client(service_name, **kwargs))
+
+
+def serialize(value):
+    """Значение Python -> атрибут DynamoDB (как TypeSerializer из boto3)."""
+    if value is None:
+        return {'NULL': True}
+    if isinstance(value, bool):
+        return {'BOOL': value}
+    if isinstance(value, str):
+        return {'S': value}
+    if isinstance(value, (int, Decimal)):
+        return {'N': str(value)}
+    if isinstance(value, float):
+        raise TypeError('Float types are not supported. Use Decimal types instead.')
+    if isinstance(value, (bytes, bytearray)):
+        return {'B': bytes(value)}
+    if isinstance(value, dict):
+        return {'M': {name: serialize(item) for name, item in value.items()}}
+    if isinstance(value, (list, tuple)):
+        return {'L': [serialize(item) for item in value]}
+    if isinstance(value, (set, frozenset)):
+        if all(isinstance(item, str) for item in value):
+            return {'SS': list(value)}
+        if all(isinstance(item, (int, Decimal)) and not isinstance(item, bool) for item in value):
+            return {'NS': [str(item) for item in value]}
+        return {'BS': [bytes(item) for item in value]}
+    raise TypeError(f'Unsupported type "{type(value)}" for value "{value}"')
+
+
+def deserialize(attribute):
+    """Атрибут DynamoDB -> значение Python; числа возвращаются как Decimal."""
+    (kind, value), = attribute.items()
+    if kind == 'S' or kind == 'B' or kind == 'BOOL':
+        return value
+    if kind == 'N':
+        return Decimal(value)
+    if kind == 'NULL':
+        return None
+    if kind == 'M':
+        return {name: deserialize(item) for name, item in value.items()}
+    if kind == 'L':
+        return [deserialize(item) for item in value]
+    if kind == 'SS':
+        return set(value)
+    if kind == 'NS':
+        return {Decimal(item) for item in value}
+    if kind == 'BS':
+        return set(value)
+    raise TypeError(f'Unknown DynamoDB type "{kind}"')
+
+
+def serialize_map(values):
+    return {name: serialize(value) for name, value in values.items()}
+
+
+def deserialize_map(values):
+    return {name: deserialize(value) for name, value in values.items()}
+
+
+SERIALIZED_PARAMS = ('Key', 'Item', 'ExpressionAttributeValues', 'ExclusiveStartKey')
+DESERIALIZED_FIELDS = ('Item', 'Attributes', 'LastEvaluatedKey')
+
+
+def serialize_params(params):
+    params = dict(params)
+    for name in SERIALIZED_PARAMS:
+        if name in params:
+            params[name] = serialize_map(params[name])
+    return params
+
+
+def deserialize_response(response):
+    for name in DESERIALIZED_FIELDS:
+        if name in response:
+            response[name] = deserialize_map(response[name])
+    if 'Items' in response:
+        response['Items'] = [deserialize_map(item) for item in response['Items']]
+    return response
+
+
+class Table:
+    """Таблица с интерфейсом boto3 Table поверх низкоуровневого клиента."""
+
+    def __init__(self, client, name):
+        self.name = name
+        self.client = client
+        self.meta = SimpleNamespace(client=client)
+
+    def _call(self, operation, params):
+        response = call(self.client, operation, dict(serialize_params(params), TableName=self.name))
+        return deserialize_response(response)
+
+    def get_item(self, **params):
+        return self._call('get_item', params)
+
+    def put_item(self, **params):
+        return self._call('put_item', params)
+
+    def update_item(self, **params):
+        return self._call('update_item', params)
+
+    def delete_item(self, **params):
+        return self._call('delete_item', params)
+
+    def query(self, **params):
+        return self._call('query', params)
+
+    def scan(self, **params):
+        return self._call('scan', params)
+
+    def batch_writer(self):
+        return BatchWriter(self)
+
+
+class BatchWriter:
+    """Пакетная запись по 25 запросов с повтором необработанных.
+
+    Повторы ограничены как в call(): бюджет batch_write_item отсчитывается от
+    первого необработанного ответа, после него — UnprocessedError.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.requests = []
+
+    def put_item(self, Item):
+        self._add({'PutRequest': {'Item': serialize_map(Item)}})
+
+    def delete_item(self, Key):
+        self._add({'DeleteRequest': {'Key': serialize_map(Key)}})
+
+    def _add(self, request):
+        self.requests.append(request)
+        if len(self.requests) >= BATCH_WRITE_SIZE:
+            self._flush()
+
+    def _flush(self):
+        attempt = 0
+        budget_deadline = None
+        while self.requests:
+            batch, self.requests = self.requests[:BATCH_WRITE_SIZE], self.requests[BATCH_WRITE_SIZE:]
+            response = call(self.table.client, 'batch_write_item', {'RequestItems': {self.table.name: batch}})
+            unprocessed = response.get('UnprocessedItems', {}).get(self.table.name, [])
+            if unprocessed:
+                budget_deadline = budget_deadline or unprocessed_deadline('batch_write_item')
+                try:
+                    retry_unprocessed('batch_write_item', attempt, budget_deadline, unprocessed + self.requests)
+                except UnprocessedError:
+                    self.requests = []
+                    raise
+                attempt += 1
+                self.requests.extend(unprocessed)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self._flush()
+
+
+def query_all(table, **query_kwargs):
+    """Все элементы запроса Query постранично (генератор)."""
+    while True:
+        response = table.query(**query_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+class Database:
+    """Замена boto3.resource('dynamodb'): таблицы и транзакции."""
+
+    def __init__(self, client):
+        self.client = client
+        self.exceptions = client.exceptions
+        self.meta = SimpleNamespace(client=client)
+
+    def Table(self, name):
+        return Table(self.client, name)
+
+    def batch_get_item(self, RequestItems):
+        """Чтение по ключам пакетами по 100 с повтором необработанных ключей.
+
+        Повторы ограничены как в BatchWriter; ключи, которые не удалось
+        прочитать, — в UnprocessedError.unprocessed.
+        """
+        pending = [(name, serialize_map(key), request) for name, request in RequestItems.items()
+                   for key in request['Keys']]
+        responses = {name: [] for name in RequestItems}
+        attempt = 0
+        budget_deadline = None
+        while pending:
+            batch, pending = pending[:BATCH_GET_SIZE], pending[BATCH_GET_SIZE:]
+            request_items = {}
+            for name, key, request in batch:
+                table_request = request_items.setdefault(name, {k: v for k, v in request.items() if k != 'Keys'})
+                table_request.setdefault('Keys', []).append(key)
+            response = call(self.client, 'batch_get_item', {'RequestItems': request_items})
+            for name, items in response.get('Responses', {}).items():
+                responses[name].extend(deserialize_map(item) for item in items)
+            unprocessed = [(name, key, RequestItems[name])
+                           for name, request in response.get('UnprocessedKeys', {}).items() for key in request['Keys']]
+            if unprocessed:
+                budget_deadline = budget_deadline or unprocessed_deadline('batch_get_item')
+                retry_unprocessed('batch_get_item', attempt, budget_deadline,
+                                  [{name: deserialize_map(key)} for name, key, _ in unprocessed + pending])
+                attempt += 1
+                pending.extend(unprocessed)
+        return {'Responses': responses}
+
+    def transact_write_items(self, TransactItems, **params):
+        items = [
+            {action: serialize_params(request) for action, request in item.items()}
+            for item in TransactItems
+        ]
+        return call(self.client, 'transact_write_items', dict(params, TransactItems=items))
+
+
+def get_dynamodb():
+    global _dynamodb
+    if _dynamodb is None:
+        from botocore.config import Config
+
+        _dynamodb = Database(new_client(
+            'dynamodb',
+            endpoint_url=os.environ['YDB_ENDPOINT'],
+            region_name=os.environ['YDB_REGION'],
+            aws_access_key_id=os.environ['ACCESS_KEY_ID'],
+            aws_secret_access_key=os.environ['SECRET_ACCESS_KEY'],
+            # Повторы выполняет call(): у botocore они без джиттера и вне бюджета
+            config=Config(retries={'mode': 'standard', 'total_max_attempts': 1})
+        ))
+    return _dynamodb
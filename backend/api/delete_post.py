@@ -1,55 +1,34 @@
-import os
-import boto3
 import json
-import jwt
 from datetime import datetime, timedelta
+from decimal import Decimal
 
+from auth_middleware import get_claims
+from db import get_dynamodb
+from feed_snapshot import affects_first_page, mark_feed_changed
+from instrumentation import instrumented
+from post_changes import change_stamp
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        return int(obj) if isinstance(obj, Decimal) else super().default(obj)
+
+@instrumented('delete_post')
 def handler(event, context):
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=os.environ['YDB_ENDPOINT'],
-        region_name=os.environ['YDB_REGION'],
-        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-    )
+    dynamodb = get_dynamodb()
 
     posts_table = dynamodb.Table('posts')
 
     try:
-        headers = event.get('headers', {})
-        auth_header = headers.get('Authorization', headers.get('authorization', ''))
-
-        if not auth_header or not auth_header.startswith('Bearer '):
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'success': False, 'error': 'Требуется авторизация'})
-            }
-
-        token = auth_header.split(' ')[1]
-        try:
-            payload = jwt.decode(
-                token,
-                os.environ.get('JWT_SECRET', 'V4fy5zy070veLOC28z9cNg4FvviK9Mc/prHJyL0b/3s='),
-                algorithms=['HS256']
-            )
-            user_id = payload.get('user_id')
-            user_role = payload.get('role', 'user')
-
-            if not user_id:
-                return {
-                    'statusCode': 401,
-                    'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                    'body': json.dumps({'success': False, 'error': 'Неверный токен'})
-                }
-
-        except (jwt.ExpiredSignatureError, jwt.InvalidTokenError):
+        if not (payload := get_claims(event)):
             return {
                 'statusCode': 401,
                 'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
                 'body': json.dumps({'success': False, 'error': 'Неверный или истекший токен'})
             }
 
+        user_id = payload['user_id']
+        user_role = payload.get('role', 'user')
+
         query_params = event.get('queryStringParameters', {}) or {}
         post_id = query_params.get('post_id')
 
@@ -72,7 +51,7 @@ def handler(event, context):
         try:
             post_response = posts_table.get_item(
                 Key={'post_id': post_id},
-                AttributesToGet=['post_id', 'author_id', 'is_deleted']
+                AttributesToGet=['post_id', 'author_id', 'status', 'is_deleted']
             )
 
             if 'Item' not in post_response:
@@ -124,6 +103,7 @@ def handler(event, context):
 
             # Устанавливаем дату автоматического полного удаления (через 30 дней)
             permanent_delete_at = (current_time + timedelta(days=30)).isoformat()
+            stamp = change_stamp(current_time)
 
             update_response = posts_table.update_item(
                 Key={'post_id': post_id},
@@ -132,22 +112,29 @@ def handler(event, context):
                         deleted_at = :deleted_at,
                         deleted_by = :deleted_by,
                         permanent_delete_at = :permanent_delete_at,
-                        status = :status,
-                        updated_at = :updated_at
+                        #status = :status,
+                        updated_at = :updated_at,
+                        updated_day = :updated_day
+                    REMOVE trending_shard
                 """,
+                ExpressionAttributeNames={'#status': 'status'},
                 ExpressionAttributeValues={
                     ':deleted': True,
                     ':deleted_at': deleted_at,
                     ':deleted_by': user_id,
                     ':permanent_delete_at': permanent_delete_at,
                     ':status': 'deleted',
-                    ':updated_at': current_time.isoformat()
+                    ':updated_at': stamp['updated_at'],
+                    ':updated_day': stamp['updated_day']
                 },
                 ReturnValues='ALL_NEW'
             )
 
             updated_post = update_response.get('Attributes', {})
 
+            if affects_first_page(post.get('status')):
+                mark_feed_changed(dynamodb)
+
             return {
                 'statusCode': 200,
                 'headers': {
@@ -159,7 +146,7 @@ def handler(event, context):
                     'message': 'Пост помечен как удаленный. Полное удаление через 30 дней.',
                     'post': updated_post,
                     'permanent_delete_date': permanent_delete_at
-                })
+                }, cls=DecimalEncoder)
             }
 
         except Exception as e:
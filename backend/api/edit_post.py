@@ -1,11 +1,18 @@
-import os
-import boto3
 import json
-import jwt
-import re
 from datetime import datetime
 from decimal import Decimal
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, Optional, Tuple
+
+from auth_middleware import get_claims
+from db import get_dynamodb
+from feed_snapshot import affects_first_page, mark_feed_changed
+from image_refs import IMAGE_ATTRIBUTES, acquire_image, release_image
+from instrumentation import instrumented
+from post_changes import change_stamp
+from slugs import claim_slug, release_slug
+from timelines import mark_fanout_pending
+from trending import refresh_score, trending_shard
+from storage import base64_image_restorer, is_user_image_key, public_url, store_base64_image
 
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
@@ -15,28 +22,6 @@ class DecimalEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-def slugify(text: str) -> str:
-    """Генерация slug из текста."""
-    if not text:
-        return ""
-    text = text.lower()
-    text = re.sub(r'[^\w\s-]', '', text)
-    text = re.sub(r'[-\s]+', '-', text)
-    return text.strip('-')
-
-def get_token_payload(auth_header: str) -> Optional[Dict]:
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    try:
-        token = auth_header.split(' ')[1]
-        return jwt.decode(
-            token,
-            os.environ.get('JWT_SECRET'),
-            algorithms=['HS256']
-        )
-    except:
-        return None
-
 def create_response(status_code: int, body: Dict, headers: Optional[Dict] = None) -> Dict:
     base_headers = {
         'Content-Type': 'application/json',
@@ -69,9 +54,6 @@ def build_update_expression(data: Dict, current_time: datetime) -> Dict:
         'slug': data.get('slug')
     }
 
-    if updatable_fields['title'] and not updatable_fields['slug']:
-        updatable_fields['slug'] = slugify(updatable_fields['title'])
-
     update_parts = []
     attr_names = {}
     attr_values = {}
@@ -85,9 +67,15 @@ def build_update_expression(data: Dict, current_time: datetime) -> Dict:
     if not update_parts:
         raise ValueError('Нет полей для обновления')
 
-    update_parts.append("#updated_at = :updated_at")
-    attr_names["#updated_at"] = "updated_at"
-    attr_values[":updated_at"] = current_time.isoformat()
+    for field, value in change_stamp(current_time).items():
+        update_parts.append(f"#{field} = :{field}")
+        attr_names[f"#{field}"] = field
+        attr_values[f":{field}"] = value
+
+    if updatable_fields['status'] == 'published':
+        # Время первой публикации: повторная публикация его не меняет
+        update_parts.append("#published_at = if_not_exists(#published_at, :updated_at)")
+        attr_names["#published_at"] = 'published_at'
 
     return {
         'expression': "SET " + ", ".join(update_parts),
@@ -95,24 +83,73 @@ def build_update_expression(data: Dict, current_time: datetime) -> Dict:
         'values': attr_values
     }
 
+def resolve_image_change(data: Dict, post: Dict, user_id: str) -> Tuple[Optional[str], Optional[Callable]]:
+    """(новый image_key поста, restore для acquire_image): None — без изменений, '' — изображение убрано.
+
+    Встроенное base64-изображение сохраняется по адресу содержимого, поэтому
+    повторная отправка той же картинки не создаёт новый объект.
+    """
+    img_url = data.get('imgUrl')
+
+    if data.get('image_key'):
+        if not is_user_image_key(data['image_key'], user_id):
+            raise ValueError('Неверный image_key')
+        image_key, restore = data['image_key'], None
+    elif img_url and 'base64,' in img_url:
+        image_key, uploaded = store_base64_image(img_url)
+        restore = base64_image_restorer(image_key, img_url, uploaded=uploaded)
+    elif img_url is not None and img_url != post.get('imgUrl', ''):
+        return '', None
+    else:
+        return None, None
+
+    data['imgUrl'] = public_url(image_key)
+    return (None, None) if image_key == post.get('image_key') else (image_key, restore)
+
+def add_image_update(update_config: Dict, image_key: str, image: Dict) -> None:
+    """Дополнение UpdateExpression полями изображения."""
+    set_parts = []
+    remove_parts = []
+
+    for field, value in [('image_key', image_key)] + [(attr, image.get(attr)) for attr in IMAGE_ATTRIBUTES]:
+        update_config['names'][f"#{field}"] = field
+        if value:
+            set_parts.append(f"#{field} = :{field}")
+            update_config['values'][f":{field}"] = value
+        else:
+            remove_parts.append(f"#{field}")
+
+    if set_parts:
+        update_config['expression'] += ", " + ", ".join(set_parts)
+    if remove_parts:
+        update_config['expression'] += " REMOVE " + ", ".join(remove_parts)
+
+def add_trending_update(update_config: Dict, post_id: str, status: Optional[str]) -> None:
+    """Секция рейтинга (trending_shard) есть только у опубликованного поста."""
+    if status is None:
+        return
+
+    update_config['names']['#trending_shard'] = 'trending_shard'
+    set_part, _, remove_part = update_config['expression'].partition(' REMOVE ')
+    if str(status).strip() == 'published':
+        set_part += ", #trending_shard = :trending_shard"
+        update_config['values'][':trending_shard'] = trending_shard(post_id)
+    else:
+        remove_part = ", ".join(filter(None, [remove_part, "#trending_shard"]))
+    update_config['expression'] = set_part + (" REMOVE " + remove_part if remove_part else "")
+
+@instrumented('edit_post')
 def handler(event, context):
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=os.environ['YDB_ENDPOINT'],
-        region_name=os.environ['YDB_REGION'],
-        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-    )
+    dynamodb = get_dynamodb()
 
     posts_table = dynamodb.Table('posts')
 
     try:
-        headers = event.get('headers', {})
-        auth_header = headers.get('Authorization') or headers.get('authorization')
-
-        if not (payload := get_token_payload(auth_header)) or not (user_id := payload.get('user_id')):
+        if not (payload := get_claims(event)):
             return create_response(401, {'success': False, 'error': 'Требуется авторизация'})
 
+        user_id = payload['user_id']
+
         try:
             data = parse_request_body(event.get('body', '{}'))
         except ValueError as e:
@@ -124,7 +161,7 @@ def handler(event, context):
         try:
             post = posts_table.get_item(
                 Key={'post_id': post_id},
-                AttributesToGet=['post_id', 'author_id', 'status']
+                AttributesToGet=['post_id', 'author_id', 'status', 'imgUrl', 'image_key', 'slug']
             ).get('Item')
 
             if not post:
@@ -139,12 +176,52 @@ def handler(event, context):
         except Exception as e:
             return create_response(500, {'success': False, 'error': 'Ошибка при проверке поста'})
 
+        try:
+            new_image_key, restore_image = resolve_image_change(data, post, user_id)
+        except ValueError as e:
+            return create_response(400, {'success': False, 'error': str(e)})
+
+        old_slug = post.get('slug')
+        old_image_key = post.get('image_key')
         current_time = datetime.utcnow()
+
+        # Новая ссылка на изображение и новый slug освобождаются, если пост не обновлён
+        image_acquired = False
+        new_slug = None
+
+        def release_taken():
+            if image_acquired:
+                release_image(dynamodb, new_image_key)
+            if new_slug and new_slug != old_slug:
+                release_slug(dynamodb, new_slug, post_id)
+
+        image = {}
+        if new_image_key:
+            try:
+                image = acquire_image(dynamodb, new_image_key, restore_image)
+                image_acquired = True
+            except Exception as e:
+                return create_response(500, {'success': False, 'error': 'Ошибка при сохранении изображения'})
+
+        if data.get('slug') or data.get('title'):
+            try:
+                # Явно запрошенный slug не подменяется текущим вариантом
+                current_slug = None if data.get('slug') else old_slug
+                new_slug = data['slug'] = claim_slug(dynamodb, data.get('slug') or data['title'], post_id, current_slug)
+            except Exception as e:
+                release_taken()
+                return create_response(500, {'success': False, 'error': 'Ошибка при сохранении slug'})
+
         try:
             update_config = build_update_expression(data, current_time)
         except ValueError as e:
+            release_taken()
             return create_response(400, {'success': False, 'error': str(e)})
 
+        if new_image_key is not None:
+            add_image_update(update_config, new_image_key, image)
+        add_trending_update(update_config, post_id, data.get('status'))
+
         try:
             response = posts_table.update_item(
                 Key={'post_id': post_id},
@@ -153,21 +230,37 @@ def handler(event, context):
                 ExpressionAttributeValues=update_config['values'],
                 ReturnValues='ALL_NEW'
             )
-
-            updated_post = response.get('Attributes', {})
-
-            return create_response(200, {
-                'success': True,
-                'message': 'Пост успешно обновлен',
-                'post': updated_post
-            })
-
         except Exception as e:
+            release_taken()
             return create_response(500, {
                 'success': False,
                 'error': f'Ошибка при обновлении поста: {str(e)}'
             })
 
+        if new_image_key is not None and old_image_key:
+            release_image(dynamodb, old_image_key)
+
+        if data.get('slug') and old_slug and data['slug'] != old_slug:
+            release_slug(dynamodb, old_slug, post_id)
+
+        new_status = response.get('Attributes', {}).get('status')
+        if affects_first_page(post.get('status'), new_status):
+            mark_feed_changed(dynamodb)
+
+        if new_status == 'published' and post.get('status') != 'published':
+            # Оценка черновика считалась от created_at: теперь — от времени публикации
+            refresh_score(posts_table, response['Attributes'])
+            try:
+                mark_fanout_pending(posts_table, post_id)
+            except Exception as e:
+                print(f"Ошибка при постановке поста в раскладку по лентам: {e}")
+
+        return create_response(200, {
+            'success': True,
+            'message': 'Пост успешно обновлен',
+            'post': response.get('Attributes', {})
+        })
+
     except Exception as e:
         return create_response(500, {
             'success': False,
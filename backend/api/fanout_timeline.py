@@ -0,0 +1,74 @@
+"""Раскладка опубликованных постов по домашним лентам подписчиков.
+
+Запускается по таймеру раз в минуту. Берёт посты из очереди (разреженный
+индекс posts.idx_fanout, флаг ставят create_post и edit_post при
+публикации), записывает запись ленты автору и каждому подписчику и снимает
+флаг. Посты celebrity-авторов не раскладываются: get_timeline читает их
+при запросе. Можно вызвать и напрямую с {"post_ids": [...]}.
+"""
+from db import get_dynamodb, query_all
+from instrumentation import instrumented
+from timelines import FANOUT_PENDING, followers, is_celebrity, timeline_entry
+
+def pending_posts(dynamodb):
+    return query_all(
+        dynamodb.Table('posts'),
+        IndexName='idx_fanout',
+        KeyConditionExpression='fanout_pending = :pending',
+        ExpressionAttributeValues={':pending': FANOUT_PENDING}
+    )
+
+def load_posts(dynamodb, post_ids):
+    posts_table = dynamodb.Table('posts')
+    for post_id in post_ids:
+        post = posts_table.get_item(Key={'post_id': post_id}).get('Item')
+        if post:
+            yield post
+
+def fan_out(dynamodb, post):
+    """Записи ленты для поста; число лент, в которые он попал."""
+    if post.get('status') != 'published' or post.get('is_deleted'):
+        return 0
+    author = dynamodb.Table('users').get_item(
+        Key={'user_id': post['author_id']}, AttributesToGet=['user_id', 'celebrity']
+    ).get('Item')
+    if is_celebrity(author):
+        return 0
+
+    written = 0
+    with dynamodb.Table('timelines').batch_writer() as batch:
+        for user_id in [post['author_id'], *followers(dynamodb, post['author_id'])]:
+            batch.put_item(Item=timeline_entry(user_id, post))
+            written += 1
+    return written
+
+def clear_pending(posts_table, post_id):
+    try:
+        posts_table.update_item(
+            Key={'post_id': post_id},
+            UpdateExpression='REMOVE fanout_pending',
+            ConditionExpression='attribute_exists(fanout_pending)'
+        )
+    except posts_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+@instrumented('fanout_timeline')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+    posts_table = dynamodb.Table('posts')
+
+    post_ids = event.get('post_ids') if isinstance(event, dict) else None
+    posts = load_posts(dynamodb, post_ids) if post_ids else pending_posts(dynamodb)
+
+    processed = entries = 0
+    for post in list(posts):
+        try:
+            entries += fan_out(dynamodb, post)
+            # Если флаг не снимется, повторная раскладка безопасна: записи ленты перезаписываются
+            clear_pending(posts_table, post['post_id'])
+            processed += 1
+        except Exception as e:
+            print(f"Ошибка при раскладке поста {post['post_id']}: {e}")
+
+    print(f"Разложено постов: {processed}, записей лент: {entries}")
+    return {'statusCode': 200, 'processed': processed, 'entries': entries}
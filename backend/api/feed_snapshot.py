@@ -0,0 +1,56 @@
+"""Снимок первой страницы ленты в Object Storage.
+
+Анонимная первая страница GET /posts не зависит от пользователя, поэтому
+build_feed_snapshot раз в минуту собирает её тем же кодом, что get_posts,
+и публикует в бакет: неизменяемый feeds/first-page/<digest>.json и
+feeds/first-page.json с коротким TTL. API Gateway отдаёт их как статику
+(GET /feed и GET /feed/{version}), функция нужна только для
+персональных и следующих страниц.
+
+create_post, edit_post, delete_post и propagate_authors отмечают
+изменения опубликованных постов счётчиком change_version в таблице
+feed_state, like_post и comment_post — изменения счётчиков (не чаще раза
+в COUNTER_MARK_SECONDS на контейнер). Сборщик пересобирает страницу, если
+счётчик ушёл вперёд или снимку больше SNAPSHOT_MAX_AGE, так что любое
+число правок за минуту стоит одной сборки.
+"""
+import time
+from datetime import timedelta
+
+FEED_ID = 'first-page'
+
+SNAPSHOT_MAX_AGE = timedelta(minutes=10)
+COUNTER_MARK_SECONDS = 5
+
+_counters_marked_at = None
+
+SNAPSHOT_PREFIX = 'feeds/first-page/'
+CURRENT_KEY = 'feeds/first-page.json'
+
+def affects_first_page(*statuses):
+    return 'published' in statuses
+
+def mark_feed_changed(dynamodb):
+    """+1 к change_version; ошибка не мешает уже выполненной записи поста."""
+    try:
+        dynamodb.Table('feed_state').update_item(
+            Key={'feed_id': FEED_ID},
+            UpdateExpression='ADD change_version :one',
+            ExpressionAttributeValues={':one': 1}
+        )
+    except Exception as e:
+        print(f"Ошибка при отметке изменения ленты: {e}")
+
+def mark_counters_changed(dynamodb):
+    """Отметка изменения лайков или комментариев опубликованного поста.
+
+    Лайки — самая частая запись, поэтому контейнер отмечает их не чаще раза
+    в COUNTER_MARK_SECONDS; пропущенную отметку покрывают следующая или
+    пересборка по SNAPSHOT_MAX_AGE.
+    """
+    global _counters_marked_at
+    now = time.monotonic()
+    if _counters_marked_at is not None and now - _counters_marked_at < COUNTER_MARK_SECONDS:
+        return
+    _counters_marked_at = now
+    mark_feed_changed(dynamodb)
@@ -0,0 +1,128 @@
+"""POST /users/{user_id}/follow и DELETE /users/{user_id}/follow — подписка.
+
+Подписка на обычного автора сразу добавляет в ленту подписчика его
+последние TIMELINE_BACKFILL постов; дальше их раскладывает fanout_timeline.
+Автор, набравший CELEBRITY_FOLLOWERS подписчиков, помечается celebrity
+(см. timelines). Отписка не чистит ленту: get_timeline отбрасывает записи
+авторов, на которых пользователь больше не подписан.
+"""
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from auth_middleware import get_claims
+from db import get_dynamodb
+from instrumentation import instrumented
+from timelines import (
+    CELEBRITY, CELEBRITY_FOLLOWERS, TIMELINE_BACKFILL, author_posts, is_celebrity, timeline_entry
+)
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj)
+        return super().default(obj)
+
+def create_response(status_code, body, headers=None):
+    base_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if headers:
+        base_headers.update(headers)
+    return {
+        'statusCode': status_code,
+        'headers': base_headers,
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
+
+def add_follow_counts(users_table, follower_id, followee_id, delta):
+    """Изменение счётчиков подписок; новый followers_count автора."""
+    users_table.update_item(
+        Key={'user_id': follower_id},
+        UpdateExpression='ADD following_count :delta',
+        ExpressionAttributeValues={':delta': delta}
+    )
+    response = users_table.update_item(
+        Key={'user_id': followee_id},
+        UpdateExpression='ADD followers_count :delta',
+        ExpressionAttributeValues={':delta': delta},
+        ReturnValues='UPDATED_NEW'
+    )
+    return response['Attributes']['followers_count']
+
+def backfill_timeline(dynamodb, follower_id, followee_id):
+    posts, _ = author_posts(dynamodb.Table('posts'), followee_id, TIMELINE_BACKFILL)
+    with dynamodb.Table('timelines').batch_writer() as batch:
+        for post in posts:
+            batch.put_item(Item=timeline_entry(follower_id, post))
+
+def follow(dynamodb, follower_id, followee):
+    users_table = dynamodb.Table('users')
+    follows_table = dynamodb.Table('follows')
+    followee_id = followee['user_id']
+
+    try:
+        follows_table.put_item(
+            Item={'follower_id': follower_id, 'followee_id': followee_id, 'created_at': datetime.utcnow().isoformat()},
+            ConditionExpression='attribute_not_exists(follower_id)'
+        )
+    except follows_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return 'already_following'
+
+    followers_count = add_follow_counts(users_table, follower_id, followee_id, 1)
+    if followers_count >= CELEBRITY_FOLLOWERS and not is_celebrity(followee):
+        users_table.update_item(
+            Key={'user_id': followee_id},
+            UpdateExpression='SET celebrity = :celebrity',
+            ExpressionAttributeValues={':celebrity': CELEBRITY}
+        )
+        followee = dict(followee, celebrity=CELEBRITY)
+
+    # Посты celebrity-авторов лента читает при запросе
+    if not is_celebrity(followee):
+        backfill_timeline(dynamodb, follower_id, followee_id)
+    return 'followed'
+
+def unfollow(dynamodb, follower_id, followee_id):
+    existing = dynamodb.Table('follows').delete_item(
+        Key={'follower_id': follower_id, 'followee_id': followee_id},
+        ReturnValues='ALL_OLD'
+    ).get('Attributes')
+    if not existing:
+        return 'not_following'
+    add_follow_counts(dynamodb.Table('users'), follower_id, followee_id, -1)
+    return 'unfollowed'
+
+@instrumented('follow_user')
+def handler(event, context):
+    if not (payload := get_claims(event)):
+        return create_response(401, {'success': False, 'error': 'Требуется авторизация'})
+
+    follower_id = payload['user_id']
+    followee_id = (event.get('pathParameters') or {}).get('user_id', '').strip()
+    method = (event.get('httpMethod') or '').upper()
+
+    if not followee_id:
+        return create_response(400, {'success': False, 'error': 'Отсутствует user_id'})
+    if followee_id == follower_id:
+        return create_response(400, {'success': False, 'error': 'Нельзя подписаться на себя'})
+
+    dynamodb = get_dynamodb()
+
+    try:
+        if method == 'DELETE':
+            action = unfollow(dynamodb, follower_id, followee_id)
+        else:
+            followee = dynamodb.Table('users').get_item(
+                Key={'user_id': followee_id}, AttributesToGet=['user_id', 'is_active', 'celebrity']
+            ).get('Item')
+            if not followee or not followee.get('is_active', True):
+                return create_response(404, {'success': False, 'error': 'Пользователь не найден'})
+            action = follow(dynamodb, follower_id, followee)
+
+        return create_response(200, {'success': True, 'action': action})
+
+    except Exception as e:
+        print(f"Ошибка в follow_user: {str(e)}")
+        return create_response(500, {'success': False, 'error': 'Ошибка при изменении подписки'})
@@ -0,0 +1,120 @@
+"""GET /posts/{post_id} и GET /posts/by-slug/{slug} — один пост.
+
+Пост отдаётся в формате ленты (автор, последние комментарии, is_liked).
+Черновик виден только автору, удалённый пост — никому. Slug разрешается
+через таблицу slugs с кэшем в контейнере (см. slugs), так что запрос по
+slug — это, как правило, один get_item поста.
+
+Каждый показ учитывается в буфере просмотров контейнера (см. view_counter),
+views_count в ответе включает ещё не записанные просмотры этого контейнера.
+"""
+import json
+from decimal import Decimal
+
+from auth_middleware import get_claims
+from db import get_dynamodb
+from get_posts import (
+    enrich_posts, enrichment_deadline, get_author_info, get_comments_for_posts, parse_params,
+    unsnapshotted_authors
+)
+from instrumentation import instrumented, phase
+from slugs import forget_slug, resolve_slug
+from view_counter import VIEW_FLUSH_PER_REQUEST, flush, flush_due, pending_views, record_view, viewer_id
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj)
+        return super().default(obj)
+
+def create_response(status_code, body, headers=None):
+    base_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if headers:
+        base_headers.update(headers)
+    return {
+        'statusCode': status_code,
+        'headers': base_headers,
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
+
+def find_by_slug(dynamodb, posts_table, slug):
+    """Пост по slug; кэш, устаревший после смены slug поста, разрешается заново."""
+    for _ in range(2):
+        if not (post_id := resolve_slug(dynamodb, slug)):
+            return None
+        post = posts_table.get_item(Key={'post_id': post_id}).get('Item')
+        if post and post.get('slug') == slug:
+            return post
+        forget_slug(slug)
+    return None
+
+def visible_to(post, user_id):
+    if not post or post.get('is_deleted'):
+        return False
+    return post.get('status') == 'published' or post.get('author_id') == user_id
+
+def is_liked(dynamodb, post_id, user_id):
+    if not user_id:
+        return False
+    return 'Item' in dynamodb.Table('post_likes').get_item(Key={'post_id': post_id, 'user_id': user_id})
+
+@instrumented('get_post')
+def handler(event, context):
+    path_params = event.get('pathParameters') or {}
+    claims = get_claims(event)
+    user_id = claims['user_id'] if claims else None
+
+    try:
+        params = parse_params(event)
+    except ValueError as e:
+        return create_response(400, {'success': False, 'error': 'Неверные параметры запроса', 'details': str(e)})
+
+    dynamodb = get_dynamodb()
+    posts_table = dynamodb.Table('posts')
+
+    try:
+        with phase('query'):
+            if path_params.get('slug'):
+                post = find_by_slug(dynamodb, posts_table, path_params['slug'])
+            elif path_params.get('post_id'):
+                post = posts_table.get_item(Key={'post_id': path_params['post_id']}).get('Item')
+            else:
+                return create_response(400, {'success': False, 'error': 'Не указан post_id или slug'})
+
+        if not visible_to(post, user_id):
+            return create_response(404, {'success': False, 'error': 'Пост не найден'})
+
+        post_id = post['post_id']
+        if post.get('status') == 'published':
+            record_view(post_id, viewer_id(event, claims))
+
+        deadline = enrichment_deadline(context)
+        with phase('enrichment'):
+            comments_by_post = get_comments_for_posts(
+                dynamodb, [post], params['comments_limit'], deadline) if params['include_comments'] else {}
+            authors_by_id = get_author_info(
+                dynamodb, unsnapshotted_authors([post]), deadline) if params['include_author'] else {}
+            # Счётчик лайков — из записи поста, отметка пользователя — одна запись post_likes
+            likes_info = ({post_id: post.get('likes_count', 0)},
+                          {post_id} if is_liked(dynamodb, post_id, user_id) else set())
+            data = enrich_posts([post], params, comments_by_post, likes_info, authors_by_id)[0]
+        data['views_count'] = post.get('views_count', 0) + pending_views(post_id)
+
+        if flush_due():
+            with phase('flush_views'):
+                flush(dynamodb, VIEW_FLUSH_PER_REQUEST, deadline)
+
+        return create_response(200, {
+            'success': True,
+            'data': data,
+            'meta': {'degraded': [
+                name for name, part in (('comments', comments_by_post), ('authors', authors_by_id)) if part is None
+            ]}
+        }, headers={'Cache-Control': 'no-cache'})
+
+    except Exception as e:
+        print(f"Ошибка в get_post: {str(e)}")
+        return create_response(500, {'success': False, 'error': 'Ошибка при получении поста'})
@@ -0,0 +1,153 @@
+"""GET /posts/changes?since=<cursor> — изменения постов после курсора.
+
+Возвращает опубликованные посты, созданные или изменённые после курсора
+(правка, лайки, комментарии), в формате ленты, и tombstones — посты,
+которые удалены или сняты с публикации. Посты, ни разу не
+опубликованные (без published_at), отсекаются в запросе: ни черновики,
+ни курсор на них в ответ не попадают. Курсор — meta.changes_cursor
+из GET /posts или meta.cursor предыдущего ответа (<updated_at>#<post_id>:
+посты с одинаковым updated_at могут оказаться на разных страницах). При
+reset = true курсор старше CHANGES_RETENTION, и ленту нужно загрузить заново.
+"""
+import json
+from datetime import datetime, timedelta, timezone
+from decimal import Decimal
+
+from db import get_dynamodb
+from get_posts import (
+    enrich_posts, enrichment_deadline, get_author_info, get_comments_for_posts, parse_params,
+    unsnapshotted_authors
+)
+from instrumentation import instrumented, phase
+from post_changes import CHANGES_LAG, CHANGES_RETENTION
+
+DEFAULT_LIMIT = 50
+MAX_LIMIT = 100
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj)
+        return super().default(obj)
+
+def create_response(status_code, body, headers=None):
+    base_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if headers:
+        base_headers.update(headers)
+    return {
+        'statusCode': status_code,
+        'headers': base_headers,
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
+
+def days_between(since, until):
+    day = since.date()
+    while day <= until.date():
+        yield day.isoformat()
+        day += timedelta(days=1)
+
+def change_key(post):
+    return post['updated_at'], post['post_id']
+
+def changed_posts(posts_table, since, after_id, until, limit):
+    """До limit + 1 постов после курсора (since, after_id) с updated_at <= until.
+
+    Порядок — по (updated_at, post_id). Индекс не упорядочивает посты с
+    одинаковым updated_at, поэтому группа с updated_at последнего нужного
+    поста дочитывается целиком и сортируется.
+    """
+    since_iso, until_iso = since.isoformat(), until.isoformat()
+    cursor = (since_iso, after_id)
+    posts = []
+    for day in days_between(since, until):
+        query_kwargs = {
+            'IndexName': 'idx_updated',
+            'KeyConditionExpression': 'updated_day = :day AND updated_at BETWEEN :since AND :until',
+            'FilterExpression': 'attribute_exists(published_at)',
+            'ExpressionAttributeValues': {':day': day, ':since': since_iso, ':until': until_iso},
+            'ScanIndexForward': True
+        }
+        while True:
+            # Дочитывание группы — страницами того же размера
+            query_kwargs['Limit'] = limit + 1 - len(posts) if len(posts) <= limit else limit + 1
+            response = posts_table.query(**query_kwargs)
+            items = response.get('Items', [])
+            posts.extend(post for post in items if change_key(post) > cursor)
+            if 'LastEvaluatedKey' not in response:
+                break
+            if len(posts) > limit and items and items[-1]['updated_at'] != posts[limit]['updated_at']:
+                break
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+        if len(posts) > limit:
+            break
+    return sorted(posts, key=change_key)[:limit + 1]
+
+def tombstone(post):
+    return {
+        'post_id': post['post_id'],
+        'status': post.get('status'),
+        'updated_at': post['updated_at']
+    }
+
+@instrumented('get_post_changes')
+def handler(event, context):
+    query_params = event.get('queryStringParameters', {}) or {}
+    now = datetime.utcnow()
+    until = now - CHANGES_LAG
+
+    try:
+        limit = min(int(query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        since_at, _, after_id = (query_params.get('since') or '').partition('#')
+        since = datetime.fromisoformat(since_at) if since_at else None
+        if since and since.tzinfo:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        params = parse_params(event)
+    except ValueError as e:
+        return create_response(400, {'success': False, 'error': 'Неверные параметры запроса', 'details': str(e)})
+
+    meta = {'cursor': until.isoformat(), 'has_more': False, 'reset': False}
+    if since is None or since >= until:
+        return create_response(200, {'success': True, 'data': [], 'tombstones': [], 'meta': {**meta, 'count': 0}})
+    if since < now - CHANGES_RETENTION:
+        return create_response(200, {'success': True, 'data': [], 'tombstones': [], 'meta': {
+            **meta, 'count': 0, 'reset': True
+        }})
+
+    dynamodb = get_dynamodb()
+
+    try:
+        with phase('query'):
+            posts = changed_posts(dynamodb.Table('posts'), since, after_id, until, limit)
+            posts, has_more = posts[:limit], len(posts) > limit
+
+        published = [post for post in posts if post.get('status') == 'published' and not post.get('is_deleted')]
+        published_ids = {post['post_id'] for post in published}
+        tombstones = [tombstone(post) for post in posts if post['post_id'] not in published_ids]
+
+        # Счётчики лайков и комментариев берутся из записи поста
+        deadline = enrichment_deadline(context)
+        with phase('enrichment'):
+            comments_by_post = get_comments_for_posts(
+                dynamodb, published, params['comments_limit'], deadline) if params['include_comments'] else {}
+            authors_by_id = get_author_info(
+                dynamodb, unsnapshotted_authors(published), deadline) if params['include_author'] else {}
+            data = enrich_posts(published, params, comments_by_post, None, authors_by_id)
+
+        if has_more:
+            meta.update(cursor='#'.join(change_key(posts[-1])), has_more=True)
+
+        return create_response(200, {
+            'success': True,
+            'data': data,
+            'tombstones': tombstones,
+            'meta': {**meta, 'count': len(posts), 'degraded': [
+                name for name, part in (('comments', comments_by_post), ('authors', authors_by_id)) if part is None
+            ]}
+        }, headers={'Cache-Control': 'public, max-age=5'})
+
+    except Exception as e:
+        print(f"Ошибка в get_post_changes: {str(e)}")
+        return create_response(500, {'success': False, 'error': 'Ошибка при получении изменений'})
@@ -1,9 +1,24 @@
-import os
-import boto3
 import json
+import os
+import time
 from decimal import Decimal
 from datetime import datetime
 
+from author_snapshot import author_info
+from db import get_dynamodb
+from instrumentation import instrumented, phase
+from post_changes import changes_cursor
+from recent_comments import RECENT_COMMENTS_LIMIT, inline_preview, load_comments, store_preview
+from trending import add_shard_response, empty_shard_page, merge_shards, parse_cursor, shard_keys, shard_query
+
+# Запас времени вызова на сборку и отправку ответа после обогащения, мс
+RESPONSE_RESERVE_MS = 500
+
+# Необязательный бюджет обогащения, мс; 0 — только остаток времени вызова
+ENRICHMENT_BUDGET_MS = int(os.environ.get('ENRICHMENT_BUDGET_MS', 0))
+
+SORTS = ('recent', 'trending')
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         if isinstance(obj, Decimal):
@@ -12,38 +27,42 @@ class DecimalEncoder(json.JSONEncoder):
             return obj.isoformat()
         return super().default(obj)
 
-def get_comments_for_posts(dynamodb, post_ids, limit_per_post=5):
-    if not post_ids:
+def get_comments_for_posts(dynamodb, posts, limit_per_post=5, deadline=None):
+    """Последние комментарии и их число по постам; None, если срок истёк или запросы не удались.
+
+    Превью берётся из recent_comments поста; comments читается только для
+    постов, где превью не сходится со счётчиком (оно тут же перестраивается)
+    или запрошено больше RECENT_COMMENTS_LIMIT комментариев.
+    """
+    if not posts:
         return {}
 
     comments_table = dynamodb.Table('comments')
+    posts_table = dynamodb.Table('posts')
     comments_by_post = {}
 
     try:
-        for post_id in post_ids:
-            response = comments_table.query(
-                IndexName='idx_comments_post',
-                KeyConditionExpression='post_id = :post_id',
-                ExpressionAttributeValues={':post_id': post_id},
-                Limit=limit_per_post,
-                ScanIndexForward=False
-            )
-            comments_by_post[post_id] = response.get('Items', [])
-
-            count_response = comments_table.query(
-                IndexName='idx_comments_post',
-                KeyConditionExpression='post_id = :post_id',
-                ExpressionAttributeValues={':post_id': post_id},
-                Select='COUNT'
-            )
-            comments_by_post[post_id + '_total'] = count_response.get('Count', 0)
+        for post in posts:
+            post_id = post['post_id']
+            inline = inline_preview(post, limit_per_post)
+            if inline is None:
+                if expired(deadline):
+                    return None
+                comments, total = load_comments(comments_table, post, limit_per_post)
+                if limit_per_post <= RECENT_COMMENTS_LIMIT:
+                    store_preview(posts_table, post, comments, total)
+                inline = comments[:limit_per_post], total
+
+            comments_by_post[post_id], comments_by_post[post_id + '_total'] = inline
 
     except Exception as e:
         print(f"Ошибка при получении комментариев: {e}")
+        return None
 
     return comments_by_post
 
-def get_likes_info_for_posts(dynamodb, post_ids, user_id=None):
+def get_likes_info_for_posts(dynamodb, post_ids, user_id=None, deadline=None):
+    """(лайки по постам, посты с лайком пользователя); None, если срок истёк или запросы не удались."""
     if not post_ids:
         return {}, {}
 
@@ -53,6 +72,8 @@ def get_likes_info_for_posts(dynamodb, post_ids, user_id=None):
 
     try:
         for post_id in post_ids:
+            if expired(deadline):
+                return None
             response = likes_table.query(
                 KeyConditionExpression='post_id = :post_id',
                 ExpressionAttributeValues={':post_id': post_id},
@@ -61,6 +82,8 @@ def get_likes_info_for_posts(dynamodb, post_ids, user_id=None):
             likes_by_post[post_id] = response.get('Count', 0)
 
         if user_id:
+            if expired(deadline):
+                return None
             response = likes_table.query(
                 IndexName='idx_user',
                 KeyConditionExpression='user_id = :user_id',
@@ -70,10 +93,12 @@ def get_likes_info_for_posts(dynamodb, post_ids, user_id=None):
 
     except Exception as e:
         print(f"Ошибка при получении лайков: {e}")
+        return None
 
     return likes_by_post, user_likes
 
-def get_author_info(dynamodb, author_ids):
+def get_author_info(dynamodb, author_ids, deadline=None):
+    """Профили авторов по id; None, если срок истёк или запросы не удались."""
     if not author_ids:
         return {}
 
@@ -83,6 +108,8 @@ def get_author_info(dynamodb, author_ids):
 
     try:
         for author_id in unique_author_ids:
+            if expired(deadline):
+                return None
             response = users_table.get_item(
                 Key={'user_id': author_id}
             )
@@ -96,145 +123,219 @@ def get_author_info(dynamodb, author_ids):
                 }
     except Exception as e:
         print(f"Ошибка при получении информации об авторе: {e}")
+        return None
 
     return authors_by_id
 
-def handler(event, context):
-    dynamodb = boto3.resource(
-        'dynamodb',
-        endpoint_url=os.environ['YDB_ENDPOINT'],
-        region_name=os.environ['YDB_REGION'],
-        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-    )
-
-    posts_table = dynamodb.Table('posts')
-
-    try:
-        query_params = event.get('queryStringParameters', {}) or {}
-        headers = event.get('headers', {})
-
-        author_id = query_params.get('author_id')
-        limit = min(int(query_params.get('limit', 20)), 100)
-        status = query_params.get('status', 'published')
-        include_comments = query_params.get('include_comments', 'true').lower() == 'true'
-        comments_limit = int(query_params.get('comments_limit', 3)) 
-        include_author = query_params.get('include_author', 'true').lower() == 'true'
-        user_id = None
-        last_key = None
-        last_key_str = query_params.get('last_key')
-        if last_key_str:
-            try:
-                last_key = json.loads(last_key_str)
-            except:
-                pass
-        if author_id:
-            query_kwargs = {
-                'IndexName': 'idx_author',
-                'KeyConditionExpression': 'author_id = :author_id',
-                'FilterExpression': '#status = :status',
-                'ExpressionAttributeNames': {'#status': 'status'},
-                'ExpressionAttributeValues': {
-                    ':author_id': author_id,
-                    ':status': status
-                },
-                'Limit': limit,
-                'ScanIndexForward': False,
-                'ReturnConsumedCapacity': 'TOTAL'
-            }
-
-            if last_key:
-                query_kwargs['ExclusiveStartKey'] = last_key
-
-            response = posts_table.query(**query_kwargs)
-        else:
-            scan_kwargs = {
-                'Limit': limit,
-                'FilterExpression': '#status = :status',
-                'ExpressionAttributeNames': {'#status': 'status'},
-                'ExpressionAttributeValues': {':status': status},
-                'ReturnConsumedCapacity': 'TOTAL'
-            }
-
-            if last_key:
-                scan_kwargs['ExclusiveStartKey'] = last_key
-
-            response = posts_table.scan(**scan_kwargs)
-            posts = response.get('Items', [])
-            if posts:
-                posts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
-
-        posts = response.get('Items', [])
-
-        post_ids = [post['post_id'] for post in posts]
-        author_ids = list(set([post['author_id'] for post in posts]))
-
-        comments_by_post = {}
-        likes_by_post = {}
-        user_likes = set()
-        authors_by_id = {}
-
-        if posts:
-            if include_comments:
-                comments_by_post = get_comments_for_posts(dynamodb, post_ids, comments_limit)
-
-            likes_by_post, user_likes = get_likes_info_for_posts(dynamodb, post_ids, user_id)
-
-            if include_author:
-                authors_by_id = get_author_info(dynamodb, author_ids)
-
-        enriched_posts = []
-        for post in posts:
-            enriched_post = post.copy()
-
-            if include_comments:
-                enriched_post['recent_comments'] = comments_by_post.get(post['post_id'], [])
-                enriched_post['comments_count'] = comments_by_post.get(post['post_id'] + '_total', 0)
-
+def enrichment_deadline(context):
+    """Момент (time.monotonic), к которому обогащение должно завершиться, или None.
+
+    Берётся из остатка времени вызова за вычетом RESPONSE_RESERVE_MS и,
+    если задан ENRICHMENT_BUDGET_MS, ограничивается им.
+    """
+    limits = []
+    if hasattr(context, 'get_remaining_time_in_millis'):
+        limits.append(context.get_remaining_time_in_millis() - RESPONSE_RESERVE_MS)
+    if ENRICHMENT_BUDGET_MS > 0:
+        limits.append(ENRICHMENT_BUDGET_MS)
+    if not limits:
+        return None
+    return time.monotonic() + max(min(limits), 0) / 1000
+
+def seconds_left(deadline):
+    return None if deadline is None else max(deadline - time.monotonic(), 0)
+
+def expired(deadline):
+    return deadline is not None and time.monotonic() >= deadline
+
+def select_image_url(post, variant, accept=''):
+    """URL варианта изображения для ленты с откатом на оригинал."""
+    variants = post.get('image_variants') or {}
+    image = variants.get(variant)
+    if not image:
+        return post.get('imgUrl', '')
+    if 'image/avif' in accept and image.get('avif'):
+        return image['avif']
+    return image.get('webp') or post.get('imgUrl', '')
+
+def parse_sort(sort, author_id, status):
+    if sort not in SORTS:
+        raise ValueError(f"sort должен быть одним из: {', '.join(SORTS)}")
+    if sort == 'trending' and author_id:
+        raise ValueError('sort=trending не поддерживается вместе с author_id')
+    if sort == 'trending' and status != 'published':
+        raise ValueError('sort=trending доступен только для опубликованных постов')
+    return sort
+
+def parse_params(event):
+    """Параметры ленты из события API Gateway; ValueError при неверных значениях."""
+    query_params = event.get('queryStringParameters', {}) or {}
+    headers = event.get('headers', {}) or {}
+
+    last_key = None
+    last_key_str = query_params.get('last_key')
+    if last_key_str:
+        try:
+            last_key = json.loads(last_key_str)
+        except:
+            pass
+
+    return {
+        'author_id': query_params.get('author_id'),
+        'limit': min(int(query_params.get('limit', 20)), 100),
+        'status': query_params.get('status', 'published'),
+        'include_comments': query_params.get('include_comments', 'true').lower() == 'true',
+        'comments_limit': int(query_params.get('comments_limit', 3)),
+        'include_author': query_params.get('include_author', 'true').lower() == 'true',
+        'image_variant': query_params.get('image_variant', 'feed'),
+        'sort': parse_sort(query_params.get('sort', 'recent'), query_params.get('author_id'),
+                           query_params.get('status', 'published')),
+        'accept': headers.get('Accept') or headers.get('accept') or '',
+        'user_id': None,
+        'last_key': last_key,
+    }
+
+def posts_request(params):
+    """(операция, параметры) запроса страницы постов: query по автору, рейтинг по секциям либо scan."""
+    if params['sort'] == 'trending':
+        # Верх рейтинга — слияние секций posts.idx_trending_shard (trending.py)
+        return 'trending', {'limit': params['limit'], 'cursor': parse_cursor(params['last_key'])}
+
+    if params['author_id']:
+        query_kwargs = {
+            'IndexName': 'idx_author',
+            'KeyConditionExpression': 'author_id = :author_id',
+            'FilterExpression': '#status = :status',
+            'ExpressionAttributeNames': {'#status': 'status'},
+            'ExpressionAttributeValues': {
+                ':author_id': params['author_id'],
+                ':status': params['status']
+            },
+            'Limit': params['limit'],
+            'ScanIndexForward': False,
+            'ReturnConsumedCapacity': 'TOTAL'
+        }
+        if params['last_key']:
+            query_kwargs['ExclusiveStartKey'] = params['last_key']
+        return 'query', query_kwargs
+
+    scan_kwargs = {
+        'Limit': params['limit'],
+        'FilterExpression': '#status = :status',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':status': params['status']},
+        'ReturnConsumedCapacity': 'TOTAL'
+    }
+    if params['last_key']:
+        scan_kwargs['ExclusiveStartKey'] = params['last_key']
+    return 'scan', scan_kwargs
+
+def read_shard(posts_table, shard, limit, cursor):
+    page = empty_shard_page()
+    while True:
+        response = posts_table.query(**shard_query(shard, limit, cursor, page.get('LastEvaluatedKey')))
+        if add_shard_response(page, response, cursor, limit):
+            return page
+
+def trending_page(posts_table, limit, cursor):
+    """Страница рейтинга: секции читаются по очереди и сливаются по оценке."""
+    return merge_shards([read_shard(posts_table, shard, limit, cursor) for shard in shard_keys()], limit)
+
+def unsnapshotted_authors(posts):
+    """Авторы постов без author_snapshot: только их профили читаются из users."""
+    return list({post['author_id'] for post in posts if not post.get('author_snapshot')})
+
+def page_posts(operation, response):
+    posts = response.get('Items', [])
+    if operation == 'scan' and posts:
+        posts.sort(key=lambda x: x.get('created_at', ''), reverse=True)
+    return posts
+
+def enrich_posts(posts, params, comments_by_post, likes_info, authors_by_id):
+    """Посты с данными обогащения.
+
+    None вместо части (comments_by_post, likes_info, authors_by_id) — часть
+    не успела к сроку или не удалась: её поля не добавляются, счётчики
+    остаются из записи поста. author_info берётся из author_snapshot поста,
+    authors_by_id нужен только для постов без снимка.
+    """
+    likes_by_post, user_likes = likes_info or ({}, set())
+
+    enriched_posts = []
+    for post in posts:
+        enriched_post = post.copy()
+        # Превью из записи поста отдаётся только как часть обогащения
+        enriched_post.pop('recent_comments', None)
+
+        if post.get('imgUrl'):
+            enriched_post['imageUrl'] = select_image_url(post, params['image_variant'], params['accept'])
+
+        if params['include_comments'] and comments_by_post is not None:
+            enriched_post['recent_comments'] = comments_by_post.get(post['post_id'], [])
+            enriched_post['comments_count'] = comments_by_post.get(post['post_id'] + '_total', 0)
+
+        if likes_info is not None:
             enriched_post['likes_count'] = likes_by_post.get(post['post_id'], 0)
             enriched_post['is_liked'] = post['post_id'] in user_likes
 
-            if include_author:
-                enriched_post['author_info'] = authors_by_id.get(post['author_id'], {
-                    'user_id': post['author_id'],
-                    'username': 'Неизвестный автор',
-                    'display_name': 'Неизвестный автор'
-                })
-
-            enriched_posts.append(enriched_post)
-
-        last_evaluated_key = response.get('LastEvaluatedKey')
-
-        response_data = {
-            'success': True,
-            'meta': {
-                'count': len(enriched_posts),
-                'has_more': bool(last_evaluated_key),
-                'limit': limit,
-                'author_id': author_id,
-                'status': status,
-                'include_comments': include_comments,
-                'include_author': include_author,
-                'total_scanned': response.get('ScannedCount', 0),
-                'consumed_capacity': response.get('ConsumedCapacity', {})
-            },
-            'data': enriched_posts
-        }
+        if params['include_author'] and post.get('author_snapshot'):
+            enriched_post['author_info'] = author_info(post['author_id'], post['author_snapshot'])
+        elif params['include_author'] and authors_by_id is not None:
+            enriched_post['author_info'] = authors_by_id.get(post['author_id'], {
+                'user_id': post['author_id'],
+                'username': 'Неизвестный автор',
+                'display_name': 'Неизвестный автор'
+            })
 
+        enriched_posts.append(enriched_post)
+    return enriched_posts
+
+def degraded_parts(comments_by_post, likes_info, authors_by_id):
+    """Части обогащения, отброшенные по сроку или из-за ошибок, для meta.degraded."""
+    parts = {'comments': comments_by_post, 'likes': likes_info, 'authors': authors_by_id}
+    return [name for name, value in parts.items() if value is None]
+
+def success_response(params, response, enriched_posts, degraded=(), extra_meta=None):
+    last_evaluated_key = response.get('LastEvaluatedKey')
+
+    response_data = {
+        'success': True,
+        'meta': {
+            'count': len(enriched_posts),
+            'has_more': bool(last_evaluated_key),
+            'limit': params['limit'],
+            'author_id': params['author_id'],
+            'status': params['status'],
+            'sort': params['sort'],
+            'include_comments': params['include_comments'],
+            'include_author': params['include_author'],
+            'image_variant': params['image_variant'],
+            'total_scanned': response.get('ScannedCount', 0),
+            'consumed_capacity': response.get('ConsumedCapacity', {}),
+            'degraded': list(degraded),
+            **(extra_meta or {})
+        },
+        'data': enriched_posts
+    }
+
+    with phase('serialization'):
         if last_evaluated_key:
             response_data['meta']['next_key'] = json.dumps(last_evaluated_key, cls=DecimalEncoder)
-
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Content-Type': 'application/json',
-                'Access-Control-Allow-Origin': '*',
-                'Cache-Control': 'public, max-age=30' if not user_id else 'no-cache'
-            },
-            'body': json.dumps(response_data, cls=DecimalEncoder)
-        }
-
-    except ValueError as e:
+        body = json.dumps(response_data, cls=DecimalEncoder)
+
+    return {
+        'statusCode': 200,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Cache-Control': 'public, max-age=30' if not params['user_id'] else 'no-cache',
+            'Vary': 'Accept'
+        },
+        'body': body
+    }
+
+def error_response(e):
+    if isinstance(e, ValueError):
         return {
             'statusCode': 400,
             'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
@@ -244,14 +345,61 @@ def handler(event, context):
                 'details': str(e)
             })
         }
+    print(f"Ошибка в get_posts: {str(e)}")
+    return {
+        'statusCode': 500,
+        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({
+            'success': False,
+            'error': str(e),
+            'message': 'Ошибка при получении постов'
+        })
+    }
+
+def feed_page(dynamodb, params, deadline=None):
+    """(ответ запроса постов, посты с обогащением, отброшенные части) для параметров ленты."""
+    posts_table = dynamodb.Table('posts')
+
+    with phase('query'):
+        operation, request = posts_request(params)
+        if operation == 'trending':
+            response = trending_page(posts_table, **request)
+        else:
+            response = getattr(posts_table, operation)(**request)
+        posts = page_posts(operation, response)
+
+    post_ids = [post['post_id'] for post in posts]
+    author_ids = unsnapshotted_authors(posts)
+
+    comments_by_post = {}
+    likes_info = ({}, set())
+    authors_by_id = {}
+
+    # Список постов возвращается всегда; части обогащения от дешёвых
+    # к дорогим выполняются, пока не истёк срок
+    with phase('enrichment'):
+        if posts:
+            if params['include_author'] and author_ids:
+                authors_by_id = get_author_info(dynamodb, author_ids, deadline)
+
+            likes_info = get_likes_info_for_posts(dynamodb, post_ids, params['user_id'], deadline)
+
+            if params['include_comments']:
+                comments_by_post = get_comments_for_posts(dynamodb, posts, params['comments_limit'], deadline)
+
+        enriched_posts = enrich_posts(posts, params, comments_by_post, likes_info, authors_by_id)
+
+    return response, enriched_posts, degraded_parts(comments_by_post, likes_info, authors_by_id)
+
+@instrumented('get_posts')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+
+    try:
+        params = parse_params(event)
+        cursor = changes_cursor()
+        response, enriched_posts, degraded = feed_page(dynamodb, params, enrichment_deadline(context))
+        return success_response(params, response, enriched_posts, degraded, {'changes_cursor': cursor})
+
     except Exception as e:
-        print(f"Ошибка в get_posts: {str(e)}")
-        return {
-            'statusCode': 500,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': False,
-                'error': str(e),
-                'message': 'Ошибка при получении постов'
-            })
-        }
+        return error_response(e)
@@ -0,0 +1,169 @@
+"""Асинхронный get_posts для asgi.py.
+
+Те же запросы и формат ответа, что у get_posts.handler, но обогащение
+(комментарии, лайки, авторы) выполняется конкурентно, и процесс не
+блокируется на ожидании YDB; части, не успевшие к сроку, отменяются.
+Отдельный модуль, чтобы asyncio и aiobotocore не попадали в холодный
+старт функции.
+"""
+import asyncio
+
+from async_db import get_async_dynamodb
+from get_posts import (
+    degraded_parts, enrich_posts, enrichment_deadline, error_response, page_posts, parse_params,
+    posts_request, seconds_left, success_response, unsnapshotted_authors
+)
+from instrumentation import instrumented, phase
+from post_changes import changes_cursor
+from recent_comments import RECENT_COMMENTS_LIMIT, comments_query, comments_total, inline_preview, preview_update
+from trending import add_shard_response, empty_shard_page, merge_shards, shard_keys, shard_query
+
+async def read_shard(posts_table, shard, limit, cursor):
+    page = empty_shard_page()
+    while True:
+        response = await posts_table.query(**shard_query(shard, limit, cursor, page.get('LastEvaluatedKey')))
+        if add_shard_response(page, response, cursor, limit):
+            return page
+
+async def trending_page(posts_table, limit, cursor):
+    """Страница рейтинга: секции читаются конкурентно и сливаются по оценке."""
+    pages = await asyncio.gather(*(read_shard(posts_table, shard, limit, cursor) for shard in shard_keys()))
+    return merge_shards(pages, limit)
+
+async def load_comments(comments_table, post, limit):
+    query_kwargs = comments_query(post['post_id'], limit)
+    comments = []
+    while True:
+        response = await comments_table.query(**query_kwargs)
+        comments.extend(response.get('Items', []))
+        complete = 'LastEvaluatedKey' not in response
+        if complete or len(comments) >= query_kwargs['Limit']:
+            return comments, comments_total(post, comments, complete)
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+async def get_comments_for_posts(dynamodb, posts, limit_per_post=5):
+    comments_table = dynamodb.Table('comments')
+    posts_table = dynamodb.Table('posts')
+    conditional_failed = posts_table.meta.client.exceptions.ConditionalCheckFailedException
+
+    async def post_comments(post):
+        inline = inline_preview(post, limit_per_post)
+        if inline is not None:
+            return post['post_id'], inline
+        comments, total = await load_comments(comments_table, post, limit_per_post)
+        if limit_per_post <= RECENT_COMMENTS_LIMIT:
+            try:
+                await posts_table.update_item(**preview_update(post, comments, total))
+            except conditional_failed:
+                pass
+        return post['post_id'], (comments[:limit_per_post], total)
+
+    comments_by_post = {}
+    try:
+        for post_id, (items, total) in await asyncio.gather(*map(post_comments, posts)):
+            comments_by_post[post_id] = items
+            comments_by_post[post_id + '_total'] = total
+    except Exception as e:
+        print(f"Ошибка при получении комментариев: {e}")
+        return None
+    return comments_by_post
+
+async def get_likes_info_for_posts(dynamodb, post_ids, user_id=None):
+    likes_table = dynamodb.Table('post_likes')
+
+    async def post_likes(post_id):
+        response = await likes_table.query(
+            KeyConditionExpression='post_id = :post_id',
+            ExpressionAttributeValues={':post_id': post_id},
+            Select='COUNT'
+        )
+        return post_id, response.get('Count', 0)
+
+    likes_by_post = {}
+    user_likes = set()
+    try:
+        likes_by_post = dict(await asyncio.gather(*map(post_likes, post_ids)))
+        if user_id:
+            response = await likes_table.query(
+                IndexName='idx_user',
+                KeyConditionExpression='user_id = :user_id',
+                ExpressionAttributeValues={':user_id': user_id}
+            )
+            user_likes = {item['post_id'] for item in response.get('Items', [])}
+    except Exception as e:
+        print(f"Ошибка при получении лайков: {e}")
+        return None
+    return likes_by_post, user_likes
+
+async def get_author_info(dynamodb, author_ids):
+    users_table = dynamodb.Table('users')
+
+    async def author(author_id):
+        return author_id, (await users_table.get_item(Key={'user_id': author_id})).get('Item')
+
+    authors_by_id = {}
+    try:
+        for author_id, user in await asyncio.gather(*map(author, set(author_ids))):
+            if user:
+                authors_by_id[author_id] = {
+                    'user_id': user.get('user_id'),
+                    'username': user.get('username'),
+                    'display_name': user.get('display_name', ''),
+                    'avatar_url': user.get('avatar_url', '')
+                }
+    except Exception as e:
+        print(f"Ошибка при получении информации об авторе: {e}")
+        return None
+    return authors_by_id
+
+async def _empty(value):
+    return value
+
+async def within(deadline, coroutine):
+    """Результат корутины или None, если она не завершилась к сроку (запросы отменяются)."""
+    try:
+        return await asyncio.wait_for(coroutine, timeout=seconds_left(deadline))
+    except asyncio.TimeoutError:
+        return None
+
+@instrumented('get_posts')
+async def handler(event, context):
+    dynamodb = await get_async_dynamodb()
+
+    posts_table = dynamodb.Table('posts')
+
+    try:
+        params = parse_params(event)
+        cursor = changes_cursor()
+
+        with phase('query'):
+            operation, request = posts_request(params)
+            if operation == 'trending':
+                response = await trending_page(posts_table, **request)
+            else:
+                response = await getattr(posts_table, operation)(**request)
+            posts = page_posts(operation, response)
+
+        post_ids = [post['post_id'] for post in posts]
+        author_ids = unsnapshotted_authors(posts)
+
+        deadline = enrichment_deadline(context)
+        with phase('enrichment'):
+            if posts:
+                comments_by_post, likes_info, authors_by_id = await asyncio.gather(
+                    within(deadline, get_comments_for_posts(dynamodb, posts, params['comments_limit']))
+                    if params['include_comments'] else _empty({}),
+                    within(deadline, get_likes_info_for_posts(dynamodb, post_ids, params['user_id'])),
+                    within(deadline, get_author_info(dynamodb, author_ids))
+                    if params['include_author'] and author_ids else _empty({})
+                )
+            else:
+                comments_by_post, likes_info, authors_by_id = {}, ({}, set()), {}
+
+            enriched_posts = enrich_posts(posts, params, comments_by_post, likes_info, authors_by_id)
+
+        degraded = degraded_parts(comments_by_post, likes_info, authors_by_id)
+        return success_response(params, response, enriched_posts, degraded, {'changes_cursor': cursor})
+
+    except Exception as e:
+        return error_response(e)
@@ -0,0 +1,173 @@
+"""GET /timeline?before=<cursor> — домашняя лента: посты авторов из подписок.
+
+Страница — запросы к timelines (записи раскладывает fanout_timeline),
+пока не наберётся limit записей авторов из подписок, и по одному запросу
+к posts.idx_author_created на каждого celebrity-автора из подписок. Посты
+celebrity-авторов берутся только новее последней прочитанной записи
+timelines: записи старше неё ещё не прочитаны и попадут на следующую
+страницу. Потоки уже упорядочены по timeline_key, поэтому сливаются
+k-way merge без сортировки всей выборки. Посты из timelines и отметки
+лайков пользователя читаются по одному batch_get_item, счётчики — из
+записей постов. Курсор — meta.cursor предыдущего ответа.
+"""
+import heapq
+import json
+from decimal import Decimal
+
+from auth_middleware import get_claims
+from db import get_dynamodb
+from get_posts import (
+    degraded_parts, enrich_posts, enrichment_deadline, expired, get_author_info, get_comments_for_posts,
+    parse_params, unsnapshotted_authors
+)
+from instrumentation import instrumented, phase
+from timelines import author_posts, celebrities, followees, timeline_key
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 100
+
+class DecimalEncoder(json.JSONEncoder):
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return int(obj)
+        return super().default(obj)
+
+def create_response(status_code, body, headers=None):
+    base_headers = {
+        'Content-Type': 'application/json',
+        'Access-Control-Allow-Origin': '*'
+    }
+    if headers:
+        base_headers.update(headers)
+    return {
+        'statusCode': status_code,
+        'headers': base_headers,
+        'body': json.dumps(body, cls=DecimalEncoder)
+    }
+
+def timeline_page(timelines_table, user_id, authors, limit, before=None):
+    """(limit записей ленты авторов authors новее первыми до курсора, есть ли ещё).
+
+    Записи отписанных авторов остаются в timelines до вытеснения, поэтому
+    чтение продолжается, пока не наберётся limit записей или не кончится лента.
+    """
+    query_kwargs = {
+        'KeyConditionExpression': 'user_id = :user_id',
+        'ExpressionAttributeValues': {':user_id': user_id},
+        'ScanIndexForward': False,
+        'Limit': limit
+    }
+    if before:
+        query_kwargs['KeyConditionExpression'] += ' AND timeline_key < :before'
+        query_kwargs['ExpressionAttributeValues'][':before'] = before
+
+    entries = []
+    while len(entries) <= limit:
+        response = timelines_table.query(**query_kwargs)
+        entries.extend(entry for entry in response.get('Items', []) if entry['author_id'] in authors)
+        if 'LastEvaluatedKey' not in response:
+            return entries[:limit], len(entries) > limit
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return entries[:limit], True
+
+def merge_streams(streams, limit):
+    """Первые limit записей по убыванию timeline_key без повторов post_id."""
+    merged = []
+    seen = set()
+    for entry in heapq.merge(*streams, key=lambda entry: entry['timeline_key'], reverse=True):
+        if entry['post_id'] in seen:
+            continue
+        seen.add(entry['post_id'])
+        merged.append(entry)
+        if len(merged) == limit:
+            break
+    return merged
+
+def load_posts(dynamodb, post_ids):
+    if not post_ids:
+        return {}
+    response = dynamodb.batch_get_item(RequestItems={'posts': {'Keys': [{'post_id': post_id} for post_id in post_ids]}})
+    return {post['post_id']: post for post in response['Responses']['posts']}
+
+def get_likes_info(dynamodb, posts, user_id, deadline=None):
+    """(лайки из записей постов, посты с лайком пользователя) одним batch_get_item; None, если не успели."""
+    if not posts or expired(deadline):
+        return None if posts else ({}, set())
+    try:
+        response = dynamodb.batch_get_item(RequestItems={'post_likes': {
+            'Keys': [{'post_id': post['post_id'], 'user_id': user_id} for post in posts]
+        }})
+    except Exception as e:
+        print(f"Ошибка при получении лайков: {e}")
+        return None
+    return ({post['post_id']: post.get('likes_count', 0) for post in posts},
+            {like['post_id'] for like in response['Responses']['post_likes']})
+
+@instrumented('get_timeline')
+def handler(event, context):
+    if not (payload := get_claims(event)):
+        return create_response(401, {'success': False, 'error': 'Требуется авторизация'})
+
+    user_id = payload['user_id']
+    query_params = event.get('queryStringParameters', {}) or {}
+
+    try:
+        limit = min(int(query_params.get('limit', DEFAULT_LIMIT)), MAX_LIMIT)
+        before = query_params.get('before')
+        params = dict(parse_params(event), user_id=user_id)
+    except ValueError as e:
+        return create_response(400, {'success': False, 'error': 'Неверные параметры запроса', 'details': str(e)})
+
+    dynamodb = get_dynamodb()
+    posts_table = dynamodb.Table('posts')
+
+    try:
+        with phase('query'):
+            following = followees(dynamodb, user_id)
+            entries, has_more = timeline_page(dynamodb.Table('timelines'), user_id, following | {user_id}, limit, before)
+            # Записи timelines старше oldest не прочитаны: посты celebrity-авторов берутся только новее неё
+            oldest = entries[-1]['timeline_key'] if has_more else None
+            streams = [entries]
+            posts_by_id = {}
+            # Celebrity-авторы не раскладываются по лентам: их посты читаются здесь
+            for author_id in following & celebrities(dynamodb):
+                author_page, author_more = author_posts(posts_table, author_id, limit, before)
+                author_entries = [{'timeline_key': timeline_key(post), 'post_id': post['post_id'],
+                                   'author_id': post['author_id']} for post in author_page]
+                if oldest:
+                    author_entries = [entry for entry in author_entries if entry['timeline_key'] > oldest]
+                has_more = has_more or author_more or len(author_entries) < len(author_page)
+                posts_by_id.update((post['post_id'], post) for post in author_page)
+                streams.append(author_entries)
+
+            merged = merge_streams(streams, limit)
+            has_more = has_more or sum(map(len, streams)) > len(merged)
+
+            posts_by_id.update(load_posts(dynamodb, [entry['post_id'] for entry in merged
+                                                     if entry['post_id'] not in posts_by_id]))
+            posts = [posts_by_id[entry['post_id']] for entry in merged if entry['post_id'] in posts_by_id]
+            posts = [post for post in posts if post.get('status') == 'published' and not post.get('is_deleted')]
+
+        deadline = enrichment_deadline(context)
+        with phase('enrichment'):
+            comments_by_post = get_comments_for_posts(
+                dynamodb, posts, params['comments_limit'], deadline) if params['include_comments'] else {}
+            likes_info = get_likes_info(dynamodb, posts, user_id, deadline)
+            authors_by_id = get_author_info(
+                dynamodb, unsnapshotted_authors(posts), deadline) if params['include_author'] else {}
+            data = enrich_posts(posts, params, comments_by_post, likes_info, authors_by_id)
+
+        return create_response(200, {
+            'success': True,
+            'data': data,
+            'meta': {
+                'count': len(data),
+                'cursor': merged[-1]['timeline_key'] if merged else None,
+                'has_more': has_more,
+                'degraded': degraded_parts(comments_by_post, likes_info, authors_by_id)
+            }
+        }, headers={'Cache-Control': 'no-cache'})
+
+    except Exception as e:
+        print(f"Ошибка в get_timeline: {str(e)}")
+        return create_response(500, {'success': False, 'error': 'Ошибка при получении ленты'})
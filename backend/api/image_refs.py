@@ -0,0 +1,159 @@
+"""Счётчик ссылок на изображения и сборка мусора.
+
+Каждый пост, указывающий на image_key, держит одну ссылку в таблице images.
+Когда счётчик падает до нуля, изображение помечается orphaned_at и удаляется
+сборщиком мусора только спустя GC_GRACE_PERIOD: за это время повторная
+загрузка того же содержимого снова захватит ссылку и спасёт объект.
+
+Загрузка по адресу содержимого пропускается, если объект уже есть, поэтому
+сборщик и повторная загрузка могут разойтись. Сборщик сначала занимает
+запись (gc_started_at), потом удаляет объекты и только затем запись, и всё
+это — пока занятие моложе GC_CLAIM_SECONDS. acquire_image ждёт окончания
+занятой сборки, а если запись создана заново или занятие просрочено,
+вызывает restore: объект мог быть удалён, и его нужно загрузить снова.
+"""
+import time
+from datetime import datetime, timedelta
+
+from storage import bucket_name, get_s3, variants_prefix
+
+GC_GRACE_PERIOD = timedelta(days=1)
+GC_CLAIM_SECONDS = 30
+
+# Ожидание занятой сборщиком записи: 0.1 + 0.2 + ... ≈ 3 с
+ACQUIRE_ATTEMPTS = 5
+ACQUIRE_BACKOFF_SECONDS = 0.1
+
+IMAGE_ATTRIBUTES = ('image_width', 'image_height', 'image_variants')
+
+def claim_expired_before(now=None):
+    return ((now or datetime.utcnow()) - timedelta(seconds=GC_CLAIM_SECONDS)).isoformat()
+
+def acquire_image(dynamodb, key, restore=None):
+    """+1 ссылка; возвращает уже построенные варианты.
+
+    restore(force) вызывается, если объект мог быть удалён сборщиком: запись
+    создана заново (force=False — достаточно проверить, что объект есть) или
+    перехвачена у незаконченной сборки (force=True — загрузить заново, чтобы
+    image_worker построил удалённые варианты).
+    """
+    table = dynamodb.Table('images')
+    conditional_failed = table.meta.client.exceptions.ConditionalCheckFailedException
+
+    for attempt in range(ACQUIRE_ATTEMPTS):
+        try:
+            response = table.update_item(
+                Key={'image_key': key},
+                UpdateExpression='ADD ref_count :one REMOVE orphaned_at, gc_started_at',
+                ConditionExpression='attribute_not_exists(gc_started_at) OR gc_started_at < :expired',
+                ExpressionAttributeValues={':one': 1, ':expired': claim_expired_before()},
+                ReturnValues='ALL_OLD'
+            )
+            break
+        except conditional_failed:
+            time.sleep(ACQUIRE_BACKOFF_SECONDS * 2 ** attempt)
+    else:
+        raise RuntimeError(f'Изображение {key} занято сборщиком мусора')
+
+    attributes = response.get('Attributes', {})
+    if attributes and 'gc_started_at' not in attributes:
+        return {name: attributes[name] for name in IMAGE_ATTRIBUTES if name in attributes}
+
+    if attributes:
+        table.update_item(Key={'image_key': key}, UpdateExpression='REMOVE ' + ', '.join(IMAGE_ATTRIBUTES))
+    if restore:
+        try:
+            restore(bool(attributes))
+        except Exception:
+            # Объект не восстановлен: ссылка на него не нужна
+            release_image(dynamodb, key)
+            raise
+    return {}
+
+def release_image(dynamodb, key):
+    """-1 ссылка; при нуле изображение становится кандидатом на удаление."""
+    table = dynamodb.Table('images')
+    conditional_failed = table.meta.client.exceptions.ConditionalCheckFailedException
+
+    try:
+        response = table.update_item(
+            Key={'image_key': key},
+            UpdateExpression='ADD ref_count :minus_one',
+            ConditionExpression='attribute_exists(image_key)',
+            ExpressionAttributeValues={':minus_one': -1},
+            ReturnValues='UPDATED_NEW'
+        )
+    except conditional_failed:
+        # Изображение загружено до появления учёта ссылок
+        return
+
+    if response['Attributes']['ref_count'] > 0:
+        return
+
+    try:
+        table.update_item(
+            Key={'image_key': key},
+            UpdateExpression='SET orphaned_at = :now',
+            ConditionExpression='ref_count <= :zero',
+            ExpressionAttributeValues={':now': datetime.utcnow().isoformat(), ':zero': 0}
+        )
+    except conditional_failed:
+        pass
+
+def delete_image_objects(s3, key):
+    bucket = bucket_name()
+    s3.delete_object(Bucket=bucket, Key=key)
+
+    variants = s3.list_objects_v2(Bucket=bucket, Prefix=variants_prefix(key))
+    for obj in variants.get('Contents', []):
+        s3.delete_object(Bucket=bucket, Key=obj['Key'])
+
+def collect_garbage(dynamodb, s3=None, now=None):
+    """Удаление изображений без ссылок, осиротевших дольше GC_GRACE_PERIOD."""
+    s3 = s3 or get_s3()
+    table = dynamodb.Table('images')
+    conditional_failed = table.meta.client.exceptions.ConditionalCheckFailedException
+    cutoff = ((now or datetime.utcnow()) - GC_GRACE_PERIOD).isoformat()
+
+    condition = '(attribute_not_exists(ref_count) OR ref_count <= :zero) AND orphaned_at < :cutoff'
+    scan_kwargs = {
+        'FilterExpression': condition,
+        'ExpressionAttributeValues': {':zero': 0, ':cutoff': cutoff},
+        'ProjectionExpression': 'image_key'
+    }
+
+    deleted = 0
+    while True:
+        response = table.scan(**scan_kwargs)
+
+        for item in response.get('Items', []):
+            key = item['image_key']
+            started = datetime.utcnow()
+            try:
+                # Условие повторяется: ссылка могла появиться после scan
+                table.update_item(
+                    Key={'image_key': key},
+                    UpdateExpression='SET gc_started_at = :started',
+                    ConditionExpression=f'{condition} AND '
+                                        '(attribute_not_exists(gc_started_at) OR gc_started_at < :expired)',
+                    ExpressionAttributeValues={':zero': 0, ':cutoff': cutoff, ':started': started.isoformat(),
+                                               ':expired': claim_expired_before(started)}
+                )
+            except conditional_failed:
+                continue
+
+            delete_image_objects(s3, key)
+            try:
+                # Запись остаётся, если её успела перехватить новая ссылка
+                table.delete_item(
+                    Key={'image_key': key},
+                    ConditionExpression='gc_started_at = :started',
+                    ExpressionAttributeValues={':started': started.isoformat()}
+                )
+            except conditional_failed:
+                continue
+            deleted += 1
+
+        if 'LastEvaluatedKey' not in response:
+            return deleted
+        scan_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
@@ -0,0 +1,180 @@
+"""Фоновая обработка изображений постов.
+
+Запускается триггером Object Storage на создание объектов с префиксом posts/.
+Для каждого оригинала строит уменьшенные варианты в WebP (и AVIF, если Pillow
+собран с его поддержкой), складывает их под variants/ и записывает ключи и
+размеры в таблицу images и в посты, которые ссылаются на это изображение.
+"""
+import io
+from datetime import datetime
+
+from PIL import Image, ImageOps, features
+
+from db import get_dynamodb
+from instrumentation import instrumented
+from storage import bucket_name, get_s3, public_url, variants_prefix
+
+# Максимальная сторона варианта в пикселях
+VARIANTS = {
+    'feed': 960,
+    'thumb': 320
+}
+
+FORMAT_OPTIONS = {
+    'webp': {'format': 'WEBP', 'quality': 80, 'method': 4},
+    'avif': {'format': 'AVIF', 'quality': 60}
+}
+
+CONTENT_TYPES = {
+    'webp': 'image/webp',
+    'avif': 'image/avif'
+}
+
+ORIGINALS_PREFIX = 'posts/'
+VARIANT_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+
+# Защита от «бомб» распаковки на функции с ограниченной памятью
+Image.MAX_IMAGE_PIXELS = 40_000_000
+
+def variant_formats():
+    formats = ['webp']
+    if features.check('avif'):
+        formats.append('avif')
+    return formats
+
+def variant_key(key, name, fmt):
+    return f"{variants_prefix(key)}{name}.{fmt}"
+
+def original_size(image):
+    width, height = image.size
+    # Ориентации 5-8 в EXIF поворачивают изображение на 90 градусов
+    if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+        width, height = height, width
+    return width, height
+
+def render_variants(s3, key, data):
+    """Построение и загрузка вариантов; возвращает их описание."""
+    formats = variant_formats()
+
+    with Image.open(io.BytesIO(data)) as source:
+        width, height = original_size(source)
+
+        # Для JPEG декодируем сразу в уменьшенном масштабе: быстрее и экономит память
+        largest = max(VARIANTS.values())
+        source.draft('RGB', (largest, largest))
+
+        image = ImageOps.exif_transpose(source)
+        if image.mode not in ('RGB', 'RGBA'):
+            has_alpha = image.mode in ('LA', 'PA') or 'transparency' in image.info
+            image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        variants = {}
+        # От большего варианта к меньшему: каждый следующий уменьшается из предыдущего
+        for name, max_side in sorted(VARIANTS.items(), key=lambda item: -item[1]):
+            image = image.copy()
+            image.thumbnail((max_side, max_side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+
+            variant = {'width': image.width, 'height': image.height}
+            for fmt in formats:
+                buffer = io.BytesIO()
+                image.save(buffer, **FORMAT_OPTIONS[fmt])
+
+                target = variant_key(key, name, fmt)
+                s3.put_object(
+                    Bucket=bucket_name(),
+                    Key=target,
+                    Body=buffer.getvalue(),
+                    ContentType=CONTENT_TYPES[fmt],
+                    CacheControl=VARIANT_CACHE_CONTROL,
+                    ACL='public-read'
+                )
+                variant[fmt] = public_url(target)
+
+            variants[name] = variant
+
+    return {'width': width, 'height': height, 'variants': variants}
+
+def process_image(s3, key):
+    obj = s3.get_object(Bucket=bucket_name(), Key=key)
+    return render_variants(s3, key, obj['Body'].read())
+
+def record_variants(dynamodb, key, info):
+    """Сохранение вариантов в images и во всех постах с этим изображением."""
+    images_table = dynamodb.Table('images')
+    processed = {
+        'image_width': info['width'],
+        'image_height': info['height'],
+        'image_variants': info['variants'],
+        'processed_at': datetime.utcnow().isoformat()
+    }
+    try:
+        # Загрузка, к которой так и не привязали пост, остаётся без ссылок и
+        # будет удалена сборщиком мусора (см. image_refs). orphaned_at ставится
+        # только новой записи: у существующей его ведут acquire/release_image
+        images_table.put_item(
+            Item={'image_key': key, **processed, 'ref_count': 0, 'orphaned_at': processed['processed_at']},
+            ConditionExpression='attribute_not_exists(image_key)'
+        )
+    except images_table.meta.client.exceptions.ConditionalCheckFailedException:
+        try:
+            images_table.update_item(
+                Key={'image_key': key},
+                UpdateExpression='SET image_width = :w, image_height = :h, image_variants = :v, processed_at = :t',
+                ConditionExpression='attribute_exists(image_key)',
+                ExpressionAttributeValues={
+                    ':w': processed['image_width'],
+                    ':h': processed['image_height'],
+                    ':v': processed['image_variants'],
+                    ':t': processed['processed_at']
+                }
+            )
+        except images_table.meta.client.exceptions.ConditionalCheckFailedException:
+            # Запись удалил сборщик мусора вместе с оригиналом: варианты никому не нужны
+            return 0
+
+    posts_table = dynamodb.Table('posts')
+    response = posts_table.query(
+        IndexName='idx_image_key',
+        KeyConditionExpression='image_key = :key',
+        ExpressionAttributeValues={':key': key},
+        ProjectionExpression='post_id'
+    )
+
+    for post in response.get('Items', []):
+        posts_table.update_item(
+            Key={'post_id': post['post_id']},
+            UpdateExpression='SET image_width = :w, image_height = :h, image_variants = :v',
+            ExpressionAttributeValues={
+                ':w': info['width'],
+                ':h': info['height'],
+                ':v': info['variants']
+            }
+        )
+
+    return len(response.get('Items', []))
+
+def object_keys(event):
+    for message in event.get('messages', []):
+        key = message.get('details', {}).get('object_id', '')
+        if key.startswith(ORIGINALS_PREFIX):
+            yield key
+
+@instrumented('image_worker')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+    s3 = get_s3()
+
+    processed = []
+    for key in object_keys(event):
+        try:
+            info = process_image(s3, key)
+        except (Image.UnidentifiedImageError, Image.DecompressionBombError) as e:
+            # Повтор не поможет: файл не является допустимым изображением
+            print(f"Пропуск {key}: {str(e)}")
+            continue
+
+        posts_updated = record_variants(dynamodb, key, info)
+        print(f"Варианты {key}: {', '.join(info['variants'])}, постов обновлено: {posts_updated}")
+        processed.append(key)
+
+    return {'statusCode': 200, 'processed': processed}
@@ -0,0 +1,222 @@
+"""Замеры одного вызова функции: обращения к YDB и S3, фазы и Server-Timing.
+
+Клиенты boto3 подключаются через instrument(): обработчики событий botocore
+считают запросы к сервису (с повторами), время ожидания ответа и суммарную
+ConsumedCapacity; db.call() сообщает о повторах и хеджированных чтениях.
+Фазы обработчика размечаются через `with phase('query')`.
+Декоратор @instrumented выводит по одной JSON-строке в лог на вызов и, если
+включено, добавляет к ответу заголовок Server-Timing.
+
+    INSTRUMENTATION=off   # выключено: декоратор и phase() ничего не делают
+    SERVER_TIMING=true    # добавлять заголовок Server-Timing к ответам
+"""
+import inspect
+import json
+import os
+import time
+from collections import Counter
+from contextlib import contextmanager, nullcontext
+from contextvars import ContextVar
+from functools import wraps
+
+ENABLED = os.environ.get('INSTRUMENTATION', 'on').lower() not in ('off', 'false', '0')
+SERVER_TIMING = ENABLED and os.environ.get('SERVER_TIMING', '').lower() in ('on', 'true', '1')
+
+# Операции DynamoDB API, для которых можно запросить ConsumedCapacity
+CAPACITY_OPERATIONS = {
+    'GetItem', 'PutItem', 'UpdateItem', 'DeleteItem', 'Query', 'Scan',
+    'BatchGetItem', 'BatchWriteItem', 'TransactGetItems', 'TransactWriteItems'
+}
+
+_current = ContextVar('invocation', default=None)
+_noop = nullcontext()
+
+
+class Invocation:
+    """Счётчики одного вызова функции."""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.calls = Counter()
+        self.round_trips = 0
+        self.errors = 0
+        self.service_ms = 0.0
+        self.capacity = 0.0
+        self.retries = Counter()
+        self.hedges = Counter()
+        self.phases = {}
+
+    def add_phase(self, name, elapsed_ms):
+        self.phases[name] = self.phases.get(name, 0.0) + elapsed_ms
+
+    def record_call(self, operation, elapsed_ms, parsed=None, failed=False):
+        self.calls[operation] += 1
+        self.service_ms += elapsed_ms
+        metadata = (parsed or {}).get('ResponseMetadata', {})
+        self.round_trips += 1 + metadata.get('RetryAttempts', 0)
+        if failed or 'Error' in (parsed or {}):
+            self.errors += 1
+
+        capacity = (parsed or {}).get('ConsumedCapacity')
+        for item in capacity if isinstance(capacity, list) else [capacity] if capacity else []:
+            self.capacity += float(item.get('CapacityUnits', 0))
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000
+
+    def summary(self, context=None, status_code=None):
+        return {
+            'type': 'invocation',
+            'function': self.name,
+            'request_id': getattr(context, 'request_id', None),
+            'status': status_code,
+            'duration_ms': round(self.elapsed_ms(), 2),
+            'round_trips': self.round_trips,
+            'calls': dict(self.calls),
+            'errors': self.errors,
+            'service_ms': round(self.service_ms, 2),
+            'consumed_capacity': round(self.capacity, 2),
+            'retries': sum(self.retries.values()),
+            'hedges': sum(self.hedges.values()),
+            'retried_calls': dict(self.retries),
+            'hedged_calls': dict(self.hedges),
+            'phases': {name: round(ms, 2) for name, ms in self.phases.items()}
+        }
+
+    def server_timing(self):
+        parts = [f"{name};dur={ms:.1f}" for name, ms in self.phases.items()]
+        parts.append(
+            f'db;dur={self.service_ms:.1f};desc="{self.round_trips} round trips, '
+            f'{sum(self.retries.values())} retries, {sum(self.hedges.values())} hedges"'
+        )
+        parts.append(f"total;dur={self.elapsed_ms():.1f}")
+        return ', '.join(parts)
+
+
+def emit(summary):
+    """Вывод итогов вызова; бенчмарки подменяют её, чтобы собирать замеры."""
+    print(json.dumps(summary))
+
+
+def current():
+    """Текущий замер или None вне @instrumented и в выключенном режиме."""
+    return _current.get()
+
+
+def record_retry(operation):
+    """Повтор операции после ошибки перегрузки (db.call)."""
+    if (invocation := _current.get()) is not None:
+        invocation.retries[operation] += 1
+
+
+def record_hedge(operation):
+    """Дублирующий запрос хеджированного чтения (db.call)."""
+    if (invocation := _current.get()) is not None:
+        invocation.hedges[operation] += 1
+
+
+def _before_call(model, context, **kwargs):
+    if _current.get() is not None:
+        context['instrumentation'] = (
+            f"{model.service_model.service_name}.{model.name}", time.perf_counter()
+        )
+
+
+def _after_call(context, parsed=None, **kwargs):
+    invocation = _current.get()
+    if invocation is not None and 'instrumentation' in context:
+        operation, started = context.pop('instrumentation')
+        invocation.record_call(operation, (time.perf_counter() - started) * 1000, parsed)
+
+
+def _after_call_error(context, **kwargs):
+    invocation = _current.get()
+    if invocation is not None and 'instrumentation' in context:
+        operation, started = context.pop('instrumentation')
+        invocation.record_call(operation, (time.perf_counter() - started) * 1000, failed=True)
+
+
+def _request_capacity(params, model, **kwargs):
+    if _current.get() is not None and model.name in CAPACITY_OPERATIONS:
+        params.setdefault('ReturnConsumedCapacity', 'TOTAL')
+
+
+def instrument(client):
+    """Подключение счётчиков к клиенту boto3; возвращает тот же клиент."""
+    if not ENABLED or not hasattr(client, 'meta'):
+        return client
+
+    events = client.meta.events
+    events.register('before-call.*.*', _before_call)
+    events.register('after-call.*.*', _after_call)
+    events.register('after-call-error.*.*', _after_call_error)
+    if client.meta.service_model.service_name == 'dynamodb':
+        events.register('provide-client-params.dynamodb.*', _request_capacity)
+    return client
+
+
+@contextmanager
+def _timed_phase(invocation, name):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        invocation.add_phase(name, (time.perf_counter() - started) * 1000)
+
+
+def phase(name):
+    """Контекст для замера фазы обработчика: auth, query, enrichment и т.п."""
+    invocation = _current.get()
+    if invocation is None:
+        return _noop
+    return _timed_phase(invocation, name)
+
+
+def _finish(invocation, context, response):
+    status_code = response.get('statusCode') if isinstance(response, dict) else None
+    emit(invocation.summary(context, status_code))
+    if SERVER_TIMING and isinstance(response, dict):
+        response['headers'] = dict(response.get('headers') or {})
+        response['headers']['Server-Timing'] = invocation.server_timing()
+
+
+def instrumented(name):
+    """Декоратор обработчика: замер вызова и одна строка лога в JSON.
+
+    Асинхронные обработчики (asgi.py) оборачиваются корутиной; замер
+    привязан к задаче, поэтому конкурентные вызовы не смешиваются.
+    """
+    def decorator(handler):
+        if not ENABLED:
+            return handler
+
+        if inspect.iscoroutinefunction(handler):
+            @wraps(handler)
+            async def async_wrapper(event, context):
+                invocation = Invocation(name)
+                token = _current.set(invocation)
+                response = None
+                try:
+                    response = await handler(event, context)
+                    return response
+                finally:
+                    _current.reset(token)
+                    _finish(invocation, context, response)
+
+            return async_wrapper
+
+        @wraps(handler)
+        def wrapper(event, context):
+            invocation = Invocation(name)
+            token = _current.set(invocation)
+            response = None
+            try:
+                response = handler(event, context)
+                return response
+            finally:
+                _current.reset(token)
+                _finish(invocation, context, response)
+
+        return wrapper
+    return decorator
@@ -1,36 +1,24 @@
-import os
-import boto3
 import json
-import jwt
 from datetime import datetime
 from decimal import Decimal
 
+from auth_middleware import get_claims
+from db import get_dynamodb
+from feed_snapshot import affects_first_page, mark_counters_changed
+from instrumentation import instrumented
+from post_changes import change_stamp
+from trending import refresh_score
+
 class DecimalEncoder(json.JSONEncoder):
     def default(self, obj):
         return int(obj) if isinstance(obj, Decimal) else super().default(obj)
 
-def get_user_from_token(auth_header):
-    if not auth_header or not auth_header.startswith('Bearer '):
-        return None
-    try:
-        return jwt.decode(
-            auth_header.split(' ')[1],
-            os.environ['JWT_SECRET'],
-            algorithms=['HS256']
-        )
-    except:
-        return None
-
+@instrumented('like_post')
 def handler(event, context):
-    if not (payload := get_user_from_token(event.get('headers', {}).get('Authorization'))):
+    if not (payload := get_claims(event)):
         return {'statusCode': 401, 'body': json.dumps({'error': 'Invalid token'})}
 
-    dynamodb = boto3.resource('dynamodb',
-                              endpoint_url=os.environ['YDB_ENDPOINT'],
-                              region_name=os.environ['YDB_REGION'],
-                              aws_access_key_id=os.environ['ACCESS_KEY_ID'],
-                              aws_secret_access_key=os.environ['SECRET_ACCESS_KEY']
-                              )
+    dynamodb = get_dynamodb()
 
     posts_table = dynamodb.Table('posts')
     likes_table = dynamodb.Table('post_likes')
@@ -45,7 +33,7 @@ def handler(event, context):
 
         if existing:
             likes_table.delete_item(Key=key)
-            update_expr = 'SET likes_count = likes_count - :val'
+            update_expr = 'SET likes_count = likes_count - :val, updated_at = :updated_at, updated_day = :updated_day'
             action = 'unliked'
         else:
             likes_table.put_item(Item={
@@ -53,15 +41,18 @@ def handler(event, context):
                 'user_id': user_id,
                 'created_at': datetime.utcnow().isoformat()
             })
-            update_expr = 'SET likes_count = likes_count + :val'
+            update_expr = 'SET likes_count = likes_count + :val, updated_at = :updated_at, updated_day = :updated_day'
             action = 'liked'
 
-        posts_table.update_item(
+        response = posts_table.update_item(
             Key={'post_id': post_id},
             UpdateExpression=update_expr,
-            ExpressionAttributeValues={':val': 1},
-            ReturnValues='UPDATED_NEW'
+            ExpressionAttributeValues={':val': 1, **{f':{name}': value for name, value in change_stamp().items()}},
+            ReturnValues='ALL_NEW'
         )
+        refresh_score(posts_table, response['Attributes'])
+        if affects_first_page(response['Attributes'].get('status')):
+            mark_counters_changed(dynamodb)
 
         return {
             'statusCode': 200,
@@ -0,0 +1,139 @@
+"""Файловая замена Object Storage для локального запуска.
+
+Включается переменной S3_ENDPOINT_URL=file:///путь/к/каталогу. Реализует
+подмножество методов клиента S3, которое используют функции Echo: объекты
+хранятся файлами <корень>/<бакет>/<ключ>, заголовки — рядом в <ключ>.meta.json.
+"""
+import hashlib
+import io
+import json
+import os
+import shutil
+import uuid
+from urllib.parse import urlparse
+
+from botocore.exceptions import ClientError
+
+
+class FilesystemObjectStore:
+    def __init__(self, root):
+        self.root = root
+        self._uploads = {}
+
+    @classmethod
+    def from_url(cls, url):
+        return cls(urlparse(url).path)
+
+    def _path(self, bucket, key):
+        path = os.path.normpath(os.path.join(self.root, bucket, key))
+        if not path.startswith(os.path.normpath(os.path.join(self.root, bucket)) + os.sep):
+            raise ClientError({'Error': {'Code': 'InvalidKey', 'Message': key}}, 'PutObject')
+        return path
+
+    def _not_found(self, operation, key):
+        return ClientError({'Error': {'Code': '404', 'Message': f'Not Found: {key}'}}, operation)
+
+    def _write(self, bucket, key, fileobj, content_type=None, cache_control=None, metadata=None):
+        path = self._path(bucket, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+
+        digest = hashlib.md5()
+        size = 0
+        with open(path, 'wb') as target:
+            while chunk := fileobj.read(64 * 1024):
+                digest.update(chunk)
+                size += len(chunk)
+                target.write(chunk)
+
+        meta = {
+            'ContentType': content_type or 'binary/octet-stream',
+            'ContentLength': size,
+            'ETag': f'"{digest.hexdigest()}"',
+            'Metadata': metadata or {}
+        }
+        if cache_control:
+            meta['CacheControl'] = cache_control
+        with open(path + '.meta.json', 'w') as target:
+            json.dump(meta, target)
+        return meta
+
+    def _read_meta(self, bucket, key, operation):
+        path = self._path(bucket, key)
+        if not os.path.exists(path):
+            raise self._not_found(operation, key)
+        with open(path + '.meta.json') as source:
+            return json.load(source)
+
+    def put_object(self, Bucket, Key, Body, ContentType=None, CacheControl=None, Metadata=None, **kwargs):
+        body = io.BytesIO(Body) if isinstance(Body, (bytes, bytearray)) else Body
+        meta = self._write(Bucket, Key, body, ContentType, CacheControl, Metadata)
+        return {'ETag': meta['ETag']}
+
+    def head_object(self, Bucket, Key, **kwargs):
+        return self._read_meta(Bucket, Key, 'HeadObject')
+
+    def get_object(self, Bucket, Key, **kwargs):
+        meta = self._read_meta(Bucket, Key, 'GetObject')
+        return dict(meta, Body=open(self._path(Bucket, Key), 'rb'))
+
+    def delete_object(self, Bucket, Key, **kwargs):
+        path = self._path(Bucket, Key)
+        for target in (path, path + '.meta.json'):
+            if os.path.exists(target):
+                os.remove(target)
+        return {}
+
+    def list_objects_v2(self, Bucket, Prefix='', **kwargs):
+        base = os.path.join(self.root, Bucket)
+        contents = []
+        for directory, _, files in os.walk(base):
+            for name in files:
+                if name.endswith('.meta.json'):
+                    continue
+                key = os.path.relpath(os.path.join(directory, name), base).replace(os.sep, '/')
+                if key.startswith(Prefix):
+                    contents.append({'Key': key, 'Size': os.path.getsize(os.path.join(directory, name))})
+        contents.sort(key=lambda item: item['Key'])
+        return {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': False}
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, CacheControl=None, Metadata=None, **kwargs):
+        upload_id = str(uuid.uuid4())
+        self._uploads[upload_id] = {
+            'dir': os.path.join(self.root, '.multipart', upload_id),
+            'ContentType': ContentType,
+            'CacheControl': CacheControl,
+            'Metadata': Metadata
+        }
+        os.makedirs(self._uploads[upload_id]['dir'])
+        return {'UploadId': upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **kwargs):
+        body = Body if isinstance(Body, (bytes, bytearray)) else Body.read()
+        with open(os.path.join(self._uploads[UploadId]['dir'], f'{PartNumber:05d}'), 'wb') as target:
+            target.write(body)
+        return {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, **kwargs):
+        upload = self._uploads.pop(UploadId)
+        combined = os.path.join(upload['dir'], 'combined')
+        with open(combined, 'wb') as target:
+            for part in MultipartUpload['Parts']:
+                with open(os.path.join(upload['dir'], f"{part['PartNumber']:05d}"), 'rb') as source:
+                    shutil.copyfileobj(source, target)
+
+        with open(combined, 'rb') as source:
+            meta = self._write(Bucket, Key, source, upload['ContentType'], upload['CacheControl'], upload['Metadata'])
+        shutil.rmtree(upload['dir'])
+        return {'ETag': meta['ETag']}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **kwargs):
+        upload = self._uploads.pop(UploadId, None)
+        if upload:
+            shutil.rmtree(upload['dir'], ignore_errors=True)
+        return {}
+
+    def generate_presigned_post(self, Bucket, Key, Fields=None, **kwargs):
+        return {'url': f'file://{os.path.join(self.root, Bucket)}', 'fields': dict(Fields or {}, key=Key)}
+
+    def generate_presigned_url(self, ClientMethod, Params, **kwargs):
+        return f"file://{self._path(Params['Bucket'], Params['Key'])}"
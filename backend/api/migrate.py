@@ -0,0 +1,429 @@
+"""Идемпотентные миграции схемы YDB (Document API).
+
+Сравнивает живую схему с декларативной из schema.py: создаёт недостающие
+таблицы и добавляет недостающие глобальные индексы к существующим, дожидаясь
+окончания их заполнения, и удаляет заменённые индексы. Применённые версии записываются в таблицу
+schema_migrations, поэтому повторный запуск ничего не меняет.
+
+    python migrate.py             # применить все новые миграции
+    python migrate.py --status    # показать применённые и ожидающие версии
+    python migrate.py --dry-run   # показать план без изменений
+    python migrate.py --target 2  # применить миграции до версии 2
+"""
+import argparse
+import os
+import time
+from datetime import datetime
+
+import boto3
+
+from schema import (
+    MIGRATIONS,
+    MIGRATIONS_TABLE,
+    attribute_definitions,
+    desired_schema,
+    index_definition,
+    key_schema,
+)
+from slugs import DEFAULT_SLUG, slug_candidates, slugify
+from trending import trending_score, trending_shard
+
+POLL_INTERVAL = 5
+WAIT_TIMEOUT = 30 * 60
+
+
+def get_client():
+    return boto3.client(
+        'dynamodb',
+        endpoint_url=os.environ['YDB_ENDPOINT'],
+        region_name=os.environ['YDB_REGION'],
+        aws_access_key_id=os.environ['ACCESS_KEY_ID'],
+        aws_secret_access_key=os.environ['SECRET_ACCESS_KEY'],
+        aws_session_token=os.environ.get('AWS_SESSION_TOKEN')
+    )
+
+
+def describe_table(client, name):
+    try:
+        return client.describe_table(TableName=name)['Table']
+    except client.exceptions.ResourceNotFoundException:
+        return None
+
+
+def wait_until_active(client, name, index_name=None):
+    """Ожидание готовности таблицы или заполнения (backfill) индекса."""
+    deadline = time.monotonic() + WAIT_TIMEOUT
+    while True:
+        table = describe_table(client, name)
+        if table and table.get('TableStatus') == 'ACTIVE':
+            if index_name is None:
+                return table
+            index = next(
+                (i for i in table.get('GlobalSecondaryIndexes', []) if i['IndexName'] == index_name),
+                None
+            )
+            if index and index.get('IndexStatus') == 'ACTIVE' and not index.get('Backfilling'):
+                return table
+
+        if time.monotonic() > deadline:
+            target = f"{name}.{index_name}" if index_name else name
+            raise TimeoutError(f"Не дождались готовности {target}")
+        time.sleep(POLL_INTERVAL)
+
+
+def create_table(client, name, spec, dry_run=False):
+    print(f"+ Таблица {name}")
+    if dry_run:
+        return
+
+    params = {
+        'TableName': name,
+        'KeySchema': key_schema(spec['key']),
+        'AttributeDefinitions': attribute_definitions(spec['key'], *spec['indexes'].values()),
+        'BillingMode': 'PAY_PER_REQUEST'
+    }
+    if spec['indexes']:
+        params['GlobalSecondaryIndexes'] = [
+            index_definition(index_name, key) for index_name, key in spec['indexes'].items()
+        ]
+
+    client.create_table(**params)
+    wait_until_active(client, name)
+    print(f"✓ Таблица {name} создана")
+
+
+def add_index(client, name, index_name, key, dry_run=False):
+    print(f"+ Индекс {name}.{index_name}")
+    if dry_run:
+        return
+
+    client.update_table(
+        TableName=name,
+        AttributeDefinitions=attribute_definitions(key),
+        GlobalSecondaryIndexUpdates=[{'Create': index_definition(index_name, key)}]
+    )
+    wait_until_active(client, name, index_name)
+    print(f"✓ Индекс {name}.{index_name} заполнен")
+
+
+def drop_index(client, name, index_name, dry_run=False):
+    live = describe_table(client, name)
+    if not live or index_name not in {i['IndexName'] for i in live.get('GlobalSecondaryIndexes', [])}:
+        return
+
+    print(f"- Индекс {name}.{index_name}")
+    if dry_run:
+        return
+
+    client.update_table(
+        TableName=name,
+        GlobalSecondaryIndexUpdates=[{'Delete': {'IndexName': index_name}}]
+    )
+    wait_until_active(client, name)
+    print(f"✓ Индекс {name}.{index_name} удалён")
+
+
+def sync_table(client, name, spec, dry_run=False):
+    """Приведение живой таблицы к описанию: создание или добавление индексов."""
+    live = describe_table(client, name)
+    if live is None:
+        create_table(client, name, spec, dry_run)
+        return
+
+    live_indexes = {i['IndexName'] for i in live.get('GlobalSecondaryIndexes', [])}
+    for index_name, key in spec['indexes'].items():
+        if index_name not in live_indexes:
+            # Индексы добавляются по одному: YDB и DynamoDB не позволяют
+            # создавать несколько индексов одним update_table
+            add_index(client, name, index_name, key, dry_run)
+
+
+def ensure_migrations_table(client, dry_run=False):
+    if describe_table(client, MIGRATIONS_TABLE) is None:
+        create_table(client, MIGRATIONS_TABLE, {'key': {'version': 'N'}, 'indexes': {}}, dry_run)
+
+
+def applied_versions(client):
+    if describe_table(client, MIGRATIONS_TABLE) is None:
+        return set()
+
+    items = scan_all(client, TableName=MIGRATIONS_TABLE, ConsistentRead=True)
+    return {int(item['version']['N']) for item in items}
+
+
+def record_version(client, migration):
+    client.put_item(
+        TableName=MIGRATIONS_TABLE,
+        Item={
+            'version': {'N': str(migration['version'])},
+            'description': {'S': migration['description']},
+            'applied_at': {'S': datetime.utcnow().isoformat()}
+        }
+    )
+
+
+def scan_all(client, **kwargs):
+    while True:
+        response = client.scan(**kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+
+def backfill_user_emails(client):
+    """Заполнение user_emails для пользователей, созданных до миграции 3."""
+    copied = 0
+    for user in scan_all(client, TableName='users',
+                         ProjectionExpression='user_id, email, username, password_hash, created_at'):
+        email = user['email']['S'].strip().lower()
+        item = {'email': {'S': email}}
+        item.update({name: user[name] for name in ('user_id', 'username', 'password_hash', 'created_at') if name in user})
+        try:
+            client.put_item(
+                TableName='user_emails',
+                Item=item,
+                ConditionExpression='attribute_not_exists(email)'
+            )
+            copied += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            print(f"! Email {email} уже занят, пользователь {user['user_id']['S']} пропущен")
+    print(f"✓ В user_emails перенесено пользователей: {copied}")
+
+
+def backfill_author_snapshots(client):
+    """author_snapshot для постов и комментариев, созданных до миграции 5."""
+    snapshots = {}
+    for user in scan_all(client, TableName='users',
+                         ProjectionExpression='user_id, username, display_name, avatar_url, profile_version'):
+        snapshot = {name: user.get(name, {'S': ''}) for name in ('username', 'display_name', 'avatar_url')}
+        snapshot['version'] = user.get('profile_version', {'N': '0'})
+        snapshots[user['user_id']['S']] = {'M': snapshot}
+
+    for table, key, author in (('posts', 'post_id', 'author_id'), ('comments', 'comment_id', 'user_id')):
+        filled = 0
+        for item in scan_all(client, TableName=table, ProjectionExpression=f'{key}, {author}',
+                             FilterExpression='attribute_not_exists(author_snapshot)'):
+            snapshot = snapshots.get(item.get(author, {}).get('S'))
+            if snapshot is None:
+                continue
+            try:
+                client.update_item(
+                    TableName=table,
+                    Key={key: item[key]},
+                    UpdateExpression='SET author_snapshot = :snapshot',
+                    ConditionExpression='attribute_exists(#key) AND attribute_not_exists(author_snapshot)',
+                    ExpressionAttributeNames={'#key': key},
+                    ExpressionAttributeValues={':snapshot': snapshot}
+                )
+                filled += 1
+            except client.exceptions.ConditionalCheckFailedException:
+                pass
+        print(f"✓ author_snapshot заполнен в {table}: {filled}")
+
+
+def backfill_updated_day(client):
+    """updated_day (день из updated_at) для постов, созданных до миграции 7."""
+    filled = 0
+    for post in scan_all(client, TableName='posts', ProjectionExpression='post_id, updated_at, created_at',
+                         FilterExpression='attribute_not_exists(updated_day)'):
+        updated_at = post.get('updated_at') or post.get('created_at') or {'S': datetime.utcnow().isoformat()}
+        try:
+            client.update_item(
+                TableName='posts',
+                Key={'post_id': post['post_id']},
+                UpdateExpression='SET updated_at = :updated_at, updated_day = :updated_day',
+                ConditionExpression='attribute_exists(post_id) AND attribute_not_exists(updated_day)',
+                ExpressionAttributeValues={':updated_at': updated_at, ':updated_day': {'S': updated_at['S'][:10]}}
+            )
+            filled += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            pass
+    print(f"✓ updated_day заполнен в posts: {filled}")
+
+
+def backfill_slugs(client):
+    """Таблица slugs для постов, созданных до миграции 8.
+
+    Старые посты занимают slug первыми; совпавшие у более новых получают
+    числовой суффикс, и slug в записи поста меняется.
+    """
+    posts = sorted(scan_all(client, TableName='posts', ProjectionExpression='post_id, slug, title, created_at'),
+                   key=lambda post: post.get('created_at', {}).get('S', ''))
+    claimed = renamed = 0
+    for post in posts:
+        post_id = post['post_id']['S']
+        current = post.get('slug', {}).get('S')
+        base = current or slugify(post.get('title', {}).get('S')) or DEFAULT_SLUG
+        for slug in slug_candidates(base):
+            try:
+                client.put_item(
+                    TableName='slugs',
+                    Item={'slug': {'S': slug}, 'post_id': {'S': post_id},
+                          'created_at': {'S': datetime.utcnow().isoformat()}},
+                    ConditionExpression='attribute_not_exists(slug) OR post_id = :post_id',
+                    ExpressionAttributeValues={':post_id': {'S': post_id}}
+                )
+                break
+            except client.exceptions.ConditionalCheckFailedException:
+                continue
+        else:
+            print(f"! Для поста {post_id} не найден свободный slug")
+            continue
+        claimed += 1
+        if slug != current:
+            try:
+                client.update_item(
+                    TableName='posts',
+                    Key={'post_id': {'S': post_id}},
+                    UpdateExpression='SET slug = :slug',
+                    ConditionExpression='attribute_exists(post_id)',
+                    ExpressionAttributeValues={':slug': {'S': slug}}
+                )
+                renamed += 1
+            except client.exceptions.ConditionalCheckFailedException:
+                pass
+    print(f"✓ slugs заполнена: {claimed}, slug изменён у постов: {renamed}")
+
+
+def backfill_trending_scores(client):
+    """trending_score для постов, созданных до миграции 9."""
+    filled = 0
+    for post in scan_all(client, TableName='posts',
+                         ProjectionExpression='post_id, likes_count, comments_count, created_at',
+                         FilterExpression='attribute_not_exists(trending_score) AND attribute_exists(created_at)'):
+        score = trending_score(post.get('likes_count', {}).get('N', 0), post.get('comments_count', {}).get('N', 0),
+                               post['created_at']['S'])
+        try:
+            client.update_item(
+                TableName='posts',
+                Key={'post_id': post['post_id']},
+                UpdateExpression='SET trending_score = :score',
+                ConditionExpression='attribute_exists(post_id) AND attribute_not_exists(trending_score)',
+                ExpressionAttributeValues={':score': {'N': str(score)}}
+            )
+            filled += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            pass
+    print(f"✓ trending_score заполнен в posts: {filled}")
+
+
+def backfill_published_at(client):
+    """published_at = created_at для опубликованных постов, созданных до миграции 12.
+
+    Удалённые посты не заполняются: delete_post перезаписал статус, и
+    черновик от опубликованного поста уже не отличить.
+    """
+    filled = 0
+    for post in scan_all(client, TableName='posts', ProjectionExpression='post_id, created_at',
+                         FilterExpression='#status = :published AND attribute_not_exists(published_at)',
+                         ExpressionAttributeNames={'#status': 'status'},
+                         ExpressionAttributeValues={':published': {'S': 'published'}}):
+        published_at = post.get('created_at') or {'S': datetime.utcnow().isoformat()}
+        try:
+            client.update_item(
+                TableName='posts',
+                Key={'post_id': post['post_id']},
+                UpdateExpression='SET published_at = :published_at',
+                ConditionExpression='attribute_exists(post_id) AND attribute_not_exists(published_at)',
+                ExpressionAttributeValues={':published_at': published_at}
+            )
+            filled += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            pass
+    print(f"✓ published_at заполнен в posts: {filled}")
+
+
+def backfill_trending_shards(client):
+    """trending_shard для опубликованных постов, созданных до миграции 13."""
+    filled = 0
+    for post in scan_all(client, TableName='posts', ProjectionExpression='post_id',
+                         FilterExpression='#status = :published AND attribute_not_exists(trending_shard)',
+                         ExpressionAttributeNames={'#status': 'status'},
+                         ExpressionAttributeValues={':published': {'S': 'published'}}):
+        try:
+            client.update_item(
+                TableName='posts',
+                Key={'post_id': post['post_id']},
+                UpdateExpression='SET trending_shard = :shard',
+                ConditionExpression='#status = :published',
+                ExpressionAttributeNames={'#status': 'status'},
+                ExpressionAttributeValues={
+                    ':shard': {'S': trending_shard(post['post_id']['S'])},
+                    ':published': {'S': 'published'}
+                }
+            )
+            filled += 1
+        except client.exceptions.ConditionalCheckFailedException:
+            pass
+    print(f"✓ trending_shard заполнен в posts: {filled}")
+
+
+BACKFILLS = {
+    'user_emails': backfill_user_emails,
+    'author_snapshots': backfill_author_snapshots,
+    'updated_day': backfill_updated_day,
+    'slugs': backfill_slugs,
+    'trending_scores': backfill_trending_scores,
+    'published_at': backfill_published_at,
+    'trending_shards': backfill_trending_shards,
+}
+
+
+def apply_migration(client, migration, dry_run=False):
+    schema = desired_schema(migration['version'])
+    touched = list(migration.get('tables', {})) + list(migration.get('indexes', {}))
+
+    for name in dict.fromkeys(touched):
+        sync_table(client, name, schema[name], dry_run)
+
+    if migration.get('backfill'):
+        print(f"+ Заполнение данных: {migration['backfill']}")
+        if not dry_run:
+            BACKFILLS[migration['backfill']](client)
+
+    for name, indexes in migration.get('drop_indexes', {}).items():
+        for index_name in indexes:
+            drop_index(client, name, index_name, dry_run)
+
+
+def migrate(client=None, target_version=None, dry_run=False):
+    """Применение всех ещё не записанных миграций по порядку."""
+    client = client or get_client()
+    ensure_migrations_table(client, dry_run)
+    applied = applied_versions(client)
+
+    for migration in MIGRATIONS:
+        version = migration['version']
+        if target_version is not None and version > target_version:
+            break
+        if version in applied:
+            continue
+
+        print(f"Миграция {version}: {migration['description']}")
+        apply_migration(client, migration, dry_run)
+        if not dry_run:
+            record_version(client, migration)
+
+    return client
+
+
+def print_status(client):
+    applied = applied_versions(client)
+    for migration in MIGRATIONS:
+        mark = '✓' if migration['version'] in applied else ' '
+        print(f"[{mark}] {migration['version']}: {migration['description']}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Миграции схемы Echo')
+    parser.add_argument('--status', action='store_true', help='показать состояние миграций')
+    parser.add_argument('--dry-run', action='store_true', help='показать план без изменений')
+    parser.add_argument('--target', type=int, help='применить миграции до указанной версии')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status(get_client())
+    else:
+        migrate(target_version=args.target, dry_run=args.dry_run)
+        print("Схема актуальна")
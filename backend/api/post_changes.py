@@ -0,0 +1,30 @@
+"""Метки изменений постов для GET /posts/changes.
+
+Каждая запись поста — создание, правка, удаление, счётчики лайков и
+комментариев — ставит updated_at и updated_day (день из updated_at).
+Индекс posts.idx_updated (updated_day, updated_at) отдаёт изменения после
+курсора по одной секции на сутки, без горячей секции на весь поток записей.
+Удалённые посты остаются в индексе до purge_posts, поэтому курсор не
+старше CHANGES_RETENTION получает их как tombstone; более старый требует
+полной перезагрузки ленты.
+
+published_at — время первой публикации: ставится при публикации и не
+снимается. Посты без него (черновики, в том числе удалённые) в ленте
+изменений не видны.
+"""
+from datetime import datetime, timedelta
+
+# delete_post назначает окончательное удаление через 30 дней
+CHANGES_RETENTION = timedelta(days=30)
+
+# Индекс обновляется асинхронно: курсор отстаёт от текущего времени,
+# чтобы запоздавшие записи индекса не оказались позади него
+CHANGES_LAG = timedelta(seconds=2)
+
+def change_stamp(now=None):
+    updated_at = (now or datetime.utcnow()).isoformat()
+    return {'updated_at': updated_at, 'updated_day': updated_at[:10]}
+
+def changes_cursor(now=None):
+    """Курсор, с которого клиент запрашивает изменения после загрузки страницы."""
+    return ((now or datetime.utcnow()) - CHANGES_LAG).isoformat()
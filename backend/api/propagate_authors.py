@@ -0,0 +1,85 @@
+"""Распространение изменений профиля в author_snapshot постов и комментариев.
+
+Запускается по таймеру. Берёт пользователей из очереди (разреженный индекс
+users.idx_propagation, флаг ставит author_snapshot.update_profile),
+переписывает снимок во всех их постах, комментариях и превью
+recent_comments затронутых постов и снимает флаг, если профиль за это
+время не менялся снова. Можно вызвать и напрямую с {"user_ids": [...]} —
+дописать снимки пользователей вне очереди.
+"""
+from author_snapshot import PROFILE_ATTRIBUTES, PROPAGATION_PENDING, apply_snapshot, snapshot_of
+from db import get_dynamodb, query_all
+from feed_snapshot import mark_feed_changed
+from instrumentation import instrumented
+from post_changes import change_stamp
+from recent_comments import rebuild_preview
+
+def pending_users(dynamodb):
+    return query_all(
+        dynamodb.Table('users'),
+        IndexName='idx_propagation',
+        KeyConditionExpression='propagation_pending = :pending',
+        ExpressionAttributeValues={':pending': PROPAGATION_PENDING},
+        ProjectionExpression=', '.join(PROFILE_ATTRIBUTES)
+    )
+
+def load_users(dynamodb, user_ids):
+    users_table = dynamodb.Table('users')
+    for user_id in user_ids:
+        user = users_table.get_item(Key={'user_id': user_id}, AttributesToGet=PROFILE_ATTRIBUTES).get('Item')
+        if user:
+            yield user
+
+def propagate_user(dynamodb, user):
+    """Перезапись снимка в постах и комментариях пользователя; число обновлённых элементов."""
+    snapshot = snapshot_of(user)
+    user_id = user['user_id']
+    updated = 0
+
+    posts_table = dynamodb.Table('posts')
+    for post in query_all(posts_table, IndexName='idx_author', ProjectionExpression='post_id',
+                          KeyConditionExpression='author_id = :user_id',
+                          ExpressionAttributeValues={':user_id': user_id}):
+        updated += apply_snapshot(posts_table, {'post_id': post['post_id']}, snapshot, change_stamp())
+
+    comments_table = dynamodb.Table('comments')
+    commented_posts = set()
+    for comment in query_all(comments_table, IndexName='idx_comments_user', ProjectionExpression='comment_id, post_id',
+                             KeyConditionExpression='user_id = :user_id',
+                             ExpressionAttributeValues={':user_id': user_id}):
+        if apply_snapshot(comments_table, {'comment_id': comment['comment_id']}, snapshot):
+            updated += 1
+            commented_posts.add(comment['post_id'])
+
+    # Превью recent_comments в постах содержат копии снимков комментариев
+    for post_id in commented_posts:
+        rebuild_preview(dynamodb, post_id)
+
+    users_table = dynamodb.Table('users')
+    try:
+        # Профиль изменили ещё раз во время прохода — флаг остаётся до следующего запуска
+        users_table.update_item(
+            Key={'user_id': user_id},
+            UpdateExpression='REMOVE propagation_pending',
+            ConditionExpression='profile_version = :version',
+            ExpressionAttributeValues={':version': snapshot['version']}
+        )
+    except users_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+
+    return updated
+
+@instrumented('propagate_authors')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+
+    user_ids = (event or {}).get('user_ids') if isinstance(event, dict) else None
+    users = list(load_users(dynamodb, user_ids) if user_ids else pending_users(dynamodb))
+
+    updated = sum(propagate_user(dynamodb, user) for user in users)
+    if updated:
+        # Снимки авторов и превью комментариев есть и на первой странице ленты
+        mark_feed_changed(dynamodb)
+
+    print(f"Профилей распространено: {len(users)}, элементов обновлено: {updated}")
+    return {'statusCode': 200, 'users': len(users), 'updated': updated}
@@ -0,0 +1,82 @@
+"""Окончательное удаление постов, помеченных delete_post.
+
+Запускается по таймеру. Удаляет посты, у которых наступил
+permanent_delete_at, вместе с их лайками и комментариями, освобождает
+slug и ссылки на изображения и затем собирает мусор в хранилище изображений.
+"""
+from datetime import datetime
+
+from db import get_dynamodb
+from image_refs import collect_garbage, release_image
+from instrumentation import instrumented
+from slugs import release_slug
+
+def delete_related(table, index_name, key_name, post_id, item_key):
+    query_kwargs = {
+        'KeyConditionExpression': f'{key_name} = :post_id',
+        'ExpressionAttributeValues': {':post_id': post_id}
+    }
+    if index_name:
+        query_kwargs['IndexName'] = index_name
+
+    deleted = 0
+    with table.batch_writer() as batch:
+        while True:
+            response = table.query(**query_kwargs)
+            for item in response.get('Items', []):
+                batch.delete_item(Key={name: item[name] for name in item_key})
+                deleted += 1
+            if 'LastEvaluatedKey' not in response:
+                return deleted
+            query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def purge_post(dynamodb, post):
+    posts_table = dynamodb.Table('posts')
+    post_id = post['post_id']
+
+    try:
+        posts_table.delete_item(
+            Key={'post_id': post_id},
+            ConditionExpression='is_deleted = :deleted',
+            ExpressionAttributeValues={':deleted': True}
+        )
+    except posts_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # Пост восстановили после выборки
+        return False
+
+    delete_related(dynamodb.Table('post_likes'), None, 'post_id', post_id, ('post_id', 'user_id'))
+    delete_related(dynamodb.Table('comments'), 'idx_comments_post', 'post_id', post_id, ('comment_id',))
+
+    if post.get('image_key'):
+        release_image(dynamodb, post['image_key'])
+    release_slug(dynamodb, post.get('slug'), post_id)
+
+    return True
+
+def expired_posts(dynamodb, now):
+    query_kwargs = {
+        'IndexName': 'idx_status',
+        'KeyConditionExpression': '#status = :status',
+        'FilterExpression': 'permanent_delete_at <= :now',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':status': 'deleted', ':now': now.isoformat()},
+        'ProjectionExpression': 'post_id, image_key, slug'
+    }
+
+    while True:
+        response = dynamodb.Table('posts').query(**query_kwargs)
+        yield from response.get('Items', [])
+        if 'LastEvaluatedKey' not in response:
+            return
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+@instrumented('purge_posts')
+def handler(event, context):
+    dynamodb = get_dynamodb()
+    now = datetime.utcnow()
+
+    purged = sum(purge_post(dynamodb, post) for post in list(expired_posts(dynamodb, now)))
+    images_deleted = collect_garbage(dynamodb, now=now)
+
+    print(f"Удалено постов: {purged}, изображений: {images_deleted}")
+    return {'statusCode': 200, 'purged': purged, 'images_deleted': images_deleted}
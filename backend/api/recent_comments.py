@@ -0,0 +1,142 @@
+"""Превью последних комментариев (recent_comments) в записи поста.
+
+comment_post добавляет комментарий в начало списка и обрезает его до
+RECENT_COMMENTS_LIMIT тем же условным UpdateItem, что увеличивает
+comments_count: условие на прочитанный счётчик не даёт конкурентным
+комментариям затереть друг друга. Лента показывает превью прямо из записи.
+Если длина списка не сходится со счётчиком (старые посты, сбой между
+записью комментария и поста), превью перестраивается по последним
+комментариям из comments.idx_comments_recent; всего комментариев —
+comments_count, если прочитаны не все.
+"""
+from post_changes import change_stamp
+
+RECENT_COMMENTS_LIMIT = 5
+
+PREVIEW_FIELDS = ('comment_id', 'post_id', 'user_id', 'text', 'created_at', 'parent_comment_id', 'author_snapshot')
+
+PREVIEW_ATTRIBUTES = ['post_id', 'comments_count', 'recent_comments']
+
+PUSH_ATTEMPTS = 5
+
+def preview(comment):
+    return {name: comment[name] for name in PREVIEW_FIELDS if name in comment}
+
+def inline_preview(post, limit):
+    """(комментарии, всего) из записи поста или None, если превью нужно перестроить."""
+    if limit > RECENT_COMMENTS_LIMIT:
+        return None
+    total = post.get('comments_count', 0)
+    recent = post.get('recent_comments')
+    if recent is None:
+        return ([], 0) if not total else None
+    if len(recent) != min(total, RECENT_COMMENTS_LIMIT):
+        return None
+    return recent[:limit], total
+
+def seen_count_update(post, assignments, values, stamp=True):
+    """Параметры UpdateItem, который применится, только если comments_count не менялся.
+
+    С stamp заодно ставит метку изменения поста для GET /posts/changes.
+    """
+    if stamp:
+        assignments += ', updated_at = :updated_at, updated_day = :updated_day'
+        values = dict(values, **{f':{name}': value for name, value in change_stamp().items()})
+    else:
+        values = dict(values)
+    if 'comments_count' in post:
+        condition = 'comments_count = :seen'
+        values[':seen'] = post['comments_count']
+    else:
+        condition = 'attribute_exists(post_id) AND attribute_not_exists(comments_count)'
+    return {
+        'Key': {'post_id': post['post_id']},
+        'UpdateExpression': 'SET ' + assignments,
+        'ConditionExpression': condition,
+        'ExpressionAttributeValues': values
+    }
+
+def comments_query(post_id, limit):
+    """Запрос последних комментариев поста, новые первыми."""
+    return {
+        'IndexName': 'idx_comments_recent',
+        'KeyConditionExpression': 'post_id = :post_id',
+        'ExpressionAttributeValues': {':post_id': post_id},
+        'ScanIndexForward': False,
+        'Limit': max(limit, RECENT_COMMENTS_LIMIT)
+    }
+
+def comments_total(post, comments, complete):
+    """Число комментариев: точное, если прочитаны все, иначе comments_count поста."""
+    return len(comments) if complete else max(post.get('comments_count', 0), len(comments))
+
+def preview_update(post, comments, total, stamp=False):
+    """Параметры UpdateItem, записывающего перестроенное превью и счётчик."""
+    return seen_count_update(post, 'recent_comments = :recent, comments_count = :count', {
+        ':recent': [preview(comment) for comment in comments[:RECENT_COMMENTS_LIMIT]],
+        ':count': total
+    }, stamp)
+
+def load_comments(comments_table, post, limit):
+    """(последние max(limit, RECENT_COMMENTS_LIMIT) комментариев новыми первыми, всего)."""
+    query_kwargs = comments_query(post['post_id'], limit)
+    comments = []
+    while True:
+        response = comments_table.query(**query_kwargs)
+        comments.extend(response.get('Items', []))
+        complete = 'LastEvaluatedKey' not in response
+        if complete or len(comments) >= query_kwargs['Limit']:
+            return comments, comments_total(post, comments, complete)
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+
+def store_preview(posts_table, post, comments, total, stamp=False):
+    """Запись перестроенного превью; False, если пост за это время изменился.
+
+    Перестроение при чтении ленты метку изменения не ставит: содержимое поста
+    для клиента то же.
+    """
+    try:
+        posts_table.update_item(**preview_update(post, comments, total, stamp))
+        return True
+    except posts_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return False
+
+def rebuild_preview(dynamodb, post_id):
+    """Перестроение превью поста по таблице comments (новые снимки авторов — изменение поста)."""
+    posts_table = dynamodb.Table('posts')
+    post = posts_table.get_item(Key={'post_id': post_id}, AttributesToGet=PREVIEW_ATTRIBUTES).get('Item')
+    if post:
+        comments, total = load_comments(dynamodb.Table('comments'), post, RECENT_COMMENTS_LIMIT)
+        store_preview(posts_table, post, comments, total, stamp=True)
+
+def push_comment(posts_table, post, comment):
+    """Комментарий в начало recent_comments и +1 к comments_count.
+
+    post — запись с PREVIEW_ATTRIBUTES; при конкурентной записи она
+    перечитывается. Если за PUSH_ATTEMPTS попыток обновить не удалось,
+    счётчик увеличивается безусловно, а список удаляется — лента
+    перестроит его из comments. Возвращает новый comments_count или
+    None, если пост удалён.
+    """
+    conditional_failed = posts_table.meta.client.exceptions.ConditionalCheckFailedException
+    for _ in range(PUSH_ATTEMPTS):
+        recent = [preview(comment)] + list(post.get('recent_comments') or [])[:RECENT_COMMENTS_LIMIT - 1]
+        try:
+            posts_table.update_item(**seen_count_update(post, 'recent_comments = :recent, comments_count = :count', {
+                ':recent': recent,
+                ':count': post.get('comments_count', 0) + 1
+            }))
+            return post.get('comments_count', 0) + 1
+        except conditional_failed:
+            post = posts_table.get_item(Key={'post_id': post['post_id']}, AttributesToGet=PREVIEW_ATTRIBUTES).get('Item')
+            if not post:
+                return None
+
+    response = posts_table.update_item(
+        Key={'post_id': post['post_id']},
+        UpdateExpression='SET comments_count = if_not_exists(comments_count, :zero) + :inc, '
+                         'updated_at = :updated_at, updated_day = :updated_day REMOVE recent_comments',
+        ExpressionAttributeValues={':inc': 1, ':zero': 0, **{f':{name}': value for name, value in change_stamp().items()}},
+        ReturnValues='UPDATED_NEW'
+    )
+    return response['Attributes']['comments_count']
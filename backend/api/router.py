@@ -0,0 +1,80 @@
+"""Единая точка входа для всех маршрутов API Gateway.
+
+При развёртывании с single_function = true все маршруты обслуживает одна
+функция: тёплые контейнеры общие для всех эндпоинтов, поэтому редкие
+запросы (редактирование, удаление) не попадают на холодный старт.
+Модуль обработчика импортируется при первом запросе к его маршруту, клиенты
+и кэши (db, storage, auth_middleware) общие для всех маршрутов контейнера.
+"""
+import importlib
+import json
+import re
+
+# Маршруты api-gateway.yaml: (метод, шаблон пути, модуль обработчика)
+ROUTES = [
+    ('POST', '/auth/register', 'auth'),
+    ('POST', '/auth/login', 'auth'),
+    ('POST', '/auth/refresh', 'auth'),
+    ('POST', '/auth/logout', 'auth'),
+    ('GET', '/posts', 'get_posts'),
+    ('GET', '/posts/changes', 'get_post_changes'),
+    ('GET', '/posts/by-slug/{slug}', 'get_post'),
+    ('GET', '/posts/{post_id}', 'get_post'),
+    ('POST', '/posts/create', 'create_post'),
+    ('PUT', '/posts/{post_id}/edit', 'edit_post'),
+    ('DELETE', '/posts/{post_id}/delete', 'delete_post'),
+    ('POST', '/posts/{post_id}/like', 'like_post'),
+    ('POST', '/comments', 'comment_post'),
+    ('GET', '/timeline', 'get_timeline'),
+    ('POST', '/users/{user_id}/follow', 'follow_user'),
+    ('DELETE', '/users/{user_id}/follow', 'follow_user'),
+    ('POST', '/uploads', 'uploads'),
+]
+
+
+def compile_template(template):
+    pattern = re.sub(r'\\\{(\w+)\\\}', r'(?P<\1>[^/]+)', re.escape(template))
+    return re.compile(f'^{pattern}/?$')
+
+
+DISPATCH = {(method, template): module for method, template, module in ROUTES}
+COMPILED_ROUTES = [(method, compile_template(template), module) for method, template, module in ROUTES]
+
+_handlers = {}
+
+
+def resolve(method, path):
+    """(модуль, параметры пути) для запроса или (None, {})."""
+    # API Gateway передаёт в path шаблон маршрута, в url — фактический путь
+    if module := DISPATCH.get((method, path)):
+        return module, {}
+    for route_method, pattern, module in COMPILED_ROUTES:
+        if route_method == method and (match := pattern.match(path)):
+            return module, match.groupdict()
+    return None, {}
+
+
+def get_handler(module):
+    if module not in _handlers:
+        _handlers[module] = importlib.import_module(module).handler
+    return _handlers[module]
+
+
+def handler(event, context):
+    method = (event.get('httpMethod') or '').upper()
+    path = (event.get('url') or event.get('path') or '').split('?', 1)[0]
+
+    module, params = resolve(method, event.get('path') or '')
+    if module is None:
+        module, params = resolve(method, path)
+
+    if module is None:
+        return {
+            'statusCode': 404,
+            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
+            'body': json.dumps({'success': False, 'error': 'Маршрут не найден'})
+        }
+
+    if params:
+        event = dict(event, pathParameters={**(event.get('pathParameters') or {}), **params})
+    return get_handler(module)(event, context)
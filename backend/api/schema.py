@@ -0,0 +1,224 @@
+"""Декларативное описание схемы таблиц Echo.
+
+Схема задаётся списком версионированных миграций. Каждая миграция либо
+создаёт таблицы, либо добавляет индексы к уже существующим; drop_indexes
+удаляет индексы, которые заменены новыми. Ключи и индексы
+описываются словарём «атрибут -> тип»: первый атрибут — HASH, второй — RANGE.
+Все индексы проецируют все атрибуты, таблицы работают в режиме PAY_PER_REQUEST.
+Миграция может указать backfill — имя процедуры заполнения данных из migrate.py.
+Индексы из drop_indexes удаляются после backfill, когда замена уже заполнена.
+"""
+
+MIGRATIONS_TABLE = 'schema_migrations'
+
+MIGRATIONS = [
+    {
+        'version': 1,
+        'description': 'Начальная схема: users, posts, post_likes, comments',
+        'tables': {
+            'users': {
+                'key': {'user_id': 'S'},
+                'indexes': {
+                    'idx_email': {'email': 'S'},
+                    'idx_username': {'username': 'S'},
+                },
+            },
+            'posts': {
+                'key': {'post_id': 'S'},
+                'indexes': {
+                    'idx_author': {'author_id': 'S'},
+                    'idx_slug': {'slug': 'S'},
+                    'idx_status': {'status': 'S'},
+                },
+            },
+            'post_likes': {
+                'key': {'post_id': 'S', 'user_id': 'S'},
+                'indexes': {
+                    'idx_user': {'user_id': 'S'},
+                },
+            },
+            'comments': {
+                'key': {'comment_id': 'S'},
+                'indexes': {
+                    'idx_comments_post': {'post_id': 'S'},
+                    'idx_comments_user': {'user_id': 'S'},
+                },
+            },
+        },
+    },
+    {
+        'version': 2,
+        'description': 'Варианты изображений: таблица images и индекс posts.idx_image_key',
+        'tables': {
+            'images': {
+                'key': {'image_key': 'S'},
+            },
+        },
+        'indexes': {
+            'posts': {
+                'idx_image_key': {'image_key': 'S'},
+            },
+        },
+    },
+    {
+        'version': 3,
+        'description': 'Таблица user_emails: уникальность email и вход по первичному ключу',
+        'tables': {
+            'user_emails': {
+                'key': {'email': 'S'},
+            },
+        },
+        'backfill': 'user_emails',
+    },
+    {
+        'version': 4,
+        'description': 'Таблица sessions: refresh-токены с ротацией и отзывом',
+        'tables': {
+            'sessions': {
+                'key': {'session_id': 'S'},
+            },
+        },
+    },
+    {
+        'version': 5,
+        'description': 'author_snapshot в постах и комментариях, очередь users.idx_propagation',
+        'indexes': {
+            'users': {
+                'idx_propagation': {'propagation_pending': 'S'},
+            },
+        },
+        'backfill': 'author_snapshots',
+    },
+    {
+        'version': 6,
+        'description': 'Таблица feed_state: счётчик изменений ленты для снимка первой страницы',
+        'tables': {
+            'feed_state': {
+                'key': {'feed_id': 'S'},
+            },
+        },
+    },
+    {
+        'version': 7,
+        'description': 'Индекс posts.idx_updated для GET /posts/changes',
+        'indexes': {
+            'posts': {
+                'idx_updated': {'updated_day': 'S', 'updated_at': 'S'},
+            },
+        },
+        'backfill': 'updated_day',
+    },
+    {
+        'version': 8,
+        'description': 'Таблица slugs: уникальные slug постов',
+        'tables': {
+            'slugs': {
+                'key': {'slug': 'S'},
+            },
+        },
+        'backfill': 'slugs',
+    },
+    {
+        'version': 9,
+        'description': 'Индекс posts.idx_trending для GET /posts?sort=trending',
+        'indexes': {
+            'posts': {
+                'idx_trending': {'status': 'S', 'trending_score': 'N'},
+            },
+        },
+        'backfill': 'trending_scores',
+    },
+    {
+        'version': 10,
+        'description': 'Подписки и домашние ленты: follows, timelines и индексы раскладки',
+        'tables': {
+            'follows': {
+                'key': {'follower_id': 'S', 'followee_id': 'S'},
+                'indexes': {
+                    'idx_followers': {'followee_id': 'S', 'follower_id': 'S'},
+                },
+            },
+            'timelines': {
+                'key': {'user_id': 'S', 'timeline_key': 'S'},
+            },
+        },
+        'indexes': {
+            'posts': {
+                'idx_author_created': {'author_id': 'S', 'created_at': 'S'},
+                'idx_fanout': {'fanout_pending': 'S'},
+            },
+            'users': {
+                'idx_celebrity': {'celebrity': 'S'},
+            },
+        },
+    },
+    {
+        'version': 11,
+        'description': 'Индекс comments.idx_comments_recent: последние комментарии поста без чтения всех',
+        'indexes': {
+            'comments': {
+                'idx_comments_recent': {'post_id': 'S', 'created_at': 'S'},
+            },
+        },
+    },
+    {
+        'version': 12,
+        'description': 'published_at постов: время первой публикации для GET /posts/changes',
+        'backfill': 'published_at',
+    },
+    {
+        'version': 13,
+        'description': 'Индекс posts.idx_trending_shard вместо idx_trending: рейтинг по секциям trending_shard',
+        'indexes': {
+            'posts': {
+                'idx_trending_shard': {'trending_shard': 'S', 'trending_score': 'N'},
+            },
+        },
+        'backfill': 'trending_shards',
+        'drop_indexes': {
+            'posts': ['idx_trending'],
+        },
+    },
+]
+
+
+def desired_schema(target_version=None):
+    """Итоговая схема после применения миграций до target_version включительно."""
+    tables = {}
+    for migration in MIGRATIONS:
+        if target_version is not None and migration['version'] > target_version:
+            break
+        for name, spec in migration.get('tables', {}).items():
+            tables[name] = {
+                'key': dict(spec['key']),
+                'indexes': {idx: dict(key) for idx, key in spec.get('indexes', {}).items()},
+            }
+        for name, indexes in migration.get('indexes', {}).items():
+            for idx, key in indexes.items():
+                tables[name]['indexes'][idx] = dict(key)
+        for name, indexes in migration.get('drop_indexes', {}).items():
+            for idx in indexes:
+                tables[name]['indexes'].pop(idx, None)
+    return tables
+
+
+def key_schema(key):
+    return [
+        {'AttributeName': attr, 'KeyType': 'HASH' if i == 0 else 'RANGE'}
+        for i, attr in enumerate(key)
+    ]
+
+
+def attribute_definitions(*keys):
+    definitions = {}
+    for key in keys:
+        definitions.update(key)
+    return [{'AttributeName': attr, 'AttributeType': kind} for attr, kind in definitions.items()]
+
+
+def index_definition(index_name, key):
+    return {
+        'IndexName': index_name,
+        'KeySchema': key_schema(key),
+        'Projection': {'ProjectionType': 'ALL'},
+    }
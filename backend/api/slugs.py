@@ -0,0 +1,115 @@
+"""Уникальные slug постов и их разрешение в post_id.
+
+Таблица slugs (slug -> post_id) — единственный источник уникальности:
+claim_slug занимает slug условной записью, при конфликте пробует
+числовые суффиксы (hello, hello-2, hello-3, ...). Пост хранит свой slug,
+старый освобождается после смены заголовка или окончательного удаления.
+
+resolve_slug кэширует slug -> post_id в контейнере. Кэш может устареть
+после смены slug, поэтому вызывающий сверяет slug полученного поста и при
+расхождении вызывает forget_slug и разрешает заново.
+"""
+import re
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+
+SLUG_ATTEMPTS = 20
+SLUG_CACHE_SIZE = 4096
+DEFAULT_SLUG = 'post'
+
+_slug_cache = OrderedDict()
+
+
+def slugify(text):
+    text = (text or '').lower()
+    text = re.sub(r'[^\w\s-]', '', text)
+    text = re.sub(r'[-\s]+', '-', text)
+    return text.strip('-')
+
+
+def slug_candidates(base):
+    """base, base-2, ..., base-SLUG_ATTEMPTS и случайный суффикс напоследок."""
+    yield base
+    for number in range(2, SLUG_ATTEMPTS + 1):
+        yield f'{base}-{number}'
+    yield f'{base}-{uuid.uuid4().hex[:8]}'
+
+
+def is_variant(slug, base):
+    """slug — один из кандидатов slug_candidates(base).
+
+    Суффиксы только те, что добавляет claim_slug: hello-2023 не вариант hello.
+    """
+    if slug == base:
+        return True
+    prefix = base + '-'
+    if not (slug or '').startswith(prefix):
+        return False
+    suffix = slug[len(prefix):]
+    if suffix.isdigit() and not suffix.startswith('0'):
+        return 2 <= int(suffix) <= SLUG_ATTEMPTS
+    return re.fullmatch(r'[0-9a-f]{8}', suffix) is not None
+
+
+def claim_slug(dynamodb, text, post_id, current=None):
+    """Свободный slug для текста, занятый за post_id.
+
+    Если текущий slug поста (current) уже вариант того же текста, он
+    остаётся: правка без смены заголовка не меняет адрес поста. current
+    передаётся, только когда slug выводится из заголовка: явно
+    запрошенный slug занимается как есть.
+    """
+    base = slugify(text) or DEFAULT_SLUG
+    if current and is_variant(current, base):
+        return current
+
+    slugs_table = dynamodb.Table('slugs')
+    conditional_failed = slugs_table.meta.client.exceptions.ConditionalCheckFailedException
+    for slug in slug_candidates(base):
+        try:
+            slugs_table.put_item(
+                Item={'slug': slug, 'post_id': post_id, 'created_at': datetime.utcnow().isoformat()},
+                ConditionExpression='attribute_not_exists(slug) OR post_id = :post_id',
+                ExpressionAttributeValues={':post_id': post_id}
+            )
+            return slug
+        except conditional_failed:
+            continue
+    raise ValueError(f'Не удалось подобрать свободный slug для «{base}»')
+
+
+def release_slug(dynamodb, slug, post_id):
+    """Освобождение slug, если он всё ещё принадлежит посту."""
+    if not slug:
+        return
+    slugs_table = dynamodb.Table('slugs')
+    try:
+        slugs_table.delete_item(
+            Key={'slug': slug},
+            ConditionExpression='post_id = :post_id',
+            ExpressionAttributeValues={':post_id': post_id}
+        )
+    except slugs_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+    forget_slug(slug)
+
+
+def resolve_slug(dynamodb, slug):
+    """post_id по slug или None; найденные значения кэшируются."""
+    post_id = _slug_cache.get(slug)
+    if post_id is not None:
+        _slug_cache.move_to_end(slug)
+        return post_id
+
+    item = dynamodb.Table('slugs').get_item(Key={'slug': slug}).get('Item')
+    if not item:
+        return None
+    _slug_cache[slug] = item['post_id']
+    if len(_slug_cache) > SLUG_CACHE_SIZE:
+        _slug_cache.popitem(last=False)
+    return item['post_id']
+
+
+def forget_slug(slug):
+    _slug_cache.pop(slug, None)
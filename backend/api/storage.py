@@ -0,0 +1,269 @@
+"""Общие функции работы с Object Storage (S3-совместимый API)."""
+import base64
+import hashlib
+import os
+import re
+import tempfile
+import uuid
+
+from db import new_client
+
+MAX_IMAGE_SIZE = 10 * 1024 * 1024
+UPLOAD_URL_TTL = 300
+
+IMAGE_EXTENSIONS = {
+    'image/png': '.png',
+    'image/jpeg': '.jpg',
+    'image/gif': '.gif',
+    'image/webp': '.webp'
+}
+
+IMAGE_SIGNATURE_SIZE = 12
+
+BASE64_CHUNK_SIZE = 64 * 1024
+SPOOL_MAX_SIZE = 1024 * 1024
+
+# S3 требует минимум 5MB на каждую часть, кроме последней
+MULTIPART_THRESHOLD = 5 * 1024 * 1024
+MULTIPART_PART_SIZE = 5 * 1024 * 1024
+
+IMAGE_KEY_RE = re.compile(r'^posts/[\w-]+/[0-9a-f-]{36}\.(png|jpg|gif|webp)$')
+
+_s3 = None
+
+
+def get_s3():
+    """Клиент S3 создаётся один раз на контейнер при первом обращении.
+
+    Endpoint вида file:///каталог подключает файловое хранилище для локального запуска.
+    """
+    global _s3
+    endpoint_url = os.environ.get('S3_ENDPOINT_URL') or os.environ.get('BUCKET_ENDPOINT')
+    if _s3 is None and endpoint_url and endpoint_url.startswith('file://'):
+        from local_store import FilesystemObjectStore
+        _s3 = FilesystemObjectStore.from_url(endpoint_url)
+    if _s3 is None:
+        from botocore.config import Config
+        _s3 = new_client(
+            's3',
+            endpoint_url=endpoint_url,
+            region_name=os.environ.get('YDB_REGION'),
+            aws_access_key_id=os.environ.get('S3_ACCESS_KEY'),
+            aws_secret_access_key=os.environ.get('S3_SECRET_KEY'),
+            config=Config(signature_version='s3v4')
+        )
+    return _s3
+
+
+def bucket_name():
+    return os.environ.get('S3_BUCKET_NAME', 'echo-bucket-images')
+
+
+def public_url(key):
+    return f"https://storage.yandexcloud.net/{bucket_name()}/{key}"
+
+
+def new_image_key(user_id, content_type):
+    """Ключ объекта для загрузки: posts/{user_id}/{uuid}{ext}."""
+    return f"posts/{user_id}/{uuid.uuid4()}{IMAGE_EXTENSIONS[content_type]}"
+
+
+def is_user_image_key(key, user_id):
+    return bool(IMAGE_KEY_RE.match(key or '')) and key.startswith(f"posts/{user_id}/")
+
+
+def decode_base64_to_spool(base64_data, chunk_size=BASE64_CHUNK_SIZE):
+    """Потоковое декодирование base64 во временный буфер с подсчётом SHA-256.
+
+    Строка читается срезами по chunk_size символов, поэтому одновременно в
+    памяти находится не больше одного декодированного фрагмента; буфер
+    переносится на диск после SPOOL_MAX_SIZE байт.
+    """
+    start = base64_data.find('base64,')
+    start = start + len('base64,') if start >= 0 else 0
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+    digest = hashlib.sha256()
+    head = b''
+    size = 0
+    carry = ''
+
+    try:
+        for offset in range(start, len(base64_data), chunk_size):
+            chunk = carry + ''.join(base64_data[offset:offset + chunk_size].split())
+            # Декодируем только целые группы по 4 символа, остаток переносим
+            aligned = len(chunk) - len(chunk) % 4
+            carry = chunk[aligned:]
+            if not aligned:
+                continue
+
+            decoded = base64.b64decode(chunk[:aligned])
+            size += len(decoded)
+            if size > MAX_IMAGE_SIZE:
+                raise ValueError("Изображение слишком большое (максимум 10MB)")
+
+            if len(head) < IMAGE_SIGNATURE_SIZE:
+                head += decoded[:IMAGE_SIGNATURE_SIZE - len(head)]
+            digest.update(decoded)
+            spool.write(decoded)
+
+        if carry:
+            raise ValueError("Некорректные данные base64")
+        if not size:
+            raise ValueError("Пустое изображение")
+    except Exception:
+        spool.close()
+        raise
+
+    spool.seek(0)
+    return spool, size, head, digest.hexdigest()
+
+
+def content_key(digest, content_type):
+    """Адрес по содержимому: одинаковые изображения хранятся одним объектом."""
+    return f"posts/sha256/{digest}{IMAGE_EXTENSIONS[content_type]}"
+
+
+def variants_prefix(key):
+    stem = key[len('posts/'):].rsplit('.', 1)[0]
+    return f"variants/{stem}/"
+
+
+def object_exists(key, s3=None):
+    from botocore.exceptions import ClientError
+
+    try:
+        (s3 or get_s3()).head_object(Bucket=bucket_name(), Key=key)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+            return False
+        raise
+
+
+def store_base64_image(base64_data, s3=None, force=False):
+    """Сохранение base64-изображения по адресу содержимого.
+
+    Если такой объект уже есть (репост, повторная отправка при редактировании),
+    загрузка пропускается, если не задан force. Возвращает (ключ объекта,
+    загружен ли он этим вызовом).
+    """
+    spool, size, head, digest = decode_base64_to_spool(base64_data)
+
+    with spool:
+        content_type = detect_image_type(head) or 'image/jpeg'
+        key = content_key(digest, content_type)
+
+        uploaded = force or not object_exists(key, s3)
+        if uploaded:
+            upload_stream(spool, size, key, content_type, s3)
+
+    return key, uploaded
+
+
+def base64_image_restorer(key, base64_data, s3=None, uploaded=False):
+    """restore для image_refs.acquire_image: загружает объект снова, если его удалил сборщик.
+
+    uploaded — объект только что загружен тем же запросом: проверять, что он
+    есть, незачем, повторная загрузка нужна только при force.
+    """
+    def restore(force):
+        if force or (not uploaded and not object_exists(key, s3)):
+            store_base64_image(base64_data, s3, force=True)
+    return restore
+
+
+def detect_image_type(head):
+    """MIME-тип по сигнатуре первых байт файла."""
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+
+def upload_stream(fileobj, size, key, content_type, s3=None):
+    """Загрузка файла в бакет без чтения целиком в память.
+
+    Небольшие файлы отправляются одним put_object, крупнее MULTIPART_THRESHOLD —
+    multipart-загрузкой, в памяти держится не больше одной части.
+    """
+    s3 = s3 or get_s3()
+    bucket = bucket_name()
+
+    if size <= MULTIPART_THRESHOLD:
+        s3.put_object(
+            Bucket=bucket,
+            Key=key,
+            Body=fileobj,
+            ContentLength=size,
+            ContentType=content_type,
+            ACL='public-read'
+        )
+        return
+
+    upload_id = s3.create_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        ContentType=content_type,
+        ACL='public-read'
+    )['UploadId']
+
+    try:
+        parts = []
+        while part := fileobj.read(MULTIPART_PART_SIZE):
+            part_number = len(parts) + 1
+            response = s3.upload_part(
+                Bucket=bucket,
+                Key=key,
+                UploadId=upload_id,
+                PartNumber=part_number,
+                Body=part
+            )
+            parts.append({'ETag': response['ETag'], 'PartNumber': part_number})
+            # Освобождаем часть до чтения следующей
+            del part
+
+        s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={'Parts': parts}
+        )
+    except Exception:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+
+def presign_post(key, content_type, max_size=MAX_IMAGE_SIZE, expires_in=UPLOAD_URL_TTL):
+    """Presigned POST: размер и Content-Type проверяет само хранилище."""
+    return get_s3().generate_presigned_post(
+        Bucket=bucket_name(),
+        Key=key,
+        Fields={'Content-Type': content_type, 'acl': 'public-read'},
+        Conditions=[
+            {'Content-Type': content_type},
+            {'acl': 'public-read'},
+            ['content-length-range', 1, max_size]
+        ],
+        ExpiresIn=expires_in
+    )
+
+
+def presign_put(key, content_type, content_length, expires_in=UPLOAD_URL_TTL):
+    """Presigned PUT: Content-Type и Content-Length входят в подпись."""
+    return get_s3().generate_presigned_url(
+        'put_object',
+        Params={
+            'Bucket': bucket_name(),
+            'Key': key,
+            'ContentType': content_type,
+            'ContentLength': content_length,
+            'ACL': 'public-read'
+        },
+        ExpiresIn=expires_in
+    )
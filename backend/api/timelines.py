@@ -0,0 +1,119 @@
+"""Домашние ленты подписчиков (таблица timelines).
+
+Публикация поста раскладывается по лентам подписчиков автора заранее
+(fan-out on write): create_post и edit_post ставят флаг fanout_pending
+(разреженный индекс posts.idx_fanout), fanout_timeline записывает
+timeline_entry каждому подписчику и снимает флаг. Тогда страница домашней
+ленты — один запрос к timelines по user_id.
+
+Авторы, у которых не меньше CELEBRITY_FOLLOWERS подписчиков, помечаются
+celebrity (разреженный индекс users.idx_celebrity): их посты не
+раскладываются, а читаются из posts.idx_author_created при запросе ленты
+и сливаются с ней (fan-out on read). Пометка не снимается при отписках,
+чтобы автор у порога не переключался между режимами.
+"""
+import os
+import time
+
+from db import query_all
+
+FANOUT_PENDING = 'pending'
+CELEBRITY = 'true'
+CELEBRITY_FOLLOWERS = int(os.environ.get('CELEBRITY_FOLLOWERS', 10000))
+
+# Сколько последних постов автора попадает в ленту при подписке
+TIMELINE_BACKFILL = 20
+
+CELEBRITY_CACHE_SECONDS = 300
+
+_celebrities = None
+_celebrities_at = 0.0
+
+
+def timeline_key(post):
+    """Ключ сортировки ленты: время создания, post_id — для одинаковых времён."""
+    return f"{post['created_at']}#{post['post_id']}"
+
+
+def timeline_entry(user_id, post):
+    return {
+        'user_id': user_id,
+        'timeline_key': timeline_key(post),
+        'post_id': post['post_id'],
+        'author_id': post['author_id'],
+        'created_at': post['created_at']
+    }
+
+
+def is_celebrity(user):
+    return (user or {}).get('celebrity') == CELEBRITY
+
+
+def celebrities(dynamodb):
+    """id авторов с fan-out on read; кэшируется в контейнере на CELEBRITY_CACHE_SECONDS."""
+    global _celebrities, _celebrities_at
+    if _celebrities is None or time.monotonic() - _celebrities_at > CELEBRITY_CACHE_SECONDS:
+        _celebrities = {user['user_id'] for user in query_all(
+            dynamodb.Table('users'),
+            IndexName='idx_celebrity',
+            KeyConditionExpression='celebrity = :celebrity',
+            ExpressionAttributeValues={':celebrity': CELEBRITY},
+            ProjectionExpression='user_id'
+        )}
+        _celebrities_at = time.monotonic()
+    return _celebrities
+
+
+def followees(dynamodb, user_id):
+    return {follow['followee_id'] for follow in query_all(
+        dynamodb.Table('follows'),
+        KeyConditionExpression='follower_id = :user_id',
+        ExpressionAttributeValues={':user_id': user_id},
+        ProjectionExpression='followee_id'
+    )}
+
+
+def followers(dynamodb, author_id):
+    for follow in query_all(
+            dynamodb.Table('follows'),
+            IndexName='idx_followers',
+            KeyConditionExpression='followee_id = :author_id',
+            ExpressionAttributeValues={':author_id': author_id},
+            ProjectionExpression='follower_id'):
+        yield follow['follower_id']
+
+
+def author_posts(posts_table, author_id, limit, before=None):
+    """(опубликованные посты автора новее первыми до курсора before, есть ли ещё)."""
+    query_kwargs = {
+        'IndexName': 'idx_author_created',
+        'KeyConditionExpression': 'author_id = :author_id',
+        'FilterExpression': '#status = :status',
+        'ExpressionAttributeNames': {'#status': 'status'},
+        'ExpressionAttributeValues': {':author_id': author_id, ':status': 'published'},
+        'ScanIndexForward': False
+    }
+    if before:
+        # Курсор — timeline_key; посты с тем же временем отсекаются по post_id ниже
+        query_kwargs['KeyConditionExpression'] += ' AND created_at <= :before'
+        query_kwargs['ExpressionAttributeValues'][':before'] = before.split('#', 1)[0]
+
+    posts = []
+    while len(posts) <= limit:
+        query_kwargs['Limit'] = limit + 1 - len(posts)
+        response = posts_table.query(**query_kwargs)
+        posts.extend(post for post in response.get('Items', [])
+                     if not post.get('is_deleted') and (not before or timeline_key(post) < before))
+        if 'LastEvaluatedKey' not in response:
+            break
+        query_kwargs['ExclusiveStartKey'] = response['LastEvaluatedKey']
+    return posts[:limit], len(posts) > limit
+
+
+def mark_fanout_pending(posts_table, post_id):
+    posts_table.update_item(
+        Key={'post_id': post_id},
+        UpdateExpression='SET fanout_pending = :pending',
+        ConditionExpression='attribute_exists(post_id)',
+        ExpressionAttributeValues={':pending': FANOUT_PENDING}
+    )
@@ -0,0 +1,147 @@
+"""Рейтинг «в тренде» (trending_score) для GET /posts?sort=trending.
+
+Оценка — как «hot» у агрегаторов: логарифм вовлечённости (лайки и
+взвешенные комментарии) плюс время первой публикации (published_at, у
+черновика — created_at) в единицах TRENDING_DECAY_SECONDS. Затухание
+заложено в возраст поста: чтобы опередить пост, опубликованный на
+TRENDING_DECAY_SECONDS раньше, нужно в 10 раз больше вовлечённости.
+Поэтому оценка меняется только вместе со счётчиками.
+
+like_post и comment_post пересчитывают оценку после изменения счётчика,
+edit_post — при публикации черновика.
+Запись условна на прочитанные счётчики: если их успели изменить, оценку
+запишет более поздний вызов.
+
+Индекс posts.idx_trending_shard (trending_shard, trending_score) разбит на
+TRENDING_SHARDS секций по хешу post_id: с одним ключом status все записи
+опубликованных постов шли бы в одну партицию индекса. trending_shard есть
+только у опубликованных постов (create_post, edit_post, delete_post).
+Страница рейтинга читает все секции после курсора и сливает их по
+убыванию (trending_score, post_id); курсор — последний пост страницы.
+"""
+import math
+import zlib
+from datetime import datetime
+from decimal import Decimal
+
+TRENDING_EPOCH = datetime(2024, 1, 1)
+TRENDING_DECAY_SECONDS = 45000
+COMMENT_WEIGHT = 2
+
+# Число секций индекса; изменение требует заново заполнить trending_shard
+TRENDING_SHARDS = 8
+
+
+def trending_score(likes, comments, published_at):
+    engagement = max(int(likes or 0) + COMMENT_WEIGHT * int(comments or 0), 1)
+    published = datetime.fromisoformat(published_at) if isinstance(published_at, str) else published_at
+    age = (published - TRENDING_EPOCH).total_seconds() / TRENDING_DECAY_SECONDS
+    return Decimal(str(round(math.log10(engagement) + age, 7)))
+
+
+def score_time(post):
+    return post.get('published_at') or post.get('created_at')
+
+
+def refresh_score(posts_table, post):
+    """Пересчёт оценки по post_id, likes_count, comments_count и published_at записи поста."""
+    if not score_time(post):
+        return
+    likes, comments = post.get('likes_count', 0), post.get('comments_count', 0)
+    try:
+        posts_table.update_item(
+            Key={'post_id': post['post_id']},
+            UpdateExpression='SET trending_score = :score',
+            ConditionExpression='likes_count = :likes AND comments_count = :comments',
+            ExpressionAttributeValues={
+                ':score': trending_score(likes, comments, score_time(post)),
+                ':likes': likes,
+                ':comments': comments
+            }
+        )
+    except posts_table.meta.client.exceptions.ConditionalCheckFailedException:
+        pass
+    except Exception as e:
+        print(f"Ошибка при обновлении рейтинга поста {post['post_id']}: {e}")
+
+
+def trending_shard(post_id):
+    """Секция индекса posts.idx_trending_shard опубликованного поста."""
+    return str(zlib.crc32(post_id.encode()) % TRENDING_SHARDS)
+
+
+def shard_keys():
+    return [str(shard) for shard in range(TRENDING_SHARDS)]
+
+
+def parse_cursor(last_key):
+    """(оценка, post_id) последнего поста прошлой страницы или None; ValueError при неверном курсоре."""
+    if not last_key:
+        return None
+    try:
+        return Decimal(str(last_key['trending_score'])), str(last_key['post_id'])
+    except (KeyError, TypeError, ArithmeticError):
+        raise ValueError('Неверный last_key для sort=trending')
+
+
+def rank(post):
+    return post['trending_score'], post['post_id']
+
+
+def shard_query(shard, limit, cursor=None, start_key=None):
+    """Запрос к одной секции рейтинга, начиная с оценки курсора."""
+    query = {
+        'IndexName': 'idx_trending_shard',
+        'KeyConditionExpression': 'trending_shard = :shard',
+        'ExpressionAttributeValues': {':shard': shard},
+        'Limit': limit,
+        'ScanIndexForward': False,
+        'ReturnConsumedCapacity': 'TOTAL'
+    }
+    if cursor:
+        query['KeyConditionExpression'] += ' AND trending_score <= :score'
+        query['ExpressionAttributeValues'][':score'] = cursor[0]
+    if start_key:
+        query['ExclusiveStartKey'] = start_key
+    return query
+
+
+def empty_shard_page():
+    return {'Items': [], 'ScannedCount': 0, 'CapacityUnits': 0}
+
+
+def add_shard_response(page, response, cursor, limit):
+    """Добавление ответа Query к странице секции; True, если секцию можно не дочитывать.
+
+    Дочитывается, пока не набрано limit постов после курсора и пока
+    последний прочитанный пост делит оценку с limit-м: порядок равных
+    оценок внутри секции не задан, и непрочитанный пост с той же оценкой
+    выпал бы из рейтинга.
+    """
+    page['Items'] += [post for post in response.get('Items', []) if not cursor or rank(post) < cursor]
+    page['ScannedCount'] += response.get('ScannedCount', 0)
+    page['CapacityUnits'] += response.get('ConsumedCapacity', {}).get('CapacityUnits', 0)
+    page['LastEvaluatedKey'] = response.get('LastEvaluatedKey')
+
+    posts = page['Items']
+    if not page['LastEvaluatedKey']:
+        return True
+    return len(posts) >= limit and posts[-1]['trending_score'] < posts[limit - 1]['trending_score']
+
+
+def merge_shards(pages, limit):
+    """Ответ в форме Query: первые limit постов всех секций и курсор следующей страницы."""
+    posts = sorted((post for page in pages for post in page['Items']), key=rank, reverse=True)
+    response = {
+        'Items': posts[:limit],
+        'Count': min(len(posts), limit),
+        'ScannedCount': sum(page['ScannedCount'] for page in pages),
+        'ConsumedCapacity': {
+            'TableName': 'posts',
+            'CapacityUnits': sum(page['CapacityUnits'] for page in pages)
+        }
+    }
+    if posts and (len(posts) > limit or any(page['LastEvaluatedKey'] for page in pages)):
+        last = response['Items'][-1]
+        response['LastEvaluatedKey'] = {'trending_score': str(last['trending_score']), 'post_id': last['post_id']}
+    return response
@@ -0,0 +1,98 @@
+import json
+from typing import Dict, Any
+
+from auth_middleware import get_claims
+from instrumentation import instrumented
+from storage import (
+    IMAGE_EXTENSIONS,
+    MAX_IMAGE_SIZE,
+    UPLOAD_URL_TTL,
+    new_image_key,
+    presign_post,
+    presign_put,
+    public_url,
+)
+
+def create_response(status_code: int, body: Dict) -> Dict:
+    return {
+        'statusCode': status_code,
+        'headers': {
+            'Content-Type': 'application/json',
+            'Access-Control-Allow-Origin': '*',
+            'Cache-Control': 'no-store'
+        },
+        'body': json.dumps(body)
+    }
+
+def parse_request_body(body: Any) -> Dict:
+    """Парсинг тела запроса с обработкой ошибок."""
+    if isinstance(body, str):
+        try:
+            return json.loads(body or '{}')
+        except json.JSONDecodeError:
+            raise ValueError('Неверный формат JSON')
+    return body if isinstance(body, dict) else {}
+
+@instrumented('uploads')
+def handler(event, context):
+    """Выдача presigned URL для загрузки изображения напрямую в Object Storage.
+
+    Функция не получает байты изображения: клиент загружает файл по выданному
+    URL, а затем передаёт полученный image_key в /posts/create.
+    """
+    if not (payload := get_claims(event)):
+        return create_response(401, {'success': False, 'error': 'Требуется авторизация'})
+
+    user_id = payload['user_id']
+
+    try:
+        data = parse_request_body(event.get('body', '{}'))
+    except ValueError as e:
+        return create_response(400, {'success': False, 'error': str(e)})
+
+    content_type = data.get('content_type', '')
+    if content_type not in IMAGE_EXTENSIONS:
+        return create_response(400, {
+            'success': False,
+            'error': f"Неподдерживаемый тип изображения. Допустимые: {', '.join(IMAGE_EXTENSIONS)}"
+        })
+
+    try:
+        size = int(data.get('size', 0))
+    except (TypeError, ValueError):
+        return create_response(400, {'success': False, 'error': 'Неверный размер файла'})
+
+    if size <= 0 or size > MAX_IMAGE_SIZE:
+        return create_response(400, {
+            'success': False,
+            'error': 'Изображение слишком большое (максимум 10MB)' if size > 0 else 'Не указан размер файла'
+        })
+
+    method = data.get('method', 'POST').upper()
+    if method not in ('POST', 'PUT'):
+        return create_response(400, {'success': False, 'error': 'Допустимые методы загрузки: POST, PUT'})
+
+    key = new_image_key(user_id, content_type)
+
+    try:
+        if method == 'POST':
+            presigned = presign_post(key, content_type)
+            upload = {'method': 'POST', 'url': presigned['url'], 'fields': presigned['fields']}
+        else:
+            upload = {
+                'method': 'PUT',
+                'url': presign_put(key, content_type, size),
+                'headers': {'Content-Type': content_type, 'x-amz-acl': 'public-read'}
+            }
+    except Exception as e:
+        print(f"Ошибка при подписи URL загрузки: {str(e)}")
+        return create_response(500, {'success': False, 'error': 'Не удалось подготовить загрузку'})
+
+    upload.update({'key': key, 'expires_in': UPLOAD_URL_TTL})
+
+    return create_response(200, {
+        'success': True,
+        'upload': upload,
+        'image_key': key,
+        'image_url': public_url(key)
+    })
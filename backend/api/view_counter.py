@@ -0,0 +1,131 @@
+"""Буферизованный подсчёт просмотров постов (posts.views_count).
+
+GET /posts/{post_id} не пишет в базу на каждый просмотр: просмотры
+копятся в буфере контейнера и раз в VIEW_FLUSH_SECONDS (или при
+VIEW_BUFFER_LIMIT постов в буфере) уходят одним ADD views_count на пост.
+Сброс из обработчика запроса ограничен VIEW_FLUSH_PER_REQUEST постами с
+наибольшим числом просмотров и сроком ответа; остальные ждут следующего.
+Повторный просмотр того же поста тем же зрителем в пределах
+VIEW_DEDUP_WINDOW не считается. Дедупликация приблизительная: окно
+хранится в памяти контейнера (не больше VIEW_DEDUP_SIZE записей), поэтому
+разные контейнеры считают зрителя независимо.
+
+Оставшиеся в буфере просмотры сбрасываются при завершении процесса
+(atexit, lifespan ASGI-сервера). Cloud Functions может остановить
+контейнер без этого, поэтому счётчик — оценка снизу.
+"""
+import atexit
+import hashlib
+import os
+import threading
+import time
+from collections import Counter, OrderedDict
+
+VIEW_FLUSH_SECONDS = int(os.environ.get('VIEW_FLUSH_SECONDS', 30))
+VIEW_BUFFER_LIMIT = 100
+VIEW_FLUSH_PER_REQUEST = 5
+VIEW_DEDUP_WINDOW = 30 * 60
+VIEW_DEDUP_SIZE = 10000
+
+_lock = threading.Lock()
+_pending = Counter()
+_seen = OrderedDict()
+_flushed_at = time.monotonic()
+
+
+def viewer_id(event, claims):
+    """Зритель: пользователь из токена или хеш IP и User-Agent для анонимных."""
+    if claims:
+        return claims['user_id']
+    headers = event.get('headers') or {}
+    source_ip = ((event.get('requestContext') or {}).get('identity') or {}).get('sourceIp', '')
+    user_agent = headers.get('User-Agent') or headers.get('user-agent') or ''
+    return 'anon:' + hashlib.sha256(f'{source_ip}|{user_agent}'.encode('utf-8')).hexdigest()[:16]
+
+
+def pending_views(post_id):
+    """Просмотры поста, ещё не записанные в базу этим контейнером."""
+    with _lock:
+        return _pending.get(post_id, 0)
+
+
+def record_view(post_id, viewer):
+    """Учёт просмотра; True, если он не повтор в пределах окна."""
+    now = time.monotonic()
+    key = (post_id, viewer)
+    with _lock:
+        seen_at = _seen.get(key)
+        if seen_at is not None and now - seen_at < VIEW_DEDUP_WINDOW:
+            return False
+        _seen[key] = now
+        _seen.move_to_end(key)
+        if len(_seen) > VIEW_DEDUP_SIZE:
+            _seen.popitem(last=False)
+        _pending[post_id] += 1
+        return True
+
+
+def flush_due():
+    with _lock:
+        return bool(_pending) and (
+            len(_pending) >= VIEW_BUFFER_LIMIT or time.monotonic() - _flushed_at >= VIEW_FLUSH_SECONDS
+        )
+
+
+def flush(dynamodb=None, max_posts=None, deadline=None):
+    """Запись накопленных просмотров; не записанные возвращаются в буфер.
+
+    max_posts и deadline (time.monotonic) ограничивают сброс из обработчика:
+    посты сверх них остаются в буфере.
+    """
+    global _flushed_at
+    with _lock:
+        batch = dict(_pending.most_common(max_posts))
+        for post_id in batch:
+            del _pending[post_id]
+        _flushed_at = time.monotonic()
+    if not batch:
+        return 0
+
+    if dynamodb is None:
+        from db import get_dynamodb
+        dynamodb = get_dynamodb()
+    posts_table = dynamodb.Table('posts')
+    conditional_failed = posts_table.meta.client.exceptions.ConditionalCheckFailedException
+
+    written = 0
+    unwritten = Counter()
+    for post_id, views in batch.items():
+        if deadline is not None and time.monotonic() >= deadline:
+            unwritten[post_id] = views
+            continue
+        # Просмотры не ставят updated_at: это не изменение поста для GET /posts/changes
+        try:
+            posts_table.update_item(
+                Key={'post_id': post_id},
+                UpdateExpression='ADD views_count :views',
+                ConditionExpression='attribute_exists(post_id)',
+                ExpressionAttributeValues={':views': views}
+            )
+            written += views
+        except conditional_failed:
+            # Пост удалён окончательно — просмотры ему больше не нужны
+            pass
+        except Exception as e:
+            print(f"Ошибка при записи просмотров поста {post_id}: {e}")
+            unwritten[post_id] = views
+
+    if unwritten:
+        with _lock:
+            _pending.update(unwritten)
+    return written
+
+
+def flush_at_exit():
+    try:
+        flush()
+    except Exception as e:
+        print(f"Просмотры не записаны при завершении: {e}")
+
+
+atexit.register(flush_at_exit)
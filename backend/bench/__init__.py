@@ -0,0 +1,19 @@
+"""Локальные бенчмарки обработчиков backend/api.
+
+Поднимает совместимую с DynamoDB заглушку (moto) или подключается к уже
+запущенной (DynamoDB Local, YDB), создаёт схему через create_tables_document,
+заполняет её воспроизводимым набором данных и вызывает обработчики с
+событиями API Gateway. Замеры берутся из instrumentation.
+
+    cd backend && python -m bench
+    cd backend && python -m bench --save-baseline local
+    cd backend && python -m bench --compare local
+"""
+import os
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api')
+BASELINES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines')
+
+if API_DIR not in sys.path:
+    sys.path.insert(0, API_DIR)
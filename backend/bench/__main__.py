@@ -0,0 +1,106 @@
+import argparse
+import contextlib
+import os
+import sys
+
+from bench import standin
+from bench.dataset import DEFAULTS
+
+
+def add_dataset_arguments(parser):
+    """Параметры заглушки и набора данных, общие с bench.replay."""
+    parser.add_argument('--endpoint', help='DynamoDB-совместимый endpoint вместо встроенного moto')
+    parser.add_argument('--seed', type=int, default=DEFAULTS['seed'])
+    parser.add_argument('--users', type=int, default=DEFAULTS['users'])
+    parser.add_argument('--posts', type=int, default=DEFAULTS['posts'])
+    parser.add_argument('--likes', type=int, default=DEFAULTS['likes'])
+    parser.add_argument('--comments', type=int, default=DEFAULTS['comments'])
+    parser.add_argument('--zipf-s', type=float, default=DEFAULTS['zipf_s'], help='показатель распределения Zipf')
+    parser.add_argument('--rtt-ms', type=float, default=0, help='задержка на каждое обращение к базе, мс')
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m bench', description='Бенчмарки обработчиков Echo')
+    add_dataset_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=20, help='замеров на эндпоинт')
+    parser.add_argument('--warmup', type=int, default=3, help='вызовов прогрева на эндпоинт')
+    parser.add_argument('--only', nargs='+', help='запустить только указанные эндпоинты')
+    parser.add_argument('--save-baseline', metavar='NAME', help='сохранить результат в baselines/NAME.json')
+    parser.add_argument('--compare', metavar='NAME', help='сравнить с baselines/NAME.json')
+    parser.add_argument('--tolerance', type=float, help='допустимый рост p50/p95 (доля)')
+    return parser.parse_args()
+
+
+def dataset_config(args):
+    return {name: getattr(args, name) for name in DEFAULTS}
+
+
+def prepare(args):
+    """Заглушка, схема и набор данных; возвращает (сервер, набор, ресурс YDB)."""
+    endpoint, server = standin.start_standin(args.endpoint)
+    standin.configure_environment(endpoint)
+
+    from create_tables_document import create_tables_with_documentapi
+    from db import get_dynamodb
+    from bench import dataset
+
+    with contextlib.redirect_stdout(sys.stderr):
+        create_tables_with_documentapi()
+
+    data = dataset.generate(**dataset_config(args))
+    dynamodb = get_dynamodb()
+    dataset.seed(dynamodb, data)
+    standin.add_round_trip_delay(dynamodb, args.rtt_ms)
+    return server, data, dynamodb
+
+
+def main():
+    args = parse_args()
+    server, data, dynamodb = prepare(args)
+
+    from bench import metrics, runner
+    from bench.scenarios import SCENARIOS, BenchState
+
+    names = args.only or list(SCENARIOS)
+    unknown = set(names) - set(SCENARIOS)
+    if unknown:
+        print(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    runner.install_collector()
+    state = BenchState(data, dynamodb, seed=args.seed)
+    samples = {}
+    try:
+        # Обработчики пишут в stdout свои сообщения; отчёт выводится отдельно
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            for name in names:
+                samples[name] = runner.run_scenario(SCENARIOS[name], state, args.iterations, args.warmup)
+    finally:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            runner.drain_buffers()
+        if server:
+            server.stop()
+
+    config = dict(dataset_config(args), iterations=args.iterations, rtt_ms=args.rtt_ms)
+    report = metrics.build_report(samples, config)
+    print(metrics.format_report(report))
+
+    if args.save_baseline:
+        print(f"База сохранена: {metrics.save_baseline(args.save_baseline, report)}")
+
+    if args.compare:
+        baseline = metrics.load_baseline(args.compare)
+        if baseline['config'] != report['config']:
+            print("! Параметры запуска отличаются от базы, сравнение может быть неточным")
+        tolerance = args.tolerance if args.tolerance is not None else metrics.DEFAULT_TOLERANCE
+        regressions = metrics.compare(report, baseline, tolerance)
+        for regression in regressions:
+            print(f"✗ {regression}")
+        if regressions:
+            return 1
+        print("✓ Регрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
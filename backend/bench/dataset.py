@@ -0,0 +1,196 @@
+"""Воспроизводимый набор данных для бенчмарков.
+
+Авторы, лайки и комментарии распределены по Zipf: небольшая доля постов
+и авторов собирает большую часть активности, как в живой ленте. Одинаковые
+параметры и seed дают одинаковые ключи и то же число обращений к базе.
+"""
+import random
+import uuid
+from datetime import datetime, timedelta
+
+import bcrypt
+
+from recent_comments import RECENT_COMMENTS_LIMIT, preview
+from timelines import CELEBRITY, timeline_entry
+from trending import trending_score, trending_shard
+
+BENCH_PASSWORD = 'bench-password'
+BENCH_EPOCH = datetime(2026, 1, 1)
+
+DEFAULTS = {
+    'seed': 42,
+    'users': 200,
+    'posts': 500,
+    'likes': 3000,
+    'comments': 1500,
+    'zipf_s': 1.1,
+}
+
+# Подписок у пользователя; авторы выбираются по той же популярности, что посты
+FOLLOWS_PER_USER = 8
+
+
+def zipf_weights(n, s):
+    return [1 / rank ** s for rank in range(1, n + 1)]
+
+
+def seeded_uuid(rng):
+    return str(uuid.UUID(int=rng.getrandbits(128), version=4))
+
+
+def author_snapshot(user):
+    """author_snapshot, который create_post и comment_post пишут в элемент."""
+    return {'username': user['username'], 'display_name': user['display_name'], 'avatar_url': '', 'version': 0}
+
+
+def generate(seed=42, users=200, posts=500, likes=3000, comments=1500, zipf_s=1.1):
+    """Пользователи, посты, лайки, комментарии, подписки и ленты в формате записей таблиц."""
+    rng = random.Random(seed)
+    password_hash = bcrypt.hashpw(BENCH_PASSWORD.encode('utf-8'), bcrypt.gensalt(10)).decode('utf-8')
+
+    user_items = []
+    for i in range(users):
+        created_at = (BENCH_EPOCH + timedelta(minutes=i)).isoformat()
+        user_items.append({
+            'user_id': seeded_uuid(rng),
+            'email': f'user{i}@bench.local',
+            'username': f'user{i}',
+            'password_hash': password_hash,
+            'display_name': f'User {i}',
+            'role': 'user',
+            'created_at': created_at,
+            'updated_at': created_at,
+            'is_active': True
+        })
+
+    author_weights = zipf_weights(users, zipf_s)
+    post_items = []
+    for i in range(posts):
+        author = rng.choices(user_items, weights=author_weights)[0]
+        created_at = (BENCH_EPOCH + timedelta(hours=1, seconds=i * 37)).isoformat()
+        status = 'published' if rng.random() < 0.9 else 'draft'
+        post_items.append({
+            'post_id': seeded_uuid(rng),
+            'title': f'Пост {i}',
+            'text': ' '.join(rng.choice(('лента', 'кадр', 'утро', 'город', 'море', 'текст')) for _ in range(40)),
+            'imgUrl': '',
+            'slug': f'post-{i}',
+            'status': status,
+            **({'published_at': created_at} if status == 'published' else {}),
+            'author_id': author['user_id'],
+            'author_snapshot': author_snapshot(author),
+            'created_at': created_at,
+            'updated_at': created_at,
+            'updated_day': created_at[:10],
+            'views_count': 0,
+            'likes_count': 0,
+            'comments_count': 0
+        })
+
+    # Популярность постов не связана с порядком создания
+    popularity = post_items[:]
+    rng.shuffle(popularity)
+    post_weights = zipf_weights(posts, zipf_s)
+
+    like_items = {}
+    for _ in range(likes):
+        post = rng.choices(popularity, weights=post_weights)[0]
+        user = rng.choice(user_items)
+        key = (post['post_id'], user['user_id'])
+        if key not in like_items:
+            post['likes_count'] += 1
+            like_items[key] = {
+                'post_id': post['post_id'],
+                'user_id': user['user_id'],
+                'created_at': post['created_at']
+            }
+
+    posts_by_id = {post['post_id']: post for post in post_items}
+    comment_items = []
+    for i in range(comments):
+        post = rng.choices(popularity, weights=post_weights)[0]
+        user = rng.choice(user_items)
+        post['comments_count'] += 1
+        created_at = (datetime.fromisoformat(post['created_at']) + timedelta(minutes=i % 600)).isoformat()
+        comment_items.append({
+            'comment_id': seeded_uuid(rng),
+            'post_id': post['post_id'],
+            'user_id': user['user_id'],
+            'author_snapshot': author_snapshot(user),
+            'text': f'Комментарий {i}',
+            'created_at': created_at,
+            'updated_at': created_at,
+            'is_active': True
+        })
+
+    # Превью, которое comment_post поддерживает в записи поста
+    for comment in sorted(comment_items, key=lambda item: item['created_at'], reverse=True):
+        recent = posts_by_id[comment['post_id']].setdefault('recent_comments', [])
+        if len(recent) < RECENT_COMMENTS_LIMIT:
+            recent.append(preview(comment))
+
+    for post in post_items:
+        post['trending_score'] = trending_score(post['likes_count'], post['comments_count'],
+                                                post.get('published_at', post['created_at']))
+        if post['status'] == 'published':
+            post['trending_shard'] = trending_shard(post['post_id'])
+
+    # Подписки генерируются последними, чтобы не менять ключи остальных записей.
+    # Самый популярный автор — celebrity: его посты лента читает при запросе
+    follow_items = {}
+    for user in user_items:
+        for _ in range(FOLLOWS_PER_USER):
+            author = rng.choices(user_items, weights=author_weights)[0]
+            if author is not user:
+                follow_items[(user['user_id'], author['user_id'])] = {
+                    'follower_id': user['user_id'],
+                    'followee_id': author['user_id'],
+                    'created_at': user['created_at']
+                }
+    followers_by_author = {}
+    for follower_id, followee_id in follow_items:
+        followers_by_author.setdefault(followee_id, []).append(follower_id)
+    for user in user_items:
+        user['followers_count'] = len(followers_by_author.get(user['user_id'], []))
+        user['following_count'] = sum(1 for follower_id, _ in follow_items if follower_id == user['user_id'])
+    user_items[0]['celebrity'] = CELEBRITY
+
+    timeline_items = [
+        timeline_entry(user_id, post)
+        for post in post_items if post['status'] == 'published' and post['author_id'] != user_items[0]['user_id']
+        for user_id in [post['author_id'], *followers_by_author.get(post['author_id'], [])]
+    ]
+
+    return {
+        'users': user_items,
+        'posts': post_items,
+        'post_likes': list(like_items.values()),
+        'comments': comment_items,
+        'follows': list(follow_items.values()),
+        'timelines': timeline_items,
+        'slugs': [{'slug': post['slug'], 'post_id': post['post_id'], 'created_at': post['created_at']} for post in post_items],
+        'popular_posts': [post['post_id'] for post in popularity],
+        'post_weights': post_weights,
+        'author_weights': author_weights,
+    }
+
+
+def seed(dynamodb, dataset):
+    """Запись набора в таблицы пакетами."""
+    login_items = [
+        {name: user[name] for name in ('email', 'user_id', 'username', 'password_hash', 'created_at')}
+        for user in dataset['users']
+    ]
+
+    for table_name, items in (
+            ('users', dataset['users']),
+            ('user_emails', login_items),
+            ('posts', dataset['posts']),
+            ('post_likes', dataset['post_likes']),
+            ('comments', dataset['comments']),
+            ('slugs', dataset['slugs']),
+            ('follows', dataset['follows']),
+            ('timelines', dataset['timelines'])):
+        with dynamodb.Table(table_name).batch_writer() as batch:
+            for item in items:
+                batch.put_item(Item=item)
@@ -0,0 +1,190 @@
+"""Нагрузочный тест ASGI-приложения (backend/api/asgi.py).
+
+Поднимает заглушку и набор данных, как python -m bench, затем для каждого
+режима запускает asgi.py с --workers процессами и отправляет --requests
+HTTP-запросов, не более --concurrency одновременно. Режимы:
+
+    sync   — все маршруты через синхронные обработчики в пуле потоков
+    async  — горячие пути через асинхронные варианты (ASYNC_HANDLERS)
+
+События для запросов строятся сценариями bench.scenarios заранее и
+чередуются по кругу. Отчёт — пропускная способность и p50/p95/p99.
+Без --endpoint moto запускается в отдельном процессе. --rtt-ms добавляет
+задержку сети до базы через прокси перед заглушкой: без неё moto отвечает
+мгновенно и упирается в свой процессор, и выигрыш async не виден.
+
+    cd backend && python -m bench.load
+    cd backend && python -m bench.load --rtt-ms 10 --workers 4 --concurrency 64 --requests 2000
+    cd backend && python -m bench.load --endpoints posts.feed --modes async
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from bench import API_DIR
+from bench.__main__ import add_dataset_arguments, prepare
+from bench.standin import free_port, start_delay_proxy, start_standin_process
+
+MODES = {
+    'sync': {'ASGI_ASYNC': 'off'},
+    'async': {'ASGI_ASYNC': 'on'},
+}
+
+DEFAULT_ENDPOINTS = ['posts.feed', 'posts.author', 'posts.like', 'comments.create']
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m bench.load', description='Нагрузочный тест asgi.py')
+    add_dataset_arguments(parser)
+    parser.add_argument('--endpoints', nargs='+', default=DEFAULT_ENDPOINTS, help='эндпоинты bench.scenarios')
+    parser.add_argument('--modes', nargs='+', choices=list(MODES), default=list(MODES))
+    parser.add_argument('--workers', type=int, default=2, help='процессов asgi.py')
+    parser.add_argument('--concurrency', type=int, default=32, help='одновременных запросов')
+    parser.add_argument('--requests', type=int, default=400, help='запросов на режим')
+    parser.add_argument('--warmup', type=int, default=20, help='запросов прогрева на режим')
+    return parser.parse_args()
+
+
+def build_requests(state, endpoints, count):
+    """(метод, путь с query, заголовки, тело) по сценариям bench."""
+    from urllib.parse import urlencode
+
+    from bench.scenarios import SCENARIOS
+
+    requests = []
+    for i in range(count):
+        _, build = SCENARIOS[endpoints[i % len(endpoints)]]
+        event = build(state)
+        query = event.get('queryStringParameters') or {}
+        path = f"{event['path']}?{urlencode(query)}" if query else event['path']
+        body = (event.get('body') or '').encode('utf-8')
+        requests.append((endpoints[i % len(endpoints)], event['httpMethod'], path, event['headers'], body))
+    return requests
+
+
+def start_server(port, workers, mode):
+    env = dict(os.environ, INSTRUMENTATION='off', **MODES[mode])
+    process = subprocess.Popen(
+        [sys.executable, 'asgi.py', '--host', '127.0.0.1', '--port', str(port), '--workers', str(workers)],
+        cwd=API_DIR, env=env, stdout=subprocess.DEVNULL
+    )
+    return process
+
+
+async def wait_ready(session, base_url, process, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"asgi.py завершился с кодом {process.returncode}")
+        try:
+            async with session.get(f'{base_url}/health') as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        await asyncio.sleep(0.2)
+    raise SystemExit("asgi.py не ответил на /health")
+
+
+async def drive(base_url, process, requests, concurrency, warmup):
+    """Замеры: {эндпоинт: [(мс, статус)]} и длительность основной части, с."""
+    import aiohttp
+
+    connector = aiohttp.TCPConnector(limit=concurrency)
+    async with aiohttp.ClientSession(connector=connector) as session:
+        await wait_ready(session, base_url, process)
+
+        async def send(request):
+            endpoint, method, path, headers, body = request
+            started = time.perf_counter()
+            try:
+                async with session.request(method, base_url + path, headers=headers, data=body or None) as response:
+                    await response.read()
+                    status = response.status
+            except aiohttp.ClientError:
+                status = 599
+            return endpoint, (time.perf_counter() - started) * 1000, status
+
+        for request in requests[:warmup]:
+            await send(request)
+
+        queue = iter(requests[warmup:])
+        samples = {}
+
+        async def worker():
+            for request in queue:
+                endpoint, elapsed_ms, status = await send(request)
+                samples.setdefault(endpoint, []).append((elapsed_ms, status))
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return samples, time.perf_counter() - started
+
+
+def main():
+    args = parse_args()
+    try:
+        import aiohttp  # noqa: F401
+        import uvicorn  # noqa: F401
+    except ImportError:
+        print("Нужны зависимости asgi.py: pip install -r backend/api/requirements-asgi.txt", file=sys.stderr)
+        return 2
+
+    moto = None
+    if not args.endpoint:
+        args.endpoint, moto = start_standin_process()
+    server, data, dynamodb = prepare(args)
+
+    from bench.metrics import percentile
+    from bench.scenarios import SCENARIOS, BenchState
+
+    unknown = set(args.endpoints) - set(SCENARIOS)
+    if unknown:
+        print(f"Неизвестные эндпоинты: {', '.join(sorted(unknown))}", file=sys.stderr)
+        return 2
+
+    if args.rtt_ms > 0:
+        os.environ['YDB_ENDPOINT'] = start_delay_proxy(os.environ['YDB_ENDPOINT'], args.rtt_ms)
+
+    state = BenchState(data, dynamodb, seed=args.seed)
+    results = {}
+    try:
+        for mode in args.modes:
+            requests = build_requests(state, args.endpoints, args.warmup + args.requests)
+            port = free_port()
+            process = start_server(port, args.workers, mode)
+            try:
+                results[mode] = asyncio.run(drive(
+                    f'http://127.0.0.1:{port}', process, requests, args.concurrency, args.warmup))
+            finally:
+                process.terminate()
+                process.wait(timeout=10)
+    finally:
+        if server:
+            server.stop()
+        if moto:
+            moto.terminate()
+
+    print(f"workers={args.workers} concurrency={args.concurrency} rtt={args.rtt_ms:g} мс "
+          f"запросов на режим={args.requests}\n")
+    print(f"{'режим':<7} {'эндпоинт':<18} {'n':>5} {'ошибки':>6} {'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8}")
+    for mode, (samples, elapsed) in results.items():
+        every = []
+        for endpoint, values in samples.items():
+            latencies = [ms for ms, _ in values]
+            every.extend(values)
+            errors = sum(1 for _, status in values if status >= 500)
+            print(f"{mode:<7} {endpoint:<18} {len(values):>5} {errors:>6} {percentile(latencies, 50):>8.1f} "
+                  f"{percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}")
+        latencies = [ms for ms, _ in every]
+        print(f"{mode:<7} {'все':<18} {len(every):>5} {sum(1 for _, s in every if s >= 500):>6} "
+              f"{percentile(latencies, 50):>8.1f} {percentile(latencies, 95):>8.1f} {percentile(latencies, 99):>8.1f}"
+              f"   {len(every) / elapsed:.1f} запросов/с")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,94 @@
+"""Сводка замеров по эндпоинтам, базовые значения и поиск регрессий.
+
+Замеры — итоги вызовов из instrumentation (duration_ms, round_trips,
+consumed_capacity, status). Тот же формат использует replay.
+"""
+import json
+import math
+import os
+import statistics
+
+from bench import BASELINES_DIR
+
+# Допустимый рост задержки относительно базы; число обращений к базе
+# при том же seed детерминировано, поэтому его рост — всегда регрессия
+DEFAULT_TOLERANCE = 0.25
+
+
+def percentile(values, q):
+    """Перцентиль по ближайшему рангу."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples):
+    durations = [sample['duration_ms'] for sample in samples]
+    round_trips = [sample['round_trips'] for sample in samples]
+    return {
+        'count': len(samples),
+        'errors': sum(1 for sample in samples if (sample.get('status') or 500) >= 500),
+        'p50': round(percentile(durations, 50), 2),
+        'p95': round(percentile(durations, 95), 2),
+        'p99': round(percentile(durations, 99), 2),
+        'round_trips': round(statistics.fmean(round_trips), 2) if samples else 0.0,
+        'round_trips_max': max(round_trips, default=0),
+        'capacity': round(statistics.fmean(sample['consumed_capacity'] for sample in samples), 2) if samples else 0.0,
+    }
+
+
+def build_report(samples_by_endpoint, config=None):
+    return {
+        'config': config or {},
+        'endpoints': {name: summarize(samples) for name, samples in samples_by_endpoint.items() if samples}
+    }
+
+
+def format_report(report):
+    lines = [
+        f"{'эндпоинт':<18} {'n':>5} {'ошибки':>6} {'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8} "
+        f"{'обращения':>9} {'макс':>5} {'capacity':>8}"
+    ]
+    for name, stats in report['endpoints'].items():
+        lines.append(
+            f"{name:<18} {stats['count']:>5} {stats['errors']:>6} {stats['p50']:>8.1f} {stats['p95']:>8.1f} "
+            f"{stats['p99']:>8.1f} {stats['round_trips']:>9.2f} {stats['round_trips_max']:>5} {stats['capacity']:>8.2f}"
+        )
+    return '\n'.join(lines)
+
+
+def baseline_path(name):
+    return name if name.endswith('.json') else os.path.join(BASELINES_DIR, f'{name}.json')
+
+
+def save_baseline(name, report):
+    path = baseline_path(name)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w') as target:
+        json.dump(report, target, ensure_ascii=False, indent=2, sort_keys=True)
+        target.write('\n')
+    return path
+
+
+def load_baseline(name):
+    with open(baseline_path(name)) as source:
+        return json.load(source)
+
+
+def compare(report, baseline, tolerance=DEFAULT_TOLERANCE):
+    """Список регрессий относительно базы; пустой список — регрессий нет."""
+    regressions = []
+    for name, stats in report['endpoints'].items():
+        base = baseline['endpoints'].get(name)
+        if not base:
+            continue
+
+        if stats['round_trips'] > base['round_trips'] + 0.01:
+            regressions.append(f"{name}: обращений к базе {stats['round_trips']} (было {base['round_trips']})")
+        if stats['errors'] > base['errors']:
+            regressions.append(f"{name}: ошибок {stats['errors']} (было {base['errors']})")
+        for key in ('p50', 'p95'):
+            if base[key] and stats[key] > base[key] * (1 + tolerance):
+                regressions.append(f"{name}: {key} {stats[key]:.1f} мс (было {base[key]:.1f} мс)")
+    return regressions
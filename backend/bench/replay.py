@@ -0,0 +1,330 @@
+"""Воспроизведение реального трафика по журналам API Gateway.
+
+Источник — NDJSON: выгрузка журнала доступа API Gateway из Cloud Logging
+(поля метода, пути и времени ищутся и на верхнем уровне, и в jsonPayload)
+или захваченные события функций (с httpMethod). Сначала журнал
+обезличивается: пользователи и посты заменяются рангами по частоте,
+тела запросов, токены, IP и заголовки отбрасываются. Затем трасса
+проигрывается на локальной заглушке с исходными интервалами, ускоренными в
+--speed раз, не более чем в --concurrency потоков. Отчёт совпадает с
+отчётом python -m bench.
+
+    python -m bench.replay anonymize access.ndjson -o trace.ndjson
+    python -m bench.replay run trace.ndjson --speed 10 --concurrency 8
+"""
+import argparse
+import contextlib
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from urllib.parse import parse_qsl, urlsplit
+
+from bench.__main__ import add_dataset_arguments, prepare
+
+# Маршруты api-gateway.yaml: (метод, шаблон пути, имя эндпоинта в отчёте)
+ROUTES = [
+    ('POST', r'/auth/register', 'auth.register'),
+    ('POST', r'/auth/login', 'auth.login'),
+    ('POST', r'/auth/refresh', 'auth.refresh'),
+    ('GET', r'/posts', 'posts.feed'),
+    ('GET', r'/posts/changes', 'posts.changes'),
+    ('GET', r'/posts/by-slug/[^/]+', 'posts.slug'),
+    ('GET', r'/posts/(?P<post>[^/]+)', 'posts.get'),
+    ('POST', r'/posts/create', 'posts.create'),
+    ('PUT', r'/posts/(?P<post>[^/]+)/edit', 'posts.edit'),
+    ('DELETE', r'/posts/(?P<post>[^/]+)/delete', 'posts.delete'),
+    ('POST', r'/posts/(?P<post>[^/]+)/like', 'posts.like'),
+    ('POST', r'/comments', 'comments.create'),
+    ('GET', r'/timeline', 'timeline'),
+    ('POST', r'/users/[^/]+/follow', 'users.follow'),
+    ('DELETE', r'/users/[^/]+/follow', 'users.unfollow'),
+    ('POST', r'/uploads', 'uploads'),
+]
+COMPILED_ROUTES = [(method, re.compile(f'^{pattern}/?$'), name) for method, pattern, name in ROUTES]
+
+# Параметры запроса, которые влияют на работу обработчика и не содержат
+# личных данных; остальные отбрасываются
+KEPT_QUERY = {'limit', 'status', 'include_comments', 'comments_limit', 'include_author', 'image_variant', 'since', 'sort'}
+
+METHOD_FIELDS = ('httpMethod', 'http_method', 'method', 'request_method')
+PATH_FIELDS = ('path', 'request_path', 'uri', 'request_uri', 'url')
+TIME_FIELDS = ('timestamp', 'time', '@timestamp', 'request_time', 'requestTime')
+ACTOR_FIELDS = ('user_id', 'remote_ip', 'remote_address', 'ip', 'sourceIp')
+
+
+def payload_of(record):
+    return record.get('jsonPayload') or record.get('json_payload') or record
+
+
+def first(record, fields):
+    for source in (payload_of(record), record):
+        for field in fields:
+            if source.get(field) not in (None, ''):
+                return source[field]
+    return None
+
+
+def parse_time(value):
+    """Секунды от эпохи из ISO-строки или числа (секунды или миллисекунды)."""
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return value / 1000 if value > 1e11 else float(value)
+    try:
+        return float(value)
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+
+def parse_record(record):
+    """(время, метод, путь, query, actor, тело) из строки журнала или события."""
+    event = record.get('event', record)
+    if 'httpMethod' in event:
+        context = event.get('requestContext') or {}
+        headers = event.get('headers') or {}
+        timestamp = parse_time(context.get('requestTimeEpoch') or first(record, TIME_FIELDS))
+        actor = (context.get('identity') or {}).get('sourceIp') or headers.get('Authorization')
+        body = event.get('body')
+        try:
+            body = json.loads(body) if isinstance(body, str) else body
+        except ValueError:
+            body = None
+        return timestamp, event['httpMethod'], event.get('path', ''), event.get('queryStringParameters') or {}, actor, body
+
+    method = first(record, METHOD_FIELDS)
+    uri = first(record, PATH_FIELDS)
+    if not method or not uri:
+        return None
+    parts = urlsplit(uri)
+    return (parse_time(first(record, TIME_FIELDS)), method.upper(), parts.path,
+            dict(parse_qsl(parts.query)), first(record, ACTOR_FIELDS), None)
+
+
+def match_route(method, path):
+    for route_method, pattern, name in COMPILED_ROUTES:
+        if route_method == method and (match := pattern.match(path)):
+            return name, match.groupdict()
+    return None, {}
+
+
+def read_ndjson(path):
+    with open(path) as source:
+        for line in source:
+            line = line.strip()
+            if line:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue
+
+
+def anonymize(records):
+    """Обезличенная трасса: ранги пользователей и постов вместо идентификаторов.
+
+    Ранг 0 — самый частый пользователь или пост журнала; при воспроизведении
+    он сопоставляется самому популярному в наборе данных, поэтому форма
+    нагрузки (горячие посты, активные авторы) сохраняется.
+    """
+    parsed = []
+    for record in records:
+        if not (fields := parse_record(record)):
+            continue
+        timestamp, method, path, query, actor, body = fields
+        endpoint, params = match_route(method, path)
+        if endpoint is None or timestamp is None:
+            continue
+        post = params.get('post') or (body or {}).get('post_id')
+        parsed.append((timestamp, endpoint, query, actor, post, query.get('author_id')))
+
+    if not parsed:
+        return []
+
+    actor_ranks = ranks(item[3] for item in parsed)
+    post_ranks = ranks(item[4] for item in parsed)
+    author_ranks = ranks(item[5] for item in parsed)
+
+    parsed.sort(key=lambda item: item[0])
+    started = parsed[0][0]
+    trace = []
+    for timestamp, endpoint, query, actor, post, author in parsed:
+        entry = {
+            't': round(timestamp - started, 3),
+            'endpoint': endpoint,
+            'query': {name: value for name, value in query.items() if name in KEPT_QUERY},
+        }
+        if actor is not None:
+            entry['actor'] = actor_ranks[actor]
+        if post is not None:
+            entry['post'] = post_ranks[post]
+        if endpoint == 'posts.feed' and query.get('sort') == 'trending':
+            entry['endpoint'] = 'posts.trending'
+        if author is not None:
+            entry['endpoint'] = 'posts.author'
+            entry['author'] = author_ranks[author]
+        trace.append(entry)
+    return trace
+
+
+def ranks(values):
+    counts = Counter(value for value in values if value is not None)
+    return {value: rank for rank, (value, _) in enumerate(counts.most_common())}
+
+
+def build_event(entry, state):
+    """Событие для записи трассы на данных набора."""
+    from bench import scenarios
+
+    users = state.dataset['users']
+    actor = users[entry['actor'] % len(users)] if 'actor' in entry else state.user()
+    popular = state.dataset['popular_posts']
+    post = state.posts_by_id[popular[entry['post'] % len(popular)]] if 'post' in entry else state.popular_post()
+    endpoint = entry['endpoint']
+    token = state.token(actor)
+
+    if endpoint in ('posts.feed', 'posts.trending', 'posts.author'):
+        query = dict(entry.get('query') or {})
+        if endpoint == 'posts.author':
+            query['author_id'] = users[entry.get('author', 0) % len(users)]['user_id']
+        return 'get_posts', scenarios.api_event('GET', '/posts', query=query)
+    if endpoint == 'posts.get':
+        return 'get_post', scenarios.api_event(
+            'GET', f"/posts/{post['post_id']}", token=token, path_params={'post_id': post['post_id']})
+    if endpoint == 'posts.like':
+        return 'like_post', scenarios.api_event(
+            'POST', f"/posts/{post['post_id']}/like", {'post_id': post['post_id']}, token=token)
+    if endpoint == 'comments.create':
+        return 'comment_post', scenarios.api_event(
+            'POST', '/comments', {'post_id': post['post_id'], 'text': 'Комментарий'}, token=token)
+    if endpoint == 'posts.edit':
+        author = state.users_by_id[post['author_id']]
+        return 'edit_post', scenarios.api_event(
+            'PUT', f"/posts/{post['post_id']}/edit",
+            {'post_id': post['post_id'], 'title': post['title']}, token=state.token(author))
+    if endpoint == 'auth.login':
+        return 'auth', scenarios.api_event(
+            'POST', '/auth/login', {'email': actor['email'], 'password': scenarios.BENCH_PASSWORD})
+
+    # Остальные эндпоинты не зависят от конкретных записей журнала
+    module_name, build = scenarios.SCENARIOS[endpoint]
+    return module_name, build(state)
+
+
+def replay(trace, state, speed=1.0, concurrency=4):
+    """Проигрывание трассы; возвращает (замеры по эндпоинтам, отставания в мс)."""
+    from bench import runner
+
+    samples = {}
+    lags = []
+    lock = threading.Lock()
+
+    def call(endpoint, module_name, event, due):
+        lag = (time.perf_counter() - due) * 1000
+        _, summary = runner.invoke(module_name, event)
+        with lock:
+            samples.setdefault(endpoint, []).append(summary)
+            lags.append(max(lag, 0.0))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for entry in trace:
+            due = started + entry['t'] / speed
+            if (delay := due - time.perf_counter()) > 0:
+                time.sleep(delay)
+            # Подготовка события (токены, временные посты) выполняется в
+            # потоке расписания и не попадает в замер обработчика
+            module_name, event = build_event(entry, state)
+            pool.submit(call, entry['endpoint'], module_name, event, due)
+
+    return samples, lags
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m bench.replay', description='Воспроизведение трафика Echo')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    anonymize_parser = commands.add_parser('anonymize', help='обезличить журнал в трассу')
+    anonymize_parser.add_argument('source', help='NDJSON журнала доступа или захваченных событий')
+    anonymize_parser.add_argument('-o', '--output', required=True)
+
+    run_parser = commands.add_parser('run', help='проиграть трассу или журнал')
+    run_parser.add_argument('source', help='трасса anonymize или исходный журнал')
+    run_parser.add_argument('--speed', type=float, default=1.0, help='ускорение относительно исходных интервалов')
+    run_parser.add_argument('--concurrency', type=int, default=4, help='одновременных вызовов')
+    run_parser.add_argument('--limit', type=int, help='проиграть только первые N запросов')
+    add_dataset_arguments(run_parser)
+    run_parser.add_argument('--save-baseline', metavar='NAME')
+    run_parser.add_argument('--compare', metavar='NAME')
+    return parser.parse_args()
+
+
+def load_trace(path):
+    records = list(read_ndjson(path))
+    if records and all('endpoint' in record and 't' in record for record in records):
+        return records
+    return anonymize(records)
+
+
+def main():
+    args = parse_args()
+
+    if args.command == 'anonymize':
+        trace = anonymize(read_ndjson(args.source))
+        with open(args.output, 'w') as target:
+            for entry in trace:
+                target.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        print(f"Записей в трассе: {len(trace)}")
+        return 0
+
+    trace = load_trace(args.source)[:args.limit]
+    if not trace:
+        print("В журнале нет запросов к известным маршрутам", file=sys.stderr)
+        return 2
+
+    server, data, dynamodb = prepare(args)
+
+    from bench import metrics, runner
+    from bench.scenarios import BenchState
+
+    runner.install_collector()
+    state = BenchState(data, dynamodb, seed=args.seed)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            samples, lags = replay(trace, state, args.speed, args.concurrency)
+    finally:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            runner.drain_buffers()
+        if server:
+            server.stop()
+
+    config = {
+        'trace': os.path.basename(args.source),
+        'requests': len(trace),
+        'speed': args.speed,
+        'concurrency': args.concurrency,
+        'rtt_ms': args.rtt_ms,
+    }
+    report = metrics.build_report(samples, config)
+    print(metrics.format_report(report))
+    print(f"Запросов: {len(trace)}, длительность трассы: {trace[-1]['t'] / args.speed:.1f} с, "
+          f"отставание от расписания p50/p99: {metrics.percentile(lags, 50):.1f}/{metrics.percentile(lags, 99):.1f} мс")
+
+    if args.save_baseline:
+        print(f"База сохранена: {metrics.save_baseline(args.save_baseline, report)}")
+    if args.compare:
+        regressions = metrics.compare(report, metrics.load_baseline(args.compare))
+        for regression in regressions:
+            print(f"✗ {regression}")
+        if regressions:
+            return 1
+        print("✓ Регрессий нет")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""Вызов обработчиков с событиями и сбор их замеров из instrumentation."""
+import importlib
+import itertools
+import sys
+import uuid
+
+import instrumentation
+
+_summaries = {}
+_request_ids = itertools.count(1)
+
+
+class InvocationContext:
+    """Минимальный контекст вызова функции, как его передаёт среда выполнения."""
+
+    def __init__(self, request_id):
+        self.request_id = request_id
+        self.function_name = 'bench'
+
+    def get_remaining_time_in_millis(self):
+        return 10000
+
+
+def collect(summary):
+    _summaries[summary['request_id']] = summary
+
+
+def install_collector():
+    """Замеры вызовов попадают в runner вместо лога."""
+    instrumentation.emit = collect
+
+
+def invoke(module_name, event):
+    """Вызов handler модуля; возвращает (ответ, замер)."""
+    handler = importlib.import_module(module_name).handler
+    request_id = f'bench-{next(_request_ids)}-{uuid.uuid4().hex[:8]}'
+    response = handler(event, InvocationContext(request_id))
+    return response, _summaries.pop(request_id)
+
+
+def drain_buffers():
+    """Запись буферов контейнера (просмотры) до остановки заглушки базы."""
+    if view_counter := sys.modules.get('view_counter'):
+        view_counter.flush()
+
+
+def run_scenario(scenario, state, iterations, warmup=3):
+    """Замеры сценария; первые warmup вызовов (импорт, соединения) отбрасываются."""
+    module_name, build = scenario
+    samples = []
+    for i in range(warmup + iterations):
+        _, summary = invoke(module_name, build(state))
+        if i >= warmup:
+            samples.append(summary)
+    return samples
@@ -0,0 +1,280 @@
+"""События API Gateway и триггеров для каждого обработчика.
+
+Сценарий — модуль обработчика и функция, строящая событие. Подготовка
+данных, которая нужна событию (своя сессия, пост на удаление, файл для
+image_worker), выполняется в построителе и в замер не попадает.
+
+Модули backend/api импортируются здесь, поэтому этот модуль загружается
+только после standin.configure_environment.
+"""
+import io
+import json
+import random
+import uuid
+from datetime import datetime, timedelta
+
+from PIL import Image
+
+from auth import new_session
+from auth_middleware import issue_token
+from author_snapshot import update_profile
+from bench.dataset import BENCH_PASSWORD
+from feed_snapshot import mark_feed_changed
+from post_changes import change_stamp
+from storage import bucket_name, get_s3, new_image_key
+from timelines import FANOUT_PENDING
+
+
+def api_event(method, path, body=None, query=None, token=None, headers=None, path_params=None):
+    event_headers = {'Content-Type': 'application/json', 'Accept': 'application/json'}
+    if token:
+        event_headers['Authorization'] = f'Bearer {token}'
+    event_headers.update(headers or {})
+    return {
+        'httpMethod': method,
+        'path': path,
+        'headers': event_headers,
+        'queryStringParameters': query or {},
+        'pathParameters': path_params or {},
+        'body': json.dumps(body) if body is not None else None,
+        'isBase64Encoded': False
+    }
+
+
+class BenchState:
+    """Общие данные построителей: набор данных, генератор и подготовленные записи."""
+
+    def __init__(self, dataset, dynamodb, seed=42):
+        self.dataset = dataset
+        self.dynamodb = dynamodb
+        self.rng = random.Random(seed)
+        self.users_by_id = {user['user_id']: user for user in dataset['users']}
+        self.posts_by_id = {post['post_id']: post for post in dataset['posts']}
+        self.registered = 0
+        self._image = None
+
+    def user(self):
+        return self.rng.choice(self.dataset['users'])
+
+    def author(self):
+        return self.rng.choices(self.dataset['users'], weights=self.dataset['author_weights'])[0]
+
+    def popular_post(self):
+        post_id = self.rng.choices(self.dataset['popular_posts'], weights=self.dataset['post_weights'])[0]
+        return self.posts_by_id[post_id]
+
+    def token(self, user):
+        return issue_token(user['user_id'], user['email'])
+
+    def refresh_token(self, user):
+        session, refresh_token = new_session(user['user_id'], user['email'])
+        self.dynamodb.Table('sessions').put_item(Item=session)
+        return refresh_token
+
+    def scratch_post(self, user, **fields):
+        """Отдельный пост, который сценарий может изменить или удалить."""
+        stamp = change_stamp()
+        post = {
+            'post_id': str(uuid.uuid4()),
+            'title': 'Временный пост',
+            'text': '',
+            'imgUrl': '',
+            'slug': f'scratch-{self.rng.getrandbits(32)}',
+            'status': 'published',
+            'author_id': user['user_id'],
+            'created_at': stamp['updated_at'],
+            **stamp,
+            'views_count': 0,
+            'likes_count': 0,
+            'comments_count': 0
+        }
+        post.update(fields)
+        self.dynamodb.Table('posts').put_item(Item=post)
+        return post
+
+    def image(self):
+        if self._image is None:
+            buffer = io.BytesIO()
+            Image.new('RGB', (1600, 1200), (200, 120, 40)).save(buffer, 'JPEG', quality=85)
+            self._image = buffer.getvalue()
+        return self._image
+
+
+def login(state):
+    user = state.user()
+    return api_event('POST', '/auth/login', {'email': user['email'], 'password': BENCH_PASSWORD})
+
+
+def register(state):
+    state.registered += 1
+    return api_event('POST', '/auth/register', {
+        'email': f'new{state.registered}-{state.rng.getrandbits(32)}@bench.local',
+        'password': BENCH_PASSWORD
+    })
+
+
+def refresh(state):
+    return api_event('POST', '/auth/refresh', {'refresh_token': state.refresh_token(state.user())})
+
+
+def feed(state):
+    return api_event('GET', '/posts')
+
+
+def trending(state):
+    return api_event('GET', '/posts', query={'sort': 'trending'})
+
+
+def author_posts(state):
+    return api_event('GET', '/posts', query={'author_id': state.author()['user_id']})
+
+
+def post_changes(state):
+    # Изменения чуть старше курсора: запрос видит их за вычетом CHANGES_LAG
+    stamp = change_stamp(datetime.utcnow() - timedelta(seconds=10))
+    for _ in range(3):
+        state.scratch_post(state.user(), **stamp)
+    since = (datetime.utcnow() - timedelta(minutes=5)).isoformat()
+    return api_event('GET', '/posts/changes', query={'since': since, 'limit': '20'})
+
+
+def reader(state, post):
+    # Черновик виден только автору
+    return state.users_by_id[post['author_id']] if post['status'] != 'published' else state.user()
+
+
+def get_post(state):
+    post = state.popular_post()
+    return api_event('GET', f"/posts/{post['post_id']}", token=state.token(reader(state, post)),
+                     path_params={'post_id': post['post_id']})
+
+
+def get_post_by_slug(state):
+    post = state.popular_post()
+    return api_event('GET', f"/posts/by-slug/{post['slug']}", token=state.token(reader(state, post)),
+                     path_params={'slug': post['slug']})
+
+
+def create_post(state):
+    user = state.user()
+    return api_event('POST', '/posts/create', {
+        'title': 'Новый пост',
+        'text': 'Текст нового поста',
+        'status': 'published'
+    }, token=state.token(user))
+
+
+def edit_post(state):
+    post = state.popular_post()
+    author = state.users_by_id[post['author_id']]
+    return api_event('PUT', f"/posts/{post['post_id']}/edit", {
+        'post_id': post['post_id'],
+        'title': post['title'],
+        'text': post['text']
+    }, token=state.token(author))
+
+
+def like_post(state):
+    post = state.popular_post()
+    return api_event('POST', f"/posts/{post['post_id']}/like", {'post_id': post['post_id']},
+                     token=state.token(state.user()))
+
+
+def comment_post(state):
+    post = state.popular_post()
+    return api_event('POST', '/comments', {'post_id': post['post_id'], 'text': 'Отличный пост'},
+                     token=state.token(state.user()))
+
+
+def timeline(state):
+    return api_event('GET', '/timeline', token=state.token(state.user()))
+
+
+def follow_user(state):
+    user, author = state.user(), state.author()
+    return api_event('POST', f"/users/{author['user_id']}/follow", token=state.token(user),
+                     path_params={'user_id': author['user_id']})
+
+
+def unfollow_user(state):
+    follow = state.rng.choice(state.dataset['follows'])
+    user = state.users_by_id[follow['follower_id']]
+    return api_event('DELETE', f"/users/{follow['followee_id']}/follow", token=state.token(user),
+                     path_params={'user_id': follow['followee_id']})
+
+
+def delete_post(state):
+    user = state.user()
+    post = state.scratch_post(user)
+    return api_event('DELETE', f"/posts/{post['post_id']}/delete", query={'post_id': post['post_id']},
+                     token=state.token(user))
+
+
+def uploads(state):
+    return api_event('POST', '/uploads', {'content_type': 'image/jpeg', 'size': 250000},
+                     token=state.token(state.user()))
+
+
+def purge_posts(state):
+    expired = (datetime.utcnow() - timedelta(days=1)).isoformat()
+    for _ in range(5):
+        user = state.user()
+        post = state.scratch_post(user, status='deleted', permanent_delete_at=expired)
+        state.dynamodb.Table('post_likes').put_item(Item={
+            'post_id': post['post_id'],
+            'user_id': user['user_id'],
+            'created_at': expired
+        })
+    return {'event_metadata': {'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage'}}
+
+
+def propagate_authors(state):
+    for _ in range(3):
+        user = state.author()
+        update_profile(state.dynamodb, user['user_id'], {'display_name': f"{user['username']} {uuid.uuid4().hex[:6]}"})
+    return {'event_metadata': {'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage'}}
+
+
+def build_feed_snapshot(state):
+    mark_feed_changed(state.dynamodb)
+    return {'event_metadata': {'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage'}}
+
+
+def fanout_timeline(state):
+    for _ in range(3):
+        state.scratch_post(state.author(), fanout_pending=FANOUT_PENDING)
+    return {'event_metadata': {'event_type': 'yandex.cloud.events.serverless.triggers.TimerMessage'}}
+
+
+def image_worker(state):
+    data = state.image()
+    key = new_image_key(state.user()['user_id'], 'image/jpeg')
+    get_s3().put_object(Bucket=bucket_name(), Key=key, Body=data, ContentType='image/jpeg')
+    return {'messages': [{'details': {'bucket_id': bucket_name(), 'object_id': key}}]}
+
+
+SCENARIOS = {
+    'auth.login': ('auth', login),
+    'auth.register': ('auth', register),
+    'auth.refresh': ('auth', refresh),
+    'posts.feed': ('get_posts', feed),
+    'posts.author': ('get_posts', author_posts),
+    'posts.trending': ('get_posts', trending),
+    'posts.changes': ('get_post_changes', post_changes),
+    'posts.get': ('get_post', get_post),
+    'posts.slug': ('get_post', get_post_by_slug),
+    'posts.create': ('create_post', create_post),
+    'posts.edit': ('edit_post', edit_post),
+    'posts.like': ('like_post', like_post),
+    'posts.delete': ('delete_post', delete_post),
+    'comments.create': ('comment_post', comment_post),
+    'timeline': ('get_timeline', timeline),
+    'users.follow': ('follow_user', follow_user),
+    'users.unfollow': ('follow_user', unfollow_user),
+    'uploads': ('uploads', uploads),
+    'purge_posts': ('purge_posts', purge_posts),
+    'propagate_authors': ('propagate_authors', propagate_authors),
+    'build_feed_snapshot': ('build_feed_snapshot', build_feed_snapshot),
+    'fanout_timeline': ('fanout_timeline', fanout_timeline),
+    'image_worker': ('image_worker', image_worker),
+}
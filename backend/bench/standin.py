@@ -0,0 +1,145 @@
+"""Локальное окружение для обработчиков: DynamoDB-заглушка и файловое хранилище."""
+import asyncio
+import logging
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from urllib.parse import urlsplit
+
+BENCH_REGION = 'us-east-1'
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_standin(endpoint=None):
+    """Endpoint заглушки и сервер, который нужно остановить (или None).
+
+    Если endpoint передан (DynamoDB Local, YDB), используется он. Иначе
+    в потоке запускается сервер moto.
+    """
+    if endpoint:
+        return endpoint, None
+
+    try:
+        from moto.server import ThreadedMotoServer
+    except ImportError:
+        raise SystemExit(
+            "Для локальной заглушки нужен moto: pip install -r backend/bench/requirements.txt\n"
+            "или укажите --endpoint запущенного DynamoDB Local"
+        )
+
+    # Журнал запросов werkzeug заглушает отчёт
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = free_port()
+    server = ThreadedMotoServer(ip_address='127.0.0.1', port=port, verbose=False)
+    server.start()
+    return f'http://127.0.0.1:{port}', server
+
+
+def start_standin_process(timeout=30):
+    """Сервер moto в отдельном процессе: (endpoint, процесс).
+
+    Для нагрузочных тестов: заглушка в потоке делит GIL с генератором
+    нагрузки и искажает замеры.
+    """
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'moto.server', '-H', '127.0.0.1', '-p', str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    endpoint = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            urllib.request.urlopen(f'{endpoint}/moto-api/', timeout=1)
+            return endpoint, process
+        except OSError:
+            time.sleep(0.2)
+    process.terminate()
+    raise SystemExit("Сервер moto не запустился")
+
+
+def configure_environment(endpoint, store=None):
+    """Переменные окружения, которые читают обработчики.
+
+    Вызывается до импорта модулей из backend/api: instrumentation и
+    bcrypt-настройки читают окружение при импорте.
+    """
+    store = store or tempfile.mkdtemp(prefix='echo-bench-')
+    os.environ.update({
+        'YDB_ENDPOINT': endpoint,
+        'YDB_REGION': os.environ.get('BENCH_REGION', BENCH_REGION),
+        'ACCESS_KEY_ID': os.environ.get('BENCH_ACCESS_KEY_ID', 'bench'),
+        'SECRET_ACCESS_KEY': os.environ.get('BENCH_SECRET_ACCESS_KEY', 'bench'),
+        'JWT_SECRET': 'bench-secret-bench-secret-bench-secret',
+        'S3_ENDPOINT_URL': f'file://{os.path.abspath(store)}',
+        'S3_BUCKET_NAME': 'echo-bench',
+        'BCRYPT_ROUNDS': '10',
+        'INSTRUMENTATION': 'on',
+        'SERVER_TIMING': 'false',
+        # Хеджирование добавляет обращения к базе случайно, а базы бенчмарка
+        # сравнивают их число как детерминированное
+        'HEDGE_READS': os.environ.get('BENCH_HEDGE_READS', 'off'),
+    })
+    return store
+
+
+def add_round_trip_delay(dynamodb, rtt_ms):
+    """Искусственная задержка на каждый запрос к базе, как у сети до YDB."""
+    if rtt_ms <= 0:
+        return
+
+    def delay(**kwargs):
+        time.sleep(rtt_ms / 1000)
+
+    dynamodb.meta.client.meta.events.register('before-send.*.*', delay)
+
+
+def start_delay_proxy(endpoint, rtt_ms):
+    """TCP-прокси к endpoint с задержкой rtt_ms на каждый запрос; возвращает свой endpoint.
+
+    Нужен, когда обработчики работают в другом процессе (asgi.py) и
+    add_round_trip_delay к их клиенту не подключить.
+    """
+    target = urlsplit(endpoint)
+    port = free_port()
+
+    async def pipe(reader, writer, delay):
+        try:
+            while data := await reader.read(65536):
+                if delay:
+                    await asyncio.sleep(delay)
+                writer.write(data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def handle(client_reader, client_writer):
+        upstream_reader, upstream_writer = await asyncio.open_connection(target.hostname, target.port)
+        await asyncio.gather(
+            pipe(client_reader, upstream_writer, rtt_ms / 1000),
+            pipe(upstream_reader, client_writer, 0),
+            return_exceptions=True
+        )
+
+    loop = asyncio.new_event_loop()
+    ready = threading.Event()
+
+    def run():
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(asyncio.start_server(handle, '127.0.0.1', port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name='delay-proxy', daemon=True).start()
+    ready.wait()
+    return f'http://127.0.0.1:{port}'
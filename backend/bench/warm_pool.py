@@ -0,0 +1,268 @@
+"""Сравнение задержек: функция на маршрут против одной функции router.
+
+Моделирует пулы тёплых контейнеров Cloud Functions при смешанном трафике.
+Контейнер обслуживает один запрос за раз и выгружается после --keepalive
+секунд простоя; запрос без свободного тёплого контейнера платит холодный
+старт. При раздельных функциях у каждого обработчика свой пул, и редкие
+маршруты (редактирование, удаление, загрузка) почти всегда попадают на
+холодный старт. У router пул общий; в тёплом контейнере первый запрос к
+новому маршруту платит только импорт модуля обработчика.
+
+Холодный старт измеряется в отдельных интерпретаторах (импорт модуля и
+создание клиента botocore) плюс --runtime-init-ms на запуск среды.
+Время обработки — --service-ms для всех эндпоинтов или p50 из базы
+бенчмарка (--baseline).
+Трафик — трасса bench.replay или пуассоновский поток со смесью MIX.
+
+    python -m bench.warm_pool
+    python -m bench.warm_pool --rps 0.5 --duration 7200 --keepalive 600
+    python -m bench.warm_pool --trace trace.ndjson
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+
+from bench import API_DIR
+from bench.metrics import load_baseline, percentile
+
+# Эндпоинт отчёта -> модуль обработчика (как в bench.scenarios.SCENARIOS)
+ENDPOINT_MODULES = {
+    'auth.login': 'auth',
+    'auth.register': 'auth',
+    'auth.refresh': 'auth',
+    'posts.feed': 'get_posts',
+    'posts.author': 'get_posts',
+    'posts.trending': 'get_posts',
+    'posts.changes': 'get_post_changes',
+    'posts.get': 'get_post',
+    'posts.slug': 'get_post',
+    'posts.create': 'create_post',
+    'posts.edit': 'edit_post',
+    'posts.like': 'like_post',
+    'posts.delete': 'delete_post',
+    'comments.create': 'comment_post',
+    'timeline': 'get_timeline',
+    'users.follow': 'follow_user',
+    'users.unfollow': 'follow_user',
+    'uploads': 'uploads',
+}
+
+# Доли эндпоинтов в синтетическом трафике: чтение ленты преобладает
+MIX = {
+    'posts.feed': 0.55,
+    'posts.author': 0.10,
+    'posts.like': 0.12,
+    'comments.create': 0.06,
+    'auth.refresh': 0.06,
+    'auth.login': 0.05,
+    'posts.create': 0.02,
+    'uploads': 0.015,
+    'auth.register': 0.01,
+    'posts.edit': 0.01,
+    'posts.delete': 0.005,
+}
+
+# Модули, общие для обработчиков: в тёплом контейнере router они уже загружены
+SHARED_MODULES = ('instrumentation', 'db', 'auth_middleware', 'storage')
+
+DEFAULT_SERVICE_MS = 50.0
+
+COLD_START_CODE = """
+import json, time
+started = time.perf_counter()
+import {module}
+imported = time.perf_counter()
+import botocore.session
+botocore.session.get_session().create_client(
+    'dynamodb', region_name='ru-central1', endpoint_url='http://127.0.0.1:1',
+    aws_access_key_id='x', aws_secret_access_key='x')
+print(json.dumps({{'module_ms': (imported - started) * 1000, 'client_ms': (time.perf_counter() - imported) * 1000}}))
+"""
+
+WARM_IMPORT_CODE = """
+import json, time
+import {shared}
+timings = {{}}
+for name in {modules!r}:
+    started = time.perf_counter()
+    __import__(name)
+    timings[name] = (time.perf_counter() - started) * 1000
+print(json.dumps(timings))
+"""
+
+
+def run_python(code):
+    result = subprocess.run(
+        [sys.executable, '-c', code], cwd=API_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def measure_cold_costs(modules, runs=3):
+    """Медианы по runs запускам: {модуль: {module_ms, client_ms, warm_import_ms}, 'router': мс}."""
+    costs = {}
+    for module in modules:
+        samples = [run_python(COLD_START_CODE.format(module=module)) for _ in range(runs)]
+        costs[module] = {
+            'module_ms': statistics.median(sample['module_ms'] for sample in samples),
+            'client_ms': statistics.median(sample['client_ms'] for sample in samples),
+        }
+
+    warm = [run_python(WARM_IMPORT_CODE.format(shared=', '.join(SHARED_MODULES), modules=list(modules)))
+            for _ in range(runs)]
+    for module in modules:
+        costs[module]['warm_import_ms'] = statistics.median(sample[module] for sample in warm)
+
+    router = [run_python(COLD_START_CODE.format(module='router')) for _ in range(runs)]
+    costs['router'] = statistics.median(sample['module_ms'] for sample in router)
+    return costs
+
+
+def synthetic_trace(rps, duration, seed):
+    """Пуассоновский поток запросов со смесью MIX."""
+    rng = random.Random(seed)
+    endpoints, weights = zip(*MIX.items())
+    trace = []
+    t = 0.0
+    while (t := t + rng.expovariate(rps)) < duration:
+        trace.append({'t': t, 'endpoint': rng.choices(endpoints, weights)[0]})
+    return trace
+
+
+class Container:
+    def __init__(self):
+        self.busy_until = 0.0
+        self.loaded = set()
+
+
+def simulate(trace, route_of, service_ms, cold_ms, warm_import_ms, keepalive):
+    """Задержки запросов трассы для заданного разбиения маршрутов по функциям.
+
+    route_of(module) — функция, обслуживающая модуль; cold_ms(function,
+    module) — холодный старт контейнера. Возвращает {эндпоинт: [(мс, холодный)]}.
+    """
+    pools = {}
+    results = {}
+    for entry in sorted(trace, key=lambda item: item['t']):
+        endpoint = entry['endpoint']
+        if endpoint not in ENDPOINT_MODULES:
+            continue
+        module = ENDPOINT_MODULES[endpoint]
+        function = route_of(module)
+        now = entry['t']
+
+        pool = pools.setdefault(function, [])
+        pool[:] = [container for container in pool if container.busy_until + keepalive >= now]
+        idle = [container for container in pool if container.busy_until <= now]
+
+        if idle:
+            # Платформа отдаёт запрос последнему освободившемуся контейнеру
+            container = max(idle, key=lambda item: item.busy_until)
+            latency = service_ms(endpoint)
+            if module not in container.loaded:
+                latency += warm_import_ms(module)
+            cold = False
+        else:
+            container = Container()
+            pool.append(container)
+            latency = cold_ms(function, module) + service_ms(endpoint)
+            cold = True
+
+        container.loaded.add(module)
+        container.busy_until = now + latency / 1000
+        results.setdefault(endpoint, []).append((latency, cold))
+    return results
+
+
+def summarize(results):
+    latencies = [latency for samples in results.values() for latency, _ in samples]
+    colds = sum(cold for samples in results.values() for _, cold in samples)
+    return {
+        'count': len(latencies),
+        'cold': colds,
+        'p50': percentile(latencies, 50),
+        'p95': percentile(latencies, 95),
+        'p99': percentile(latencies, 99),
+    }
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog='python -m bench.warm_pool', description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trace', help='трасса bench.replay anonymize вместо синтетического трафика')
+    parser.add_argument('--rps', type=float, default=0.2, help='запросов в секунду в синтетическом трафике')
+    parser.add_argument('--duration', type=float, default=6 * 3600, help='длительность синтетического трафика, с')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--keepalive', type=float, default=300, help='простой контейнера до выгрузки, с')
+    parser.add_argument('--runtime-init-ms', type=float, default=300, help='запуск среды выполнения, мс')
+    parser.add_argument('--service-ms', type=float, default=DEFAULT_SERVICE_MS, help='время обработки запроса, мс')
+    parser.add_argument('--baseline', help='база bench с временем обработки эндпоинтов вместо --service-ms')
+    parser.add_argument('--runs', type=int, default=3, help='замеров холодного старта на модуль')
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    if args.trace:
+        from bench.replay import load_trace
+        trace = load_trace(args.trace)
+    else:
+        trace = synthetic_trace(args.rps, args.duration, args.seed)
+    if not trace:
+        print("В трассе нет запросов", file=sys.stderr)
+        return 2
+
+    endpoints = load_baseline(args.baseline)['endpoints'] if args.baseline else {}
+
+    def service_ms(endpoint):
+        return endpoints.get(endpoint, {}).get('p50', args.service_ms)
+
+    modules = sorted(set(ENDPOINT_MODULES.values()))
+    costs = measure_cold_costs(modules, args.runs)
+
+    def cold_ms(function, module):
+        cost = costs[module]
+        router_ms = costs['router'] if function == 'router' else 0.0
+        return args.runtime_init_ms + router_ms + cost['module_ms'] + cost['client_ms']
+
+    def warm_import_ms(module):
+        return costs[module]['warm_import_ms']
+
+    modes = {
+        'по функции на маршрут': simulate(trace, lambda module: module, service_ms, cold_ms,
+                                          warm_import_ms, args.keepalive),
+        'router': simulate(trace, lambda module: 'router', service_ms, cold_ms,
+                           warm_import_ms, args.keepalive),
+    }
+
+    print(f"{'модуль':<14} {'импорт, мс':>10} {'клиент, мс':>10} {'в тёплом router, мс':>20}")
+    for module in modules:
+        cost = costs[module]
+        print(f"{module:<14} {cost['module_ms']:>10.1f} {cost['client_ms']:>10.1f} {cost['warm_import_ms']:>20.1f}")
+    print(f"router: импорт {costs['router']:.1f} мс, запуск среды {args.runtime_init_ms:.0f} мс, "
+          f"простой до выгрузки {args.keepalive:.0f} с\n")
+
+    print(f"{'развёртывание':<22} {'n':>6} {'холодных':>9} {'p50, мс':>8} {'p95, мс':>8} {'p99, мс':>8}")
+    for name, results in modes.items():
+        stats = summarize(results)
+        print(f"{name:<22} {stats['count']:>6} {stats['cold'] / stats['count']:>8.1%} "
+              f"{stats['p50']:>8.1f} {stats['p95']:>8.1f} {stats['p99']:>8.1f}")
+
+    print(f"\n{'эндпоинт':<18} {'n':>6} {'холодных отдельно':>18} {'холодных router':>16} "
+          f"{'p99 отдельно':>13} {'p99 router':>11}")
+    separate, single = modes.values()
+    for endpoint in sorted(separate, key=lambda name: -len(separate[name])):
+        one, other = summarize({endpoint: separate[endpoint]}), summarize({endpoint: single[endpoint]})
+        print(f"{endpoint:<18} {one['count']:>6} {one['cold'] / one['count']:>18.1%} "
+              f"{other['cold'] / other['count']:>16.1%} {one['p99']:>13.1f} {other['p99']:>11.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
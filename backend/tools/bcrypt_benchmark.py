@@ -0,0 +1,69 @@
+"""Подбор стоимости bcrypt под целевую задержку входа.
+
+Замеряет checkpw для разных значений cost и предлагает наибольшее, при
+котором p99 укладывается в --target-ms. Запускать стоит в окружении функции
+(или с --cpu-fraction, равной доле CPU, которую получает функция: замеры
+делятся на неё). Рекомендованное значение задаётся переменной BCRYPT_ROUNDS;
+вход перехеширует сохранённые пароли с другой стоимостью.
+
+    python backend/tools/bcrypt_benchmark.py --target-ms 250
+    python backend/tools/bcrypt_benchmark.py --target-ms 300 --cpu-fraction 0.2 --rounds 10 11 12
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import bcrypt
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+from auth import BCRYPT_MIN_ROUNDS  # noqa: E402
+
+
+def measure(rounds, samples, cpu_fraction):
+    password = b'benchmark-password'
+    password_hash = bcrypt.hashpw(password, bcrypt.gensalt(rounds))
+
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        bcrypt.checkpw(password, password_hash)
+        timings.append((time.perf_counter() - started) * 1000 / cpu_fraction)
+
+    timings.sort()
+    return {
+        'p50': statistics.median(timings),
+        'p99': timings[min(len(timings) - 1, int(len(timings) * 0.99))]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--target-ms', type=float, default=250, help='допустимый p99 проверки пароля, мс')
+    parser.add_argument('--rounds', type=int, nargs='+', default=list(range(BCRYPT_MIN_ROUNDS, 15)))
+    parser.add_argument('--samples', type=int, default=20, help='замеров на каждое значение cost')
+    parser.add_argument('--cpu-fraction', type=float, default=1.0, help='доля CPU у функции (0..1]')
+    args = parser.parse_args()
+
+    recommended = None
+    print(f"{'cost':>4}  {'p50, мс':>9}  {'p99, мс':>9}")
+    for rounds in sorted(args.rounds):
+        result = measure(rounds, args.samples, args.cpu_fraction)
+        fits = result['p99'] <= args.target_ms
+        print(f"{rounds:>4}  {result['p50']:>9.1f}  {result['p99']:>9.1f}  {'✓' if fits else ''}")
+        if fits and rounds >= BCRYPT_MIN_ROUNDS:
+            recommended = rounds
+
+    if recommended is None:
+        print(f"Ни одно значение не укладывается в {args.target_ms:.0f} мс; "
+              f"используйте BCRYPT_ROUNDS={BCRYPT_MIN_ROUNDS} и увеличьте память функции")
+        return 1
+
+    print(f"BCRYPT_ROUNDS={recommended}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
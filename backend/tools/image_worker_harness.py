@@ -0,0 +1,68 @@
+"""Локальный прогон image_worker на файловом хранилище.
+
+Кладёт переданные изображения в каталог-хранилище под posts/local/, строит
+варианты тем же кодом, что и функция, и печатает их размеры и вес. С ключом
+--check завершается с кодом 1, если хотя бы один вариант не создан или
+тяжелее оригинала.
+
+    python backend/tools/image_worker_harness.py photo.jpg screenshot.png
+    python backend/tools/image_worker_harness.py --store /tmp/echo-store --check *.jpg
+"""
+import argparse
+import os
+import sys
+import tempfile
+import uuid
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('images', nargs='+', help='пути к исходным изображениям')
+    parser.add_argument('--store', help='каталог файлового хранилища (по умолчанию временный)')
+    parser.add_argument('--check', action='store_true', help='проверить, что все варианты созданы и легче оригинала')
+    args = parser.parse_args()
+
+    store = args.store or tempfile.mkdtemp(prefix='echo-store-')
+    os.environ['S3_ENDPOINT_URL'] = f'file://{os.path.abspath(store)}'
+    os.environ.setdefault('S3_BUCKET_NAME', 'echo-local')
+
+    import image_worker
+    from storage import bucket_name, detect_image_type, get_s3, upload_stream, IMAGE_EXTENSIONS
+
+    s3 = get_s3()
+    failures = 0
+
+    for path in args.images:
+        with open(path, 'rb') as source:
+            content_type = detect_image_type(source.read(12)) or 'image/jpeg'
+            size = source.seek(0, os.SEEK_END)
+            source.seek(0)
+            key = f"posts/local/{uuid.uuid4()}{IMAGE_EXTENSIONS[content_type]}"
+            upload_stream(source, size, key, content_type, s3=s3)
+
+        info = image_worker.process_image(s3, key)
+        print(f"{path}: {info['width']}x{info['height']}, {size / 1024:.0f} КБ")
+
+        for name, variant in info['variants'].items():
+            for fmt in image_worker.variant_formats():
+                target = image_worker.variant_key(key, name, fmt)
+                try:
+                    variant_size = s3.head_object(Bucket=bucket_name(), Key=target)['ContentLength']
+                except Exception:
+                    print(f"  {name}.{fmt}: не создан")
+                    failures += 1
+                    continue
+
+                print(f"  {name}.{fmt}: {variant['width']}x{variant['height']}, "
+                      f"{variant_size / 1024:.0f} КБ ({variant_size / size:.0%} оригинала)")
+                if variant_size > size:
+                    failures += 1
+
+    print(f"Хранилище: {store}")
+    return 1 if args.check and failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,122 @@
+"""Профиль импорта обработчиков (-X importtime) и проверка холодного старта.
+
+Каждый модуль импортируется в отдельном интерпретаторе, как при холодном
+старте функции. Отчёт — медиана суммарного времени импорта по --runs запускам
+и самые дорогие зависимости. Сырые отчёты importtime сохраняются в
+--output-dir.
+
+Код возврата 1, если обработчик при импорте загружает тяжёлые модули
+(boto3, botocore, jwt — они должны загружаться лениво, на пути, которому
+нужны) или медиана превышает --max-ms.
+
+    python backend/tools/import_profile.py
+    python backend/tools/import_profile.py --runs 10 --output-dir /tmp/importtime
+    python backend/tools/import_profile.py auth get_posts --max-ms 40
+"""
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+
+API_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'api')
+
+HANDLERS = [
+    'auth', 'comment_post', 'create_post', 'delete_post', 'edit_post', 'get_posts', 'get_post_changes', 'get_post',
+    'like_post', 'uploads', 'purge_posts', 'propagate_authors', 'build_feed_snapshot', 'image_worker',
+    'get_timeline', 'follow_user', 'fanout_timeline', 'router',
+]
+
+# Модули, которые нельзя загружать при импорте обработчика
+HEAVY_MODULES = ('boto3', 'botocore', 'jwt', 'cryptography', 'PIL')
+
+# Исключения: обработчику этот модуль нужен на любом пути
+ALLOWED_HEAVY = {
+    'image_worker': {'PIL'},
+}
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+def profile_once(module):
+    """(суммарное время импорта в мс, строки importtime, загруженные тяжёлые модули)."""
+    code = (
+        f"import sys, json, {module}; "
+        f"print(json.dumps(sorted({{name.split('.')[0] for name in sys.modules}} & {set(HEAVY_MODULES)!r})))"
+    )
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=API_DIR, capture_output=True, text=True, check=True,
+        env=dict(os.environ, PYTHONDONTWRITEBYTECODE='1')
+    )
+
+    total_us = 0
+    for line in result.stderr.splitlines():
+        if (match := IMPORTTIME_RE.match(line)) and match.group(4) == module:
+            total_us = int(match.group(2))
+    return total_us / 1000, result.stderr, json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def heaviest_dependencies(stderr, module, limit=3):
+    """Самые дорогие прямые зависимости модуля."""
+    children = []
+    for line in stderr.splitlines():
+        if not (match := IMPORTTIME_RE.match(line)):
+            continue
+        _, cumulative_us, indent, name = match.groups()
+        # importtime выводит зависимости перед модулем: 1 пробел отступа
+        # у модуля верхнего уровня, ещё 2 на каждый уровень вложенности
+        if len(indent) == 3:
+            children.append((int(cumulative_us) / 1000, name))
+        elif len(indent) == 1:
+            if name == module:
+                return sorted(children, reverse=True)[:limit]
+            children = []
+    return []
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('handlers', nargs='*', default=HANDLERS)
+    parser.add_argument('--runs', type=int, default=5, help='запусков на обработчик')
+    parser.add_argument('--max-ms', type=float, default=80, help='допустимая медиана времени импорта, мс')
+    parser.add_argument('--output-dir', help='каталог для сырых отчётов importtime')
+    args = parser.parse_args()
+
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    failures = []
+    print(f"{'обработчик':<14} {'медиана, мс':>11}  самые дорогие зависимости")
+    for module in args.handlers:
+        timings = []
+        for _ in range(args.runs):
+            elapsed_ms, stderr, heavy = profile_once(module)
+            timings.append(elapsed_ms)
+
+        median_ms = statistics.median(timings)
+        dependencies = ', '.join(f"{name} {ms:.1f}" for ms, name in heaviest_dependencies(stderr, module))
+        print(f"{module:<14} {median_ms:>11.1f}  {dependencies}")
+
+        if args.output_dir:
+            with open(os.path.join(args.output_dir, f'{module}.importtime.txt'), 'w') as target:
+                target.write(stderr)
+
+        unexpected = set(heavy) - ALLOWED_HEAVY.get(module, set())
+        if unexpected:
+            failures.append(f"{module}: при импорте загружены {', '.join(sorted(unexpected))}")
+        if median_ms > args.max_ms:
+            failures.append(f"{module}: импорт {median_ms:.1f} мс > {args.max_ms:.0f} мс")
+
+    for failure in failures:
+        print(f"✗ {failure}")
+    if failures:
+        return 1
+    print("✓ Холодный импорт в пределах нормы")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,105 @@
+"""Профиль пиковой памяти загрузки base64-изображения в create_post.
+
+Замеряет через tracemalloc пик памяти upload_to_s3 (декодирование + загрузка)
+для изображений разного размера. Хранилище заменено приёмником, который
+читает тело запроса и отбрасывает его, поэтому замер не зависит от сети.
+Входная строка создаётся до начала замера: её держит сам API Gateway.
+
+    python backend/tools/upload_memory_profile.py
+    python backend/tools/upload_memory_profile.py --sizes 1 4 9 --max-peak 12
+
+Код возврата 1, если пик превышает --max-peak МБ или растёт с размером
+изображения больше, чем на --max-growth МБ.
+"""
+import argparse
+import base64
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'api'))
+
+from botocore.exceptions import ClientError  # noqa: E402
+
+import create_post  # noqa: E402
+import storage  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class DiscardingS3:
+    """Приёмник S3-вызовов upload_stream: читает тела и ничего не хранит."""
+
+    def __init__(self):
+        self.received = 0
+
+    def _drain(self, body):
+        if hasattr(body, 'read'):
+            while chunk := body.read(64 * 1024):
+                self.received += len(chunk)
+        else:
+            self.received += len(body)
+
+    def head_object(self, Key, **kwargs):
+        raise ClientError({'Error': {'Code': '404', 'Message': 'Not Found'}}, 'HeadObject')
+
+    def put_object(self, Body, **kwargs):
+        self._drain(Body)
+        return {}
+
+    def create_multipart_upload(self, **kwargs):
+        return {'UploadId': 'profile'}
+
+    def upload_part(self, Body, PartNumber, **kwargs):
+        self._drain(Body)
+        return {'ETag': f'"{PartNumber}"'}
+
+    def complete_multipart_upload(self, **kwargs):
+        return {}
+
+    def abort_multipart_upload(self, **kwargs):
+        return {}
+
+
+def make_payload(size_mb):
+    raw = b'\x89PNG\r\n\x1a\n' + os.urandom(int(size_mb * MB) - 8)
+    return 'data:image/png;base64,' + base64.b64encode(raw).decode('ascii')
+
+
+def measure(size_mb):
+    payload = make_payload(size_mb)
+    sink = DiscardingS3()
+    storage._s3 = sink
+
+    tracemalloc.start()
+    try:
+        create_post.upload_to_s3(payload, 'profile')
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    assert sink.received == int(size_mb * MB), 'загружено не всё изображение'
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=float, nargs='+', default=[0.5, 2, 6, 9.5], help='размеры изображений, МБ')
+    parser.add_argument('--max-peak', type=float, default=12, help='допустимый пик памяти, МБ')
+    parser.add_argument('--max-growth', type=float, default=6, help='допустимый рост пика между размерами, МБ')
+    args = parser.parse_args()
+
+    peaks = []
+    for size_mb in args.sizes:
+        peak = measure(size_mb)
+        peaks.append(peak)
+        print(f"{size_mb:>6.1f} МБ изображение: пик {peak / MB:6.2f} МБ")
+
+    growth = (max(peaks) - min(peaks)) / MB
+    failed = max(peaks) / MB > args.max_peak or growth > args.max_growth
+    print(f"Рост пика между размерами: {growth:.2f} МБ — {'FAIL' if failed else 'OK'}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
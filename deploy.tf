@@ -49,10 +49,29 @@ resource "yandex_storage_bucket" "images" {
   bucket = "echo-post-images"
   acl    = "public-read"
 
+  # Браузер загружает изображения напрямую по presigned URL из /uploads
+  cors_rule {
+    allowed_headers = ["*"]
+    allowed_methods = ["PUT", "POST"]
+    allowed_origins = [var.cors_origins]
+    max_age_seconds = 3600
+  }
+
   anonymous_access_flags {
     read = true
     list = false
   }
+
+  # Версии снимка ленты неизменяемы; старые удаляются через неделю
+  lifecycle_rule {
+    id      = "feed-snapshots"
+    enabled = true
+    prefix  = "feeds/first-page/"
+
+    expiration {
+      days = 7
+    }
+  }
 }
 
 resource "yandex_storage_bucket" "frontend" {
@@ -75,60 +94,106 @@ locals {
   functions = {
     auth = {
       name       = "echo-auth"
-      file       = "../backend/api/auth.py"
       entrypoint = "auth.handler"
     }
     get_posts = {
       name       = "echo-get-posts"
-      file       = "../backend/api/get_posts.py"
       entrypoint = "get_posts.handler"
     }
+    get_post_changes = {
+      name       = "echo-get-post-changes"
+      entrypoint = "get_post_changes.handler"
+    }
+    get_post = {
+      name       = "echo-get-post"
+      entrypoint = "get_post.handler"
+    }
+    get_timeline = {
+      name       = "echo-get-timeline"
+      entrypoint = "get_timeline.handler"
+    }
+    follow_user = {
+      name       = "echo-follow-user"
+      entrypoint = "follow_user.handler"
+    }
     create_post = {
       name       = "echo-create-post"
-      file       = "../backend/api/create_post.py"
       entrypoint = "create_post.handler"
     }
     edit_post = {
       name       = "echo-edit-post"
-      file       = "../backend/api/edit_post.py"
       entrypoint = "edit_post.handler"
     }
     delete_post = {
       name       = "echo-delete-post"
-      file       = "../backend/api/delete_post.py"
       entrypoint = "delete_post.handler"
     }
     like_post = {
       name       = "echo-like-post"
-      file       = "../backend/api/like_post.py"
       entrypoint = "like_post.handler"
     }
     comment = {
       name       = "echo-create-comment"
-      file       = "../backend/api/comment_post.py"
       entrypoint = "comment_post.handler"
     }
+    uploads = {
+      name       = "echo-uploads"
+      entrypoint = "uploads.handler"
+    }
+  }
+
+  # single_function: все маршруты обслуживает одна функция router.handler
+  # с общим пулом тёплых контейнеров (см. backend/bench/warm_pool.py)
+  deployed_functions = var.single_function ? tomap({
+    api = {
+      name       = "echo-api"
+      entrypoint = "router.handler"
+    }
+  }) : tomap(local.functions)
+
+  route_functions = {
+    for key in keys(local.functions) :
+    key => yandex_function.functions[var.single_function ? "api" : key].id
+  }
+}
+
+locals {
+  function_environment = {
+    YDB_ENDPOINT    = var.ydb_endpoint
+    YDB_REGION      = var.ydb_region
+    JWT_SECRET      = var.jwt_secret
+    S3_BUCKET_NAME  = yandex_storage_bucket.images.bucket
+    S3_ENDPOINT_URL = "https://storage.yandexcloud.net"
+    APP_ENV         = "production"
+    CORS_ORIGINS    = var.cors_origins
+    BCRYPT_ROUNDS   = var.bcrypt_rounds
+    SERVER_TIMING   = var.server_timing
+
+    ENRICHMENT_BUDGET_MS = var.enrichment_budget_ms
   }
 }
 
 # Archive functions
 
-data "archive_file" "functions" {
-  for_each    = locals.functions
+# Все функции собираются из одного каталога: общие модули (storage.py и др.)
+# и requirements.txt попадают в каждый пакет
+
+data "archive_file" "backend" {
   type        = "zip"
-  source_file = each.value.file
-  output_path = "build/${each.key}.zip"
+  source_dir  = "../backend/api"
+  output_path = "build/backend.zip"
+  excludes    = ["__pycache__"]
 }
 
 # Serverless Functions
 
 resource "yandex_function" "functions" {
-  for_each = locals.functions
+  for_each = local.deployed_functions
   name     = each.value.name
 }
 
 resource "yandex_function_version" "functions" {
-  for_each = locals.functions
+  for_each = local.deployed_functions
 
   function_id = yandex_function.functions[each.key].id
   runtime     = "python311"
@@ -140,17 +205,195 @@ resource "yandex_function_version" "functions" {
   service_account_id = yandex_iam_service_account.echo.id
 
   package {
-    zip_filename = data.archive_file.functions[each.key].output_path
+    zip_filename = data.archive_file.backend.output_path
   }
 
-  environment = {
-    YDB_ENDPOINT    = var.ydb_endpoint
-    YDB_REGION      = var.ydb_region
-    JWT_SECRET      = var.jwt_secret
-    S3_BUCKET_NAME  = yandex_storage_bucket.images.bucket
-    S3_ENDPOINT_URL = "https://storage.yandexcloud.net"
-    APP_ENV         = "production"
-    CORS_ORIGINS    = var.cors_origins
+  environment = local.function_environment
+}
+
+# Image worker: варианты изображений по триггеру Object Storage
+
+resource "yandex_function" "image_worker" {
+  name = "echo-image-worker"
+}
+
+resource "yandex_function_version" "image_worker" {
+  function_id = yandex_function.image_worker.id
+  runtime     = "python311"
+  entrypoint  = "image_worker.handler"
+
+  # Pillow декодирует оригинал до 10MB целиком
+  memory            = 512
+  execution_timeout = 60
+
+  service_account_id = yandex_iam_service_account.echo.id
+
+  package {
+    zip_filename = data.archive_file.backend.output_path
+  }
+
+  environment = local.function_environment
+}
+
+resource "yandex_function_trigger" "image_worker" {
+  name = "echo-image-worker"
+
+  object_storage {
+    bucket_id    = yandex_storage_bucket.images.id
+    prefix       = "posts/"
+    create       = true
+    batch_cutoff = 0
+  }
+
+  function {
+    id                 = yandex_function.image_worker.id
+    service_account_id = yandex_iam_service_account.echo.id
+    retry_attempts     = 3
+    retry_interval     = 10
+  }
+}
+
+# Purge: окончательное удаление постов и сборка мусора изображений
+
+resource "yandex_function" "purge_posts" {
+  name = "echo-purge-posts"
+}
+
+resource "yandex_function_version" "purge_posts" {
+  function_id = yandex_function.purge_posts.id
+  runtime     = "python311"
+  entrypoint  = "purge_posts.handler"
+
+  memory            = 128
+  execution_timeout = 300
+
+  service_account_id = yandex_iam_service_account.echo.id
+
+  package {
+    zip_filename = data.archive_file.backend.output_path
+  }
+
+  environment = local.function_environment
+}
+
+resource "yandex_function_trigger" "purge_posts" {
+  name = "echo-purge-posts"
+
+  timer {
+    cron_expression = "0 3 ? * * *"
+  }
+
+  function {
+    id                 = yandex_function.purge_posts.id
+    service_account_id = yandex_iam_service_account.echo.id
+  }
+}
+
+# Распространение изменений профиля в author_snapshot постов и комментариев
+
+resource "yandex_function" "propagate_authors" {
+  name = "echo-propagate-authors"
+}
+
+resource "yandex_function_version" "propagate_authors" {
+  function_id = yandex_function.propagate_authors.id
+  runtime     = "python311"
+  entrypoint  = "propagate_authors.handler"
+
+  memory            = 128
+  execution_timeout = 300
+
+  service_account_id = yandex_iam_service_account.echo.id
+
+  package {
+    zip_filename = data.archive_file.backend.output_path
+  }
+
+  environment = local.function_environment
+}
+
+resource "yandex_function_trigger" "propagate_authors" {
+  name = "echo-propagate-authors"
+
+  timer {
+    cron_expression = "0/5 * ? * * *"
+  }
+
+  function {
+    id                 = yandex_function.propagate_authors.id
+    service_account_id = yandex_iam_service_account.echo.id
+  }
+}
+
+# Снимок первой страницы ленты в Object Storage
+
+resource "yandex_function" "build_feed_snapshot" {
+  name = "echo-build-feed-snapshot"
+}
+
+resource "yandex_function_version" "build_feed_snapshot" {
+  function_id = yandex_function.build_feed_snapshot.id
+  runtime     = "python311"
+  entrypoint  = "build_feed_snapshot.handler"
+
+  memory            = 128
+  execution_timeout = 30
+
+  service_account_id = yandex_iam_service_account.echo.id
+
+  package {
+    zip_filename = data.archive_file.backend.output_path
+  }
+
+  environment = local.function_environment
+}
+
+resource "yandex_function_trigger" "build_feed_snapshot" {
+  name = "echo-build-feed-snapshot"
+
+  timer {
+    cron_expression = "* * ? * * *"
+  }
+
+  function {
+    id                 = yandex_function.build_feed_snapshot.id
+    service_account_id = yandex_iam_service_account.echo.id
+  }
+}
+
+# Раскладка опубликованных постов по домашним лентам подписчиков
+
+resource "yandex_function" "fanout_timeline" {
+  name = "echo-fanout-timeline"
+}
+
+resource "yandex_function_version" "fanout_timeline" {
+  function_id = yandex_function.fanout_timeline.id
+  runtime     = "python311"
+  entrypoint  = "fanout_timeline.handler"
+
+  memory            = 128
+  execution_timeout = 60
+
+  service_account_id = yandex_iam_service_account.echo.id
+
+  package {
+    zip_filename = data.archive_file.backend.output_path
+  }
+
+  environment = local.function_environment
+}
+
+resource "yandex_function_trigger" "fanout_timeline" {
+  name = "echo-fanout-timeline"
+
+  timer {
+    cron_expression = "* * ? * * *"
+  }
+
+  function {
+    id                 = yandex_function.fanout_timeline.id
+    service_account_id = yandex_iam_service_account.echo.id
   }
 }
 
@@ -161,15 +404,21 @@ resource "yandex_api_gateway" "echo" {
   description = "Echo API"
 
   spec = templatefile("${path.module}/api-gateway.yaml", {
-    sa_id = yandex_iam_service_account.echo.id
-
-    auth_fn        = yandex_function.functions["auth"].id
-    get_posts_fn   = yandex_function.functions["get_posts"].id
-    create_post_fn = yandex_function.functions["create_post"].id
-    edit_post_fn   = yandex_function.functions["edit_post"].id
-    delete_post_fn = yandex_function.functions["delete_post"].id
-    like_post_fn   = yandex_function.functions["like_post"].id
-    comment_fn     = yandex_function.functions["comment"].id
+    sa_id         = yandex_iam_service_account.echo.id
+    images_bucket = yandex_storage_bucket.images.bucket
+
+    auth_fn             = local.route_functions["auth"]
+    get_posts_fn        = local.route_functions["get_posts"]
+    get_post_changes_fn = local.route_functions["get_post_changes"]
+    get_post_fn         = local.route_functions["get_post"]
+    get_timeline_fn     = local.route_functions["get_timeline"]
+    follow_user_fn      = local.route_functions["follow_user"]
+    create_post_fn      = local.route_functions["create_post"]
+    edit_post_fn        = local.route_functions["edit_post"]
+    delete_post_fn      = local.route_functions["delete_post"]
+    like_post_fn        = local.route_functions["like_post"]
+    comment_fn          = local.route_functions["comment"]
+    uploads_fn          = local.route_functions["uploads"]
   })
 }
 
@@ -2,6 +2,26 @@ import { useState, useEffect } from "react";
 import { type User } from "../types";
 import {API_URL} from "../apiUrl"
 
+// Один запрос обновления на все экземпляры хука: параллельные 401
+// ждут его, а не предъявляют уже ротированный refresh-токен
+let refreshInFlight: Promise<{ token: string; refresh_token: string } | null> | null = null;
+
+const requestRefresh = (refreshToken: string) => {
+    if (!refreshInFlight) {
+        refreshInFlight = fetch(`${API_URL}/auth/refresh`, {
+            method: "POST",
+            headers: { "Content-Type": "application/json" },
+            body: JSON.stringify({ refresh_token: refreshToken }),
+        })
+            .then((response) => (response.ok ? response.json() : null))
+            .catch(() => null)
+            .finally(() => {
+                refreshInFlight = null;
+            });
+    }
+    return refreshInFlight;
+};
+
 export const useAuth = () => {
     const [currentUser, setCurrentUser] = useState<User | null>(null);
     const [authToken, setAuthToken] = useState<string | null>(null);
@@ -11,6 +31,7 @@ export const useAuth = () => {
     const clearStoredAuth = () => {
         localStorage.removeItem("echo_current_user");
         localStorage.removeItem("echo_auth_token");
+        localStorage.removeItem("echo_refresh_token");
         setCurrentUser(null);
         setAuthToken(null);
         setError(null);
@@ -51,6 +72,21 @@ export const useAuth = () => {
         return emailRegex.test(email);
     };
 
+    // Access-токен живёт 15 минут: при 401 получаем новый по refresh-токену
+    const refreshAccessToken = async (): Promise<string | null> => {
+        const refreshToken = localStorage.getItem("echo_refresh_token");
+        if (!refreshToken) return null;
+
+        const refreshed = await requestRefresh(refreshToken);
+        if (!refreshed) return null;
+
+        const { token, refresh_token } = refreshed;
+        setAuthToken(token);
+        localStorage.setItem("echo_auth_token", token);
+        localStorage.setItem("echo_refresh_token", refresh_token);
+        return token;
+    };
+
     const apiRequest = async <T>(
         endpoint: string,
         method: string = "GET",
@@ -64,20 +100,31 @@ export const useAuth = () => {
         }
 
         const url = `${API_URL}${endpoint}`;
-        const headers: HeadersInit = {
-            "Content-Type": "application/json",
-        };
+        const send = (token: string | null) => {
+            const headers: HeadersInit = {
+                "Content-Type": "application/json",
+            };
 
-        if (authToken) {
-            headers["Authorization"] = `Bearer ${authToken}`;
-        }
+            if (token) {
+                headers["Authorization"] = `Bearer ${token}`;
+            }
 
-        try {
-            const response = await fetch(url, {
+            return fetch(url, {
                 method,
                 headers,
                 body: data ? JSON.stringify(data) : undefined,
             });
+        };
+
+        try {
+            let response = await send(authToken);
+
+            if (response.status === 401 && authToken && !endpoint.startsWith("/auth/")) {
+                const refreshedToken = await refreshAccessToken();
+                if (refreshedToken) {
+                    response = await send(refreshedToken);
+                }
+            }
 
             const responseData = await response.json();
 
@@ -125,6 +172,7 @@ export const useAuth = () => {
             const result = await apiRequest<{
                 success: boolean;
                 token: string;
+                refresh_token: string;
                 user: {
                     user_id: string;
                     email: string;
@@ -139,7 +187,7 @@ export const useAuth = () => {
             setIsLoading(false);
 
             if (result.success && result.data) {
-                const { token, user } = result.data;
+                const { token, refresh_token, user } = result.data;
 
                 const transformedUser: User = {
                     id: user.user_id,
@@ -153,6 +201,7 @@ export const useAuth = () => {
                 setCurrentUser(transformedUser);
 
                 localStorage.setItem("echo_auth_token", token);
+                localStorage.setItem("echo_refresh_token", refresh_token);
                 localStorage.setItem("echo_current_user", JSON.stringify(transformedUser));
 
                 return { success: true };
@@ -199,6 +248,7 @@ export const useAuth = () => {
             const result = await apiRequest<{
                 success: boolean;
                 token: string;
+                refresh_token: string;
                 user: {
                     user_id: string;
                     email: string;
@@ -215,7 +265,7 @@ export const useAuth = () => {
             setIsLoading(false);
 
             if (result.success && result.data) {
-                const { token, user } = result.data;
+                const { token, refresh_token, user } = result.data;
 
                 const transformedUser: User = {
                     id: user.user_id,
@@ -229,6 +279,7 @@ export const useAuth = () => {
                 setCurrentUser(transformedUser);
 
                 localStorage.setItem("echo_auth_token", token);
+                localStorage.setItem("echo_refresh_token", refresh_token);
                 localStorage.setItem("echo_current_user", JSON.stringify(transformedUser));
 
                 return { success: true };
@@ -248,6 +299,14 @@ export const useAuth = () => {
     };
 
     const logout = () => {
+        const refreshToken = localStorage.getItem("echo_refresh_token");
+        if (refreshToken) {
+            fetch(`${API_URL}/auth/logout`, {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body: JSON.stringify({ refresh_token: refreshToken }),
+            }).catch(() => undefined);
+        }
         clearStoredAuth();
     };
 
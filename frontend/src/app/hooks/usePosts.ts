@@ -61,6 +61,7 @@ export const usePosts = () => {
     const [error, setError] = useState<string | null>(null);
     const [hasMore, setHasMore] = useState(true);
     const [nextKey, setNextKey] = useState<string | null>(null);
+    const [changesCursor, setChangesCursor] = useState<string | null>(null);
     const [isProcessingLike, setIsProcessingLike] = useState<Record<string, boolean>>({});
 
     const { currentUser, authToken, apiRequest } = useAuth();
@@ -94,11 +95,19 @@ export const usePosts = () => {
                 }
 
                 const endpoint = `/posts${queryParams.toString() ? `?${queryParams.toString()}` : ""}`;
-                const result = await apiRequest<unknown>(endpoint, "GET");
+                // Анонимная первая страница — статический снимок /feed (build_feed_snapshot);
+                // пока снимка нет, запрос идёт в функцию. Токен проверяется в localStorage:
+                // при первой загрузке useAuth ещё не успел его прочитать
+                const isAnonymous = !authToken && !localStorage.getItem("echo_auth_token");
+                const isFirstAnonymousPage = isAnonymous && !append && !params?.author_id && !params?.last_key;
+                let result = isFirstAnonymousPage ? await apiRequest<unknown>("/feed", "GET") : null;
+                if (!result?.success) {
+                    result = await apiRequest<unknown>(endpoint, "GET");
+                }
 
                 if (result.success) {
                     let rawPosts: ApiPost[] = [];
-                    let meta: { has_more?: boolean; next_key?: string } = {};
+                    let meta: { has_more?: boolean; next_key?: string; changes_cursor?: string } = {};
                     
                     if (
                         result.data &&
@@ -108,7 +117,11 @@ export const usePosts = () => {
                     ) {
                         rawPosts = ((result.data as { data: unknown }).data as ApiPost[]);
                         if ("meta" in result.data && typeof (result.data as { meta?: unknown }).meta === "object") {
-                            meta = (result.data as { meta?: unknown }).meta as { has_more?: boolean; next_key?: string };
+                            meta = (result.data as { meta?: unknown }).meta as {
+                                has_more?: boolean;
+                                next_key?: string;
+                                changes_cursor?: string;
+                            };
                         }
                     } else if (Array.isArray(result.data)) {
                         rawPosts = result.data as ApiPost[];
@@ -123,6 +136,7 @@ export const usePosts = () => {
                         setPosts((prev) => [...prev, ...normalizedPosts]);
                     } else {
                         setPosts(normalizedPosts);
+                        setChangesCursor(meta.changes_cursor ?? null);
                     }
 
                     setHasMore(meta.has_more ?? false);
@@ -139,7 +153,7 @@ export const usePosts = () => {
                 setIsLoading(false);
             }
         },
-        [apiRequest, currentUser?.id, isLoading]
+        [apiRequest, authToken, currentUser?.id, isLoading]
     );
 
     useEffect(() => {
@@ -243,6 +257,33 @@ export const usePosts = () => {
         [authToken, apiRequest, posts, isProcessingLike]
     );
 
+    // Загрузка изображения напрямую в Object Storage по presigned URL.
+    // При ошибке возвращает null, и пост создаётся со встроенным base64.
+    const uploadImage = useCallback(
+        async (dataUrl: string): Promise<string | null> => {
+            try {
+                const blob = await (await fetch(dataUrl)).blob();
+                const res = await apiRequest<{
+                    image_key: string;
+                    upload: { url: string; fields: Record<string, string> };
+                }>("/uploads", "POST", { content_type: blob.type, size: blob.size });
+
+                if (!res.success || !res.data) return null;
+
+                const form = new FormData();
+                Object.entries(res.data.upload.fields).forEach(([key, value]) => form.append(key, value));
+                form.append("file", blob);
+
+                const uploadResponse = await fetch(res.data.upload.url, { method: "POST", body: form });
+                return uploadResponse.ok ? res.data.image_key : null;
+            } catch (err) {
+                console.error("Ошибка прямой загрузки изображения:", err);
+                return null;
+            }
+        },
+        [apiRequest]
+    );
+
     const createPost = useCallback(
         async (data: {
             title: string;
@@ -255,10 +296,12 @@ export const usePosts = () => {
                 return { success: false, error: "Заполните заголовок и текст" };
 
             try {
+                const imageKey = data.image?.startsWith("data:") ? await uploadImage(data.image) : null;
                 const res = await apiRequest<{ post?: ApiPost }>("/posts/create", "POST", {
                     title: data.title.trim(),
                     text: data.content.trim(),
-                    imgUrl: data.image || "",
+                    imgUrl: imageKey ? "" : data.image || "",
+                    image_key: imageKey || undefined,
                     status: data.status || "published",
                 });
 
@@ -273,7 +316,7 @@ export const usePosts = () => {
                 return { success: false, error: "Ошибка соединения с сервером" };
             }
         },
-        [authToken, apiRequest, currentUser?.id]
+        [authToken, apiRequest, currentUser?.id, uploadImage]
     );
 
     const updatePost = useCallback(
@@ -455,9 +498,57 @@ export const usePosts = () => {
 
     const clearError = useCallback(() => setError(null), []);
 
-    const refreshPosts = useCallback(() => {
+    // Догрузка только изменившихся постов после changes_cursor первой страницы
+    const syncChanges = useCallback(async (): Promise<boolean> => {
+        let cursor = changesCursor;
+        if (!cursor) return false;
+
+        try {
+            const changed: ApiPost[] = [];
+            const removed = new Set<string>();
+
+            for (;;) {
+                const res = await apiRequest<{
+                    data?: ApiPost[];
+                    tombstones?: { post_id: string }[];
+                    meta?: { cursor: string; has_more: boolean; reset: boolean };
+                }>(`/posts/changes?since=${encodeURIComponent(cursor)}&include_comments=true`, "GET");
+
+                if (!res.success || !res.data?.meta || res.data.meta.reset) return false;
+
+                changed.push(...(res.data.data || []));
+                (res.data.tombstones || []).forEach((t) => removed.add(t.post_id));
+                cursor = res.data.meta.cursor;
+                if (!res.data.meta.has_more) break;
+            }
+
+            const updates = new Map(
+                changed.map((p) => [String(p.post_id || p.id || ""), normalizePost(p, currentUser?.id)])
+            );
+            setPosts((prev) => {
+                const kept = prev
+                    .filter((p) => !removed.has(p.id))
+                    .map((p) => {
+                        const update = updates.get(p.id);
+                        // is_liked изменения не содержат — отметка пользователя сохраняется
+                        return update ? { ...update, isLiked: p.isLiked } : p;
+                    });
+                const known = new Set(prev.map((p) => p.id));
+                const added = [...updates.values()].filter((p) => !known.has(p.id) && !removed.has(p.id));
+                return [...added, ...kept];
+            });
+            setChangesCursor(cursor);
+            return true;
+        } catch (err) {
+            console.error("Ошибка получения изменений:", err);
+            return false;
+        }
+    }, [apiRequest, changesCursor, currentUser?.id]);
+
+    const refreshPosts = useCallback(async () => {
+        if (await syncChanges()) return;
         fetchPosts({ limit: 20, include_comments: true, include_likes: true }, false);
-    }, [fetchPosts]);
+    }, [fetchPosts, syncChanges]);
 
     return {
         posts,
@@ -28,3 +28,27 @@ variable "cors_origins" {
   type        = string
   default     = "*"
 }
+
+# Стоимость bcrypt, подбирается backend/tools/bcrypt_benchmark.py
+variable "bcrypt_rounds" {
+  type        = number
+  default     = 12
+}
+
+# Заголовок Server-Timing с фазами и обращениями к базе в ответах API
+variable "server_timing" {
+  type        = bool
+  default     = false
+}
+
+# Одна функция router.handler вместо функции на каждый маршрут
+variable "single_function" {
+  type        = bool
+  default     = false
+}
+
+# Бюджет обогащения ленты, мс; 0 — до конца execution_timeout
+variable "enrichment_budget_ms" {
+  type        = number
+  default     = 0
+}